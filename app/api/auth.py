@@ -1,54 +1,195 @@
 from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
 from fastapi import Header, HTTPException
+from app.core import profiling
 from app.core.config import settings
-from jose import jwk, jwt
+from jose import JWTError, jwk, jwt
 from jose.utils import base64url_decode
+import asyncio
+import hashlib
 import time
 import requests
+import structlog
 
 
-_jwks_cache: dict[str, dict] = {}
+log = structlog.get_logger()
 
 
-def _get_cognito_jwks(issuer: str) -> dict:
-    if issuer in _jwks_cache and (time.time() - _jwks_cache[issuer]["_ts"]) < 3600:
-        return _jwks_cache[issuer]["keys"]
-    url = issuer.rstrip("/") + "/.well-known/jwks.json"
+def _http_fetch(url: str) -> dict:
     resp = requests.get(url, timeout=5)
     resp.raise_for_status()
-    keys = resp.json()
-    _jwks_cache[issuer] = {"keys": keys, "_ts": time.time()}
-    return keys
+    return resp.json()
 
 
-def _verify_jwt(token: str, issuer: str, audience: str | None = None) -> None:
-    headers = jwt.get_unverified_header(token)
-    kid = headers.get("kid")
-    keys = _get_cognito_jwks(issuer)
-    key = next((k for k in keys["keys"] if k["kid"] == kid), None)
-    if not key:
+class JwksCache:
+    """Per-issuer JWKS with public keys constructed once and looked up by ``kid``.
+
+    Fetches run in a worker thread. A stale key set keeps serving while one
+    background refresh replaces it; a cold cache or an unknown ``kid`` (key
+    rotation) waits for a refresh. Concurrent callers share a single in-flight
+    fetch per issuer, and unknown-``kid`` refreshes are rate limited so a
+    flood of forged tokens cannot hammer the JWKS endpoint.
+    """
+
+    def __init__(self, ttl_s: float = 3600, min_refresh_interval_s: float = 30, fetcher: Callable[[str], dict] = _http_fetch) -> None:
+        self.ttl_s = ttl_s
+        self.min_refresh_interval_s = min_refresh_interval_s
+        self.fetcher = fetcher
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.fetches = 0
+
+    def _construct(self, jwks: dict) -> Dict[str, Any]:
+        keys: Dict[str, Any] = {}
+        for key in jwks.get("keys", []):
+            try:
+                keys[key["kid"]] = jwk.construct(key)
+            except Exception:
+                log.warning("jwks_key_skipped", kid=key.get("kid"))
+        return keys
+
+    async def _fetch(self, issuer: str) -> None:
+        url = issuer.rstrip("/") + "/.well-known/jwks.json"
+        jwks = await asyncio.to_thread(self.fetcher, url)
+        self.fetches += 1
+        self._keys[issuer] = await asyncio.to_thread(self._construct, jwks)
+        self._fetched_at[issuer] = time.time()
+
+    def _refresh(self, issuer: str) -> asyncio.Task:
+        task = self._inflight.get(issuer)
+        loop = asyncio.get_running_loop()
+        # A task from a loop that has since closed cannot be awaited here
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._fetch(issuer))
+            self._inflight[issuer] = task
+        return task
+
+    async def get_key(self, issuer: str, kid: str | None) -> Any | None:
+        keys = self._keys.get(issuer)
+        age = time.time() - self._fetched_at.get(issuer, 0.0)
+        if keys is not None and kid in keys:
+            if age >= self.ttl_s:
+                # Serve the cached key while one background refresh runs
+                self._refresh(issuer).add_done_callback(_log_refresh_failure)
+            return keys[kid]
+        if keys is not None and age < self.min_refresh_interval_s:
+            return None
+        await asyncio.shield(self._refresh(issuer))
+        return self._keys.get(issuer, {}).get(kid)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._fetched_at.clear()
+        self._inflight.clear()
+
+
+def _log_refresh_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("jwks_refresh_failed", error=str(task.exception()))
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already verified tokens, keyed by token hash, valid until ``exp``."""
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str, issuer: str, audience: str | None) -> str:
+        # Same token under a different issuer/audience config must be re-checked
+        return hashlib.blake2b(f"{issuer}\x00{audience or ''}\x00{token}".encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() > entry[0]:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, exp: float, claims: dict) -> None:
+        self._entries[key] = (exp, claims)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+jwks_cache = JwksCache(ttl_s=settings.jwks_ttl_s, min_refresh_interval_s=settings.jwks_min_refresh_interval_s)
+token_cache = VerifiedTokenCache(max_entries=settings.auth_token_cache_size)
+
+
+async def _verify_jwt(token: str, issuer: str, audience: str | None = None) -> dict:
+    cache_key = token_cache.key(token, issuer, audience)
+    claims = token_cache.get(cache_key)
+    if claims is not None:
+        return claims
+    try:
+        headers = jwt.get_unverified_header(token)
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Malformed token")
+    public_key = await jwks_cache.get_key(issuer, headers.get("kid"))
+    if public_key is None:
         raise HTTPException(status_code=401, detail="Invalid token (kid)")
     message, encoded_sig = token.rsplit(".", 1)
     decoded_sig = base64url_decode(encoded_sig.encode("utf-8"))
-    public_key = jwk.construct(key)
     if not public_key.verify(message.encode("utf-8"), decoded_sig):
         raise HTTPException(status_code=401, detail="Invalid signature")
-    claims = jwt.get_unverified_claims(token)
     if issuer and claims.get("iss") != issuer.rstrip("/"):
         raise HTTPException(status_code=401, detail="Invalid issuer")
     if audience and audience not in claims.get("aud", ""):
         raise HTTPException(status_code=401, detail="Invalid audience")
-    if time.time() > claims.get("exp", 0):
+    exp = float(claims.get("exp", 0))
+    if time.time() > exp:
         raise HTTPException(status_code=401, detail="Token expired")
+    token_cache.put(cache_key, exp, claims)
+    return claims
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller; ``tenant`` keys quotas and scheduling."""
+
+    tenant: str
+    method: str
+
+
+ANONYMOUS = Principal(tenant="anonymous", method="none")
+
+
+def _key_tenant(key: str) -> str:
+    # Never put the key itself into metrics labels or logs
+    return "key:" + hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
+async def require_auth(authorization: str | None = Header(default=None), x_api_key: str | None = Header(default=None, alias="x-api-key")) -> Principal:
+    principal = await _authenticate(authorization, x_api_key)
+    # Debug profiles are kept only for requests that got this far
+    profiling.authenticated(principal.tenant)
+    return principal
 
 
-async def require_auth(authorization: str | None = Header(default=None), x_api_key: str | None = Header(default=None, alias="x-api-key")) -> None:
+async def _authenticate(authorization: str | None, x_api_key: str | None) -> Principal:
     mode = (settings.auth_mode or "api-key").lower()
     if mode == "api-key":
+        if x_api_key and x_api_key in settings.api_keys:
+            return Principal(tenant=settings.api_keys[x_api_key], method="api-key")
         if settings.api_key:
             if not x_api_key or x_api_key != settings.api_key:
                 raise HTTPException(status_code=401, detail="Invalid API key")
-        return
+            return Principal(tenant=_key_tenant(x_api_key), method="api-key")
+        if settings.api_keys:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return ANONYMOUS
     elif mode == "cognito":
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing Authorization header")
@@ -57,7 +198,8 @@ async def require_auth(authorization: str | None = Header(default=None), x_api_k
         audience = (settings.cognito_audience or None)
         if not issuer:
             raise HTTPException(status_code=500, detail="Cognito issuer not configured")
-        _verify_jwt(token, issuer, audience)
-        return
+        claims = await _verify_jwt(token, issuer, audience)
+        # Access tokens from client-credentials flows carry client_id; user tokens a sub
+        return Principal(tenant=str(claims.get("client_id") or claims.get("sub") or "cognito"), method="cognito")
     else:
         raise HTTPException(status_code=500, detail="Unsupported AUTH_MODE")
@@ -3,10 +3,13 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.api.schemas import fail
+from app.ocr.breaker import BackendUnavailable, InferenceFailed
+from app.ocr.executor import QueueFullError, InferenceTimeout
+from app.ocr.tenants import RateLimited
 
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return JSONResponse(status_code=exc.status_code, content=fail(str(exc.status_code), exc.detail).model_dump())
+    return JSONResponse(status_code=exc.status_code, content=fail(str(exc.status_code), exc.detail).model_dump(), headers=getattr(exc, "headers", None))
 
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -14,5 +17,37 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return JSONResponse(status_code=422, content=fail("ValidationError", "Request validation failed", details).model_dump())
 
 
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content=fail("Overloaded", "Inference queue is full, retry later", {"retry_after_s": exc.retry_after_s}).model_dump(),
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content=fail("RateLimited", "Tenant rate limit exceeded, retry later", {"retry_after_s": exc.retry_after_s}).model_dump(),
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
+async def inference_timeout_handler(request: Request, exc: InferenceTimeout):
+    return JSONResponse(status_code=504, content=fail("Timeout", "Inference timed out", {"timeout_s": exc.timeout_s}).model_dump())
+
+
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content=fail("BackendUnavailable", "OCR backend is unavailable, retry later", {"backend": exc.backend, "retry_after_s": exc.retry_after_s}).model_dump(),
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
+async def inference_failed_handler(request: Request, exc: InferenceFailed):
+    return JSONResponse(status_code=500, content=fail("InferenceError", "OCR backend failed", {"backend": exc.backend}).model_dump())
+
+
 async def unhandled_exception_handler(request: Request, exc: Exception):
     return JSONResponse(status_code=500, content=fail("InternalServerError", "Unexpected error").model_dump())
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from typing import Any
+import json
+import struct
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from app.api.schemas import StandardResponse
+from app.ocr.analysis import TextBoxes
+
+try:
+    import orjson  # type: ignore
+    _orjson_available = True
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+    _orjson_available = False
+
+
+COLUMNAR_MEDIA_TYPE = "application/x-ocr-columnar"
+# magic, version, header length, box count
+_COLUMNAR_PREFIX = struct.Struct("<4sBxxxII")
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, TextBoxes):
+        return obj.to_dicts()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes; orjson when installed, stdlib json otherwise."""
+    if _orjson_available:
+        # Dataclasses (TextBoxes) go through _json_default instead of orjson's field dump
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATACLASS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _envelope(body: StandardResponse) -> dict[str, Any]:
+    # Shallow: the result payload is plain JSON data plus TextBoxes, which dumps() renders
+    return {
+        "success": body.success,
+        "result": body.result,
+        "error": body.error.model_dump() if body.error is not None else None,
+        "meta": body.meta,
+    }
+
+
+def render_json(body: StandardResponse) -> bytes:
+    """A StandardResponse as JSON bytes, the way FastJSONResponse sends it."""
+    return dumps(_envelope(body))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that skips response_model re-validation and jsonable_encoder.
+
+    Returning a Response from a handler bypasses FastAPI's serialization of
+    ``StandardResponse`` (dump, validate, encode), which dominates on dense
+    pages with thousands of boxes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, StandardResponse):
+            content = _envelope(content)
+        return dumps(content)
+
+
+class ColumnarResponse(Response):
+    """Binary columnar encoding of a StandardResponse for clients that ask for it.
+
+    Layout (little-endian): ``b"OCRC"``, u8 version, 3 pad bytes, u32 header
+    length, u32 box count N, then the UTF-8 JSON header (the envelope with
+    ``result.boxes`` replaced by ``result.box_texts``), ``N*4*2`` int32 points
+    and ``N`` float32 scores.
+    """
+
+    media_type = COLUMNAR_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        envelope = _envelope(content) if isinstance(content, StandardResponse) else dict(content)
+        result = dict(envelope.get("result") or {})
+        boxes = result.pop("boxes", None)
+        if not isinstance(boxes, TextBoxes):
+            # Payloads built elsewhere (e.g. results cached before boxes stayed columnar)
+            boxes = TextBoxes.from_dicts(boxes or [])
+        result["box_texts"] = boxes.texts
+        envelope["result"] = result
+        header = dumps(envelope)
+        return b"".join((
+            _COLUMNAR_PREFIX.pack(b"OCRC", 1, len(header), len(boxes)),
+            header,
+            boxes.points.astype("<i4", copy=False).tobytes(),
+            boxes.scores.astype("<f4", copy=False).tobytes(),
+        ))
+
+
+def wants_columnar(request: Request) -> bool:
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def respond(request: Request, body: StandardResponse) -> Response:
+    """Render a handler result in the format the client negotiated via Accept."""
+    if wants_columnar(request):
+        return ColumnarResponse(body)
+    return FastJSONResponse(body)
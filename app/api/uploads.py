@@ -0,0 +1,42 @@
+from __future__ import annotations
+from fastapi import UploadFile
+from typing import Any
+import mmap
+from app.core.config import settings
+
+
+class UploadTooLarge(Exception):
+    """A single uploaded file is larger than ``max_file_mb``."""
+
+
+def _size_of(fileobj: Any) -> int:
+    pos = fileobj.tell()
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(pos)
+    return size
+
+
+async def read_upload(file: UploadFile, max_bytes: int | None = None) -> bytes | mmap.mmap:
+    """Return an upload's content without copying large files into memory.
+
+    The multipart parser has already spooled the part (to disk past 1MB), so the
+    size is taken from the spool rather than ``UploadFile.size``, which is not
+    always set, and oversize files are rejected before anything is read.
+    Files at or above ``upload_mmap_threshold_kb`` that live on disk are
+    memory-mapped read-only; smaller ones are read into ``bytes``.
+    """
+    limit = settings.max_file_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    spool = file.file
+    size = _size_of(spool)
+    if limit and size > limit:
+        raise UploadTooLarge(f"File exceeds {limit} bytes")
+    threshold = settings.upload_mmap_threshold_kb * 1024
+    # Only map files that are already on disk; fileno() would force a small spool to roll over
+    if size and threshold and size >= threshold and getattr(spool, "_rolled", True):
+        try:
+            return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, AttributeError):
+            pass
+    await file.seek(0)
+    return await file.read()
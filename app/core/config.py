@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
 
 
 class Settings(BaseSettings):
@@ -7,7 +7,13 @@ class Settings(BaseSettings):
     allowed_origins: List[str] = []
     auth_mode: str = "api-key"  # cognito | api-key
     api_key: str | None = None
+    # Additional API keys mapped to tenant names (JSON: {"<key>": "<tenant>"})
+    api_keys: Dict[str, str] = {}
     max_file_mb: int = 10
+    # Whole request body cap (covers multi-file /ocr/batch); enforced while streaming
+    max_request_mb: int = 100
+    # Uploads at least this large are memory-mapped from the spool file instead of read
+    upload_mmap_threshold_kb: int = 1024
     default_lang: str = "en"
     model_default: str = "pp-ocrv5"
     # Comma-separated list of allowed language codes for PaddleOCR (lowercase)
@@ -17,11 +23,121 @@ class Settings(BaseSettings):
         "fr", "german", "arabic", "cyrillic", "devanagari"
     ]
 
+    # lang=auto: candidate languages (one detection, recognition routed per crop),
+    # crops sampled to find the languages present, and the score below which a
+    # crop is retried with the next language present
+    auto_langs: List[str] = ["en", "korean", "ch"]
+    auto_lang_sample_size: int = 16
+    auto_lang_min_score: float = 0.8
+
+    # JSON file of named region templates for /ocr?mode=regions&template=<name>
+    templates_path: str | None = None
+
     # Image processing
     max_image_px: int | None = 2048
+    # Recognize images above max_image_px at full resolution via overlapping tiles
+    ocr_tiling: bool = False
+    tile_px: int = 1280
+    tile_overlap_px: int = 160
+    tile_nms_threshold: float = 0.5
+    # Pick the /ocr inference scale from the estimated text height instead of
+    # max_image_px: text is brought into [min, max] px (upscaling at most
+    # adaptive_max_upscale), the longest side never exceeds adaptive_max_px,
+    # and images without a reliable estimate fall back to max_image_px
+    adaptive_resize: bool = False
+    adaptive_text_px_min: int = 12
+    adaptive_text_px_max: int = 40
+    adaptive_max_upscale: float = 2.0
+    adaptive_max_px: int = 4096
+    adaptive_thumb_px: int = 1024
+
+    # Background GPU telemetry sampling period for /health
+    telemetry_interval_s: float = 10.0
+
+    # Answer 503 + Retry-After on inference routes until the startup warm-up finishes
+    readiness_gate: bool = False
+
+    # app.serve: forked HTTP workers sharing preloaded models (0 = one per CPU core)
+    serve_workers: int = 0
 
     # Preload models on startup (reduce cold start)
     preload_models: bool = False
+    # Upper bound of OcrEngine instances kept resident (LRU-evicted beyond this)
+    max_resident_models: int = 4
+    # Inference device for PaddleOCR: "gpu" | "cpu" | unset (Paddle decides)
+    ocr_device: str | None = None
+    # Inference backend for plain model names: "paddle" | "onnx" | "fake".
+    # A model can also pick one itself: model=onnx:<name> or model=fake
+    ocr_backend: str = "paddle"
+    # ONNX Runtime (CPU): <onnx_model_dir>/<name>/{det,rec,cls}.onnx + dict.txt,
+    # session thread pools (0 = runtime default) and the *.int8.onnx variants
+    onnx_model_dir: str = "/models/onnx"
+    onnx_intra_op_threads: int = 0
+    onnx_inter_op_threads: int = 0
+    onnx_quantized: bool = False
+    # Circuit breaker per backend/device: consecutive failures (or calls slower
+    # than breaker_slow_call_s, 0 = inference_timeout_s) that open it, and how
+    # long it stays open before one probe call is let through. Failed calls
+    # and calls on an open circuit go to the same model on fallback_device
+    # (unset = no fallback: 503 while open)
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout_s: float = 30.0
+    breaker_slow_call_s: float = 0.0
+    fallback_device: str | None = "cpu"
+
+    # Inference worker pool (keeps blocking OCR off the event loop)
+    inference_pool: str = "thread"  # thread | process
+    inference_workers: int = 1
+    # Tasks allowed to wait for a worker before new requests get 503
+    inference_queue_size: int = 16
+    inference_timeout_s: float = 60.0
+    inference_retry_after_s: int = 1
+    # Per-tenant fairness in front of the pool: dispatch slots (0 = inference
+    # workers, times microbatch_max_size when micro-batching), default limits
+    # (0 = unlimited) and per-tenant overrides as JSON:
+    # {"<tenant>": {"max_concurrency": 2, "rate_per_s": 5, "burst": 10}}
+    tenant_dispatch_slots: int = 0
+    tenant_max_concurrency: int = 0
+    tenant_rate_per_s: float = 0.0
+    tenant_burst: float = 0.0
+    tenant_limits: Dict[str, Dict[str, Any]] = {}
+    # Content-addressed result cache (memory LRU + optional sqlite tier)
+    result_cache_enabled: bool = True
+    result_cache_max_entries: int = 512
+    result_cache_max_mb: int = 64
+    result_cache_ttl_s: int = 3600
+    # Path to a sqlite file; enables the on-disk tier that survives restarts
+    result_cache_path: str | None = None
+    result_cache_disk_max_entries: int = 10000
+
+    # Multi-page documents (PDF needs pypdfium2)
+    document_dpi: int = 200
+    document_max_dpi: int = 400
+    document_max_pages: int = 500
+    document_max_mb: int = 100
+
+    # Asynchronous job API (durable local queue)
+    jobs_store_url: str = "sqlite:///ocr-jobs.sqlite"
+    jobs_concurrency: int = 1
+    jobs_poll_interval_s: float = 1.0
+    # Finished jobs (and their results) are kept this long
+    jobs_retention_s: int = 86400
+
+    # Micro-batching of concurrent /ocr recognition requests (same lang/model)
+    microbatch_enabled: bool = False
+    microbatch_max_size: int = 8
+    microbatch_max_wait_ms: int = 10
+
+    # Images per model-level batch in /ocr/batch; chunks fan out across the pool
+    ocr_batch_size: int = 8
+
+    # Opt-in request profiling: an authenticated request sent with
+    # X-Debug-Profile: trace (span timing tree) or profile (plus sampled stacks
+    # of its inference work every debug_profile_interval_ms) is kept for
+    # /debug/profiles; the last debug_profiles_kept per process
+    debug_profiling: bool = False
+    debug_profile_interval_ms: float = 5.0
+    debug_profiles_kept: int = 32
 
     # ChatOCR PoC toggle & token (placeholder)
     chatocr_enabled: bool = False
@@ -30,6 +146,11 @@ class Settings(BaseSettings):
     # Cognito
     cognito_issuer: str | None = None
     cognito_audience: str | None = None
+    # JWKS refresh period and minimum gap between unknown-kid refreshes
+    jwks_ttl_s: float = 3600
+    jwks_min_refresh_interval_s: float = 30
+    # Verified tokens kept (until exp) to skip repeat signature checks
+    auth_token_cache_size: int = 10000
 
 
 settings = Settings()  # type: ignore
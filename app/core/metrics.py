@@ -0,0 +1,310 @@
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+import threading
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:  # pragma: no cover - overridden
+        return []
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, value: float = 1, **labels: Any) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[idx] += 1
+            total[0] += value
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(_key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_value(bound)),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total[0])}")
+                lines.append(f"{self.name}_count{_fmt_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help: str, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram("ocr_stage_seconds", "Time spent per processing stage")
+HTTP_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "End-to-end HTTP request latency")
+FALLBACKS = REGISTRY.counter("ocr_fallbacks_total", "Engine calls that fell back to an empty or degraded result")
+CACHE_REQUESTS = REGISTRY.counter("ocr_cache_requests_total", "Result cache lookups by outcome")
+MODEL_LOADS = REGISTRY.counter("ocr_model_loads_total", "OCR engine (model) loads")
+INFLIGHT = REGISTRY.gauge("ocr_inference_inflight", "Tasks admitted to the inference pool (running + queued)")
+CAPACITY = REGISTRY.gauge("ocr_inference_capacity", "Maximum tasks admitted to the inference pool")
+RESIDENT_MODELS = REGISTRY.gauge("ocr_resident_models", "OCR engines currently loaded in this process")
+
+
+class Recorder:
+    """Per-task collector for stage timings and counter increments.
+
+    Work running on the inference pool records into a Recorder and ships the
+    exported data back with its result, so observations made inside worker
+    processes still reach this process' registry. When tracing, stages and
+    ``span`` blocks are also kept as spans ``{"name", "start"`` (wall clock),
+    ``"ms", "parent"}``, ``parent`` indexing the same list.
+    """
+
+    def __init__(self, trace: bool = False) -> None:
+        self.stages: Dict[str, float] = {}
+        self.counts: List[Tuple[str, Dict[str, Any], float]] = []
+        self.spans: List[Dict[str, Any]] | None = [] if trace else None
+
+    def add(self, stage_name: str, seconds: float) -> None:
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def export(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"stages": dict(self.stages), "counts": list(self.counts)}
+        if self.spans is not None:
+            data["spans"] = list(self.spans)
+        return data
+
+
+_recorder: ContextVar[Recorder | None] = ContextVar("ocr_metrics_recorder", default=None)
+# Set while a traced request runs: recorders created under it keep spans, and
+# spans applied with no recorder active land in this list
+_trace_sink: ContextVar[List[Dict[str, Any]] | None] = ContextVar("ocr_trace_sink", default=None)
+# Innermost open span as (recorder, index); new spans attach to it
+_span_parent: ContextVar[Tuple[Recorder, int] | None] = ContextVar("ocr_span_parent", default=None)
+
+
+@contextmanager
+def recording() -> Iterator[Recorder]:
+    outer = _recorder.get()
+    rec = Recorder(trace=outer.spans is not None if outer is not None else _trace_sink.get() is not None)
+    token = _recorder.set(rec)
+    try:
+        yield rec
+    finally:
+        _recorder.reset(token)
+
+
+@contextmanager
+def tracing(sink: List[Dict[str, Any]] | None = None) -> Iterator[List[Dict[str, Any]]]:
+    """Keep spans for work started inside the block; ``apply`` collects them into ``sink``."""
+    spans: List[Dict[str, Any]] = [] if sink is None else sink
+    token = _trace_sink.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace_sink.reset(token)
+
+
+def _parent_of(rec: Recorder) -> int | None:
+    current = _span_parent.get()
+    return current[1] if current is not None and current[0] is rec else None
+
+
+@contextmanager
+def _traced(rec: Recorder, spans: List[Dict[str, Any]], name: str, attrs: Dict[str, Any]) -> Iterator[None]:
+    entry: Dict[str, Any] = {"name": name, "start": time.time(), "ms": 0.0, "parent": _parent_of(rec)}
+    if attrs:
+        entry["attrs"] = attrs
+    spans.append(entry)
+    token = _span_parent.set((rec, len(spans) - 1))
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        entry["ms"] = (perf_counter() - started) * 1000
+        _span_parent.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Trace a block as a span of the active Recorder; a no-op unless tracing."""
+    rec = _recorder.get()
+    if rec is None or rec.spans is None:
+        yield
+        return
+    with _traced(rec, rec.spans, name, attrs):
+        yield
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the active Recorder; a no-op when none is active."""
+    rec = _recorder.get()
+    if rec is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        if rec.spans is None:
+            yield
+        else:
+            with _traced(rec, rec.spans, name, {}):
+                yield
+    finally:
+        rec.add(name, perf_counter() - started)
+
+
+def _graft(dest: List[Dict[str, Any]], spans: List[Dict[str, Any]], parent: int | None) -> None:
+    # Append spans recorded elsewhere; their roots hang under ``parent``
+    offset = len(dest)
+    for entry in spans:
+        entry = dict(entry)
+        entry["parent"] = parent if entry["parent"] is None else entry["parent"] + offset
+        dest.append(entry)
+
+
+def record(stage_name: str, seconds: float) -> None:
+    """Add an externally measured duration to the active Recorder, if any."""
+    rec = _recorder.get()
+    if rec is not None:
+        rec.add(stage_name, seconds)
+
+
+def merge(data: Dict[str, Any] | None) -> None:
+    """Merge data exported by a worker-side Recorder into the active one."""
+    if not data:
+        return
+    rec = _recorder.get()
+    if rec is None:
+        # Nobody to attribute stages to; counters still count
+        for name, lbls, value in data.get("counts", []):
+            REGISTRY.counter(name).inc(value, **lbls)
+        return
+    for stage_name, seconds in data.get("stages", {}).items():
+        rec.add(stage_name, seconds)
+    rec.counts.extend(tuple(c) for c in data.get("counts", []))  # type: ignore[misc]
+    if rec.spans is not None and data.get("spans"):
+        _graft(rec.spans, data["spans"], _parent_of(rec))
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    """Increment a counter, deferring to the active Recorder when there is one."""
+    rec = _recorder.get()
+    if rec is not None:
+        rec.counts.append((name, labels, value))
+    else:
+        REGISTRY.counter(name).inc(value, **labels)
+
+
+def apply(data: Dict[str, Any] | None, **labels: Any) -> None:
+    """Fold an exported Recorder into the registry, labelling stages with ``labels``."""
+    if not data:
+        return
+    for stage_name, seconds in data.get("stages", {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage_name, **labels)
+    for name, lbls, value in data.get("counts", []):
+        REGISTRY.counter(name).inc(value, **lbls)
+    sink = _trace_sink.get()
+    if sink is not None and data.get("spans"):
+        _graft(sink, data["spans"], None)
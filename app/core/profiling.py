@@ -0,0 +1,180 @@
+from __future__ import annotations
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Iterator, List
+import os
+import sys
+import threading
+import time
+import uuid
+from app.core import metrics
+from app.core.config import settings
+
+
+# Request header opting one request into tracing ("trace") or tracing plus stack sampling ("profile")
+PROFILE_HEADER = "X-Debug-Profile"
+TRACE, PROFILE = "trace", "profile"
+
+
+def _frame_label(code: Any) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame: Any) -> str:
+    """One stack in collapsed (flamegraph.pl / speedscope) form, root first."""
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread.
+
+    Only the sampled thread is looked at, so other requests running
+    concurrently on the pool never show up in the profile. Works the same in
+    a worker process; the counts travel back with the result.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float) -> None:
+        self.thread_id = thread_id
+        self.interval_s = max(0.001, interval_s)
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="ocr-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _tree(spans: List[Dict[str, Any]], started: float) -> List[Dict[str, Any]]:
+    nodes = []
+    for entry in spans:
+        node = {"name": entry["name"], "start_ms": round((entry["start"] - started) * 1000, 3), "ms": round(entry["ms"], 3)}
+        if "attrs" in entry:
+            node["attrs"] = entry["attrs"]
+        node["children"] = []
+        nodes.append(node)
+    roots = []
+    for entry, node in zip(spans, nodes):
+        parent = entry["parent"]
+        (nodes[parent]["children"] if parent is not None else roots).append(node)
+    return roots
+
+
+@dataclass
+class Profile:
+    """Spans and sampled stacks of one request, kept for ``/debug/profiles``.
+
+    ``id`` is generated here, never taken from the caller, so one request
+    cannot overwrite another's profile; ``request_id`` is kept to find the
+    request's log lines. ``tenant`` is set by ``require_auth``; profiles of
+    requests that never got that far are not kept.
+    """
+
+    request_id: str
+    path: str
+    sample: bool
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    tenant: str | None = None
+    started: float = field(default_factory=time.time)
+    duration_ms: float | None = None
+    status: int | None = None
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+    stacks: Counter = field(default_factory=Counter)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"id": self.id, "request_id": self.request_id, "tenant": self.tenant, "path": self.path, "status": self.status, "duration_ms": self.duration_ms, "samples": sum(self.stacks.values())}
+
+    def report(self) -> Dict[str, Any]:
+        return {**self.summary(), "spans": _tree(self.spans, self.started)}
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """The last ``max_entries`` profiles of this process, by profile id."""
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, profile: Profile) -> None:
+        with self._lock:
+            self._entries[profile.id] = profile
+            self._entries.move_to_end(profile.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, profile_id: str) -> Profile | None:
+        with self._lock:
+            return self._entries.get(profile_id)
+
+    def list(self, tenant: str | None = None) -> List[Dict[str, Any]]:
+        """Summaries, newest first; only ``tenant``'s profiles when given."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [p.summary() for p in reversed(entries) if tenant is None or p.tenant == tenant]
+
+
+profiles = ProfileStore(settings.debug_profiles_kept)
+
+_active: ContextVar[Profile | None] = ContextVar("ocr_profile", default=None)
+
+
+@contextmanager
+def session(request_id: str, path: str, mode: str) -> Iterator[Profile]:
+    """Trace (and with ``mode="profile"`` stack-sample) the work started inside the block."""
+    profile = Profile(request_id=request_id, path=path, sample=mode == PROFILE)
+    token = _active.set(profile)
+    started = perf_counter()
+    try:
+        with metrics.tracing(profile.spans):
+            yield profile
+    finally:
+        profile.duration_ms = round((perf_counter() - started) * 1000, 3)
+        _active.reset(token)
+
+
+def active() -> Profile | None:
+    return _active.get()
+
+
+def authenticated(tenant: str) -> None:
+    """Mark the current request's profile (if any) as belonging to an authenticated caller."""
+    profile = _active.get()
+    if profile is not None:
+        profile.tenant = tenant
+
+
+def sample_interval_s() -> float | None:
+    """Stack sampling period for pool work of the current request; None when not profiling."""
+    profile = _active.get()
+    if profile is None or not profile.sample:
+        return None
+    return settings.debug_profile_interval_ms / 1000
+
+
+def add_stacks(stacks: Dict[str, int] | None) -> None:
+    profile = _active.get()
+    if profile is not None and stacks:
+        profile.stacks.update(stacks)
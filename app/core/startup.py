@@ -0,0 +1,112 @@
+from __future__ import annotations
+from time import perf_counter
+
+# Imported first by app.main, so this approximates the start of the app import
+_IMPORT_STARTED = perf_counter()
+
+from contextlib import contextmanager  # noqa: E402
+from typing import Any, Awaitable, Callable, Dict, Iterator  # noqa: E402
+import asyncio  # noqa: E402
+import os  # noqa: E402
+import time  # noqa: E402
+import structlog  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+
+log = structlog.get_logger()
+
+
+def _process_age_s() -> float | None:
+    """Seconds since the OS started this process (Linux): interpreter and server boot before the app import."""
+    try:
+        with open("/proc/self/stat") as fh:
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupState:
+    """Boot phase timings and the readiness flag.
+
+    Liveness only needs the ASGI app; heavy work (PaddleOCR import, model
+    preload) runs in a background warm-up task, and the service reports ready
+    once it finishes. Phase timings are kept for ``/debug/startup``.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._process_age_at_import = _process_age_s()
+        self._ready_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            self.errors[name] = repr(exc)
+            raise
+        finally:
+            self.record(name, perf_counter() - started)
+
+    def mark_imported(self) -> None:
+        self.record("import_app", perf_counter() - _IMPORT_STARTED)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self._ready_at = perf_counter()
+        log.info("startup_ready", **self.report())
+
+    def start_warmup(self, warmup: Callable[[], Awaitable[None]]) -> None:
+        async def run() -> None:
+            try:
+                with self.phase("warmup"):
+                    await warmup()
+            except Exception:
+                log.exception("startup_warmup_failed")
+            # Serve even if warm-up failed: requests then load lazily (or fall back)
+            self.mark_ready()
+
+        self.ready = False
+        self._task = asyncio.get_running_loop().create_task(run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def report(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"ready": self.ready, "phases_ms": dict(self.phases)}
+        if self._process_age_at_import is not None:
+            data["process_age_at_import_ms"] = round(self._process_age_at_import * 1000, 1)
+        if self._ready_at is not None:
+            data["ready_after_import_ms"] = round((self._ready_at - _IMPORT_STARTED) * 1000, 1)
+        if self.errors:
+            data["errors"] = dict(self.errors)
+        data["uptime_s"] = round(perf_counter() - _IMPORT_STARTED, 3)
+        data["checked_at"] = time.time()
+        return data
+
+
+startup = StartupState()
+
+
+async def require_ready() -> None:
+    """Optional gate for inference routes while the warm-up is still running."""
+    if settings.readiness_gate and not startup.ready:
+        retry = str(max(1, int(settings.inference_retry_after_s)))
+        raise HTTPException(status_code=503, detail="Service is starting", headers={"Retry-After": retry})
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import Any
+import asyncio
+import subprocess
+import time
+import structlog
+from app.core import metrics
+from app.core.config import settings
+
+
+log = structlog.get_logger()
+
+GPU_UTILIZATION = metrics.REGISTRY.gauge("ocr_gpu_utilization_percent", "GPU utilization from the last telemetry sample")
+GPU_MEMORY_USED = metrics.REGISTRY.gauge("ocr_gpu_memory_used_mb", "GPU memory used from the last telemetry sample")
+
+
+def collect_versions() -> dict[str, Any]:
+    """Paddle/PaddleOCR versions; imports are heavy, so this runs once off the loop."""
+    paddle_info: dict[str, Any] = {"version": None, "compiled_with_cuda": None}
+    paddleocr_version: str | None = None
+    try:
+        import paddle  # type: ignore
+
+        paddle_info["version"] = getattr(paddle, "__version__", None)
+        try:
+            paddle_info["compiled_with_cuda"] = bool(paddle.is_compiled_with_cuda())
+        except Exception:
+            paddle_info["compiled_with_cuda"] = None
+    except Exception:
+        paddle_info = {"version": None, "compiled_with_cuda": None}
+    try:
+        import paddleocr  # type: ignore
+
+        paddleocr_version = getattr(paddleocr, "__version__", None)
+    except Exception:
+        paddleocr_version = None
+    return {"paddleocr": paddleocr_version, "paddlepaddle": paddle_info["version"], "compiled_with_cuda": paddle_info["compiled_with_cuda"]}
+
+
+class TelemetrySampler:
+    """Samples device telemetry on an interval into a shared snapshot.
+
+    Health probes read the snapshot and never touch NVML, subprocesses or
+    imports themselves. NVML is initialised once and kept open; when it is
+    unavailable the sampler falls back to ``nvidia-smi`` (in a worker thread).
+    """
+
+    def __init__(self, interval_s: float = 10.0) -> None:
+        self.interval_s = max(0.1, float(interval_s))
+        self.started_at = time.time()
+        self._gpu: dict[str, Any] = {"visible": False}
+        self._versions: dict[str, Any] = {"paddleocr": None, "paddlepaddle": None, "compiled_with_cuda": None}
+        self._sampled_at: float | None = None
+        self._nvml: Any = None
+        self._nvml_handle: Any = None
+        self._nvml_failed = False
+        self._task: asyncio.Task | None = None
+
+    def _nvml_sample(self) -> dict[str, Any] | None:
+        if self._nvml_failed:
+            return None
+        try:
+            if self._nvml is None:
+                import pynvml  # type: ignore
+
+                pynvml.nvmlInit()
+                self._nvml = pynvml
+                self._nvml_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+            util = self._nvml.nvmlDeviceGetUtilizationRates(self._nvml_handle)
+            mem = self._nvml.nvmlDeviceGetMemoryInfo(self._nvml_handle)
+            return {"visible": True, "utilization": int(util.gpu), "memory_used_mb": int(mem.used / (1024 * 1024))}
+        except Exception:
+            # Do not retry a missing driver/library on every tick
+            self._nvml_failed = self._nvml is None
+            return None
+
+    def _smi_sample(self) -> dict[str, Any]:
+        try:
+            out = subprocess.check_output(
+                [
+                    "nvidia-smi",
+                    "--query-gpu=utilization.gpu,memory.used",
+                    "--format=csv,noheader,nounits",
+                ],
+                stderr=subprocess.STDOUT,
+                timeout=1,
+            ).decode().strip()
+            if out:
+                util, mem = out.splitlines()[0].split(",")
+                return {"visible": True, "utilization": int(util.strip()), "memory_used_mb": int(mem.strip())}
+        except Exception:
+            pass
+        return {"visible": False}
+
+    def sample(self) -> None:
+        """Take one blocking sample; called from a worker thread."""
+        gpu = self._nvml_sample() or self._smi_sample()
+        self._gpu = gpu
+        self._sampled_at = time.time()
+        if gpu.get("visible"):
+            GPU_UTILIZATION.set(gpu["utilization"])
+            GPU_MEMORY_USED.set(gpu["memory_used_mb"])
+
+    async def _loop(self) -> None:
+        self._versions = await asyncio.to_thread(collect_versions)
+        while True:
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception:
+                log.warning("telemetry_sample_failed")
+            await asyncio.sleep(self.interval_s)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._nvml is not None:
+            try:
+                self._nvml.nvmlShutdown()
+            except Exception:
+                pass
+            self._nvml = None
+
+    def snapshot(self) -> dict[str, Any]:
+        age = None if self._sampled_at is None else round(time.time() - self._sampled_at, 3)
+        return {"gpu": self._gpu, "version": self._versions, "sample_age_s": age, "uptime_s": round(time.time() - self.started_at, 3)}
+
+
+sampler = TelemetrySampler(interval_s=settings.telemetry_interval_s)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import Any
+import asyncio
+import structlog
+from app.core import metrics
+from app.core.config import settings
+from app.ocr.breaker import BackendUnavailable
+from app.ocr.executor import QueueFullError, InferenceTimeout
+from app.ocr.pipeline import metric_labels
+from app.ocr.service import run_cached
+from app.ocr.tenants import BACKGROUND
+from .store import Job, JobStore, create_store
+
+
+log = structlog.get_logger()
+
+
+class JobScheduler:
+    """In-process consumer of the durable job queue.
+
+    Runs ``concurrency`` asyncio workers that claim queued jobs and execute them
+    through the same cached inference path as the synchronous endpoints.
+    Submissions wake an idle worker immediately; otherwise workers poll.
+    """
+
+    def __init__(self, store_url: str, concurrency: int = 1, poll_interval_s: float = 1.0, retention_s: float = 86400) -> None:
+        self.store_url = store_url
+        self.concurrency = max(1, int(concurrency))
+        self.poll_interval_s = poll_interval_s
+        self.retention_s = retention_s
+        self._store: JobStore | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        # Off in forked serving workers: siblings' running jobs are not orphans
+        self.recover_on_start = True
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = create_store(self.store_url)
+        return self._store
+
+    @property
+    def running(self) -> bool:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        # Tasks bound to a loop that has since gone away do not count
+        return any(not t.done() and t.get_loop() is loop for t in self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        if self.recover_on_start:
+            recovered = self.store.recover()
+            if recovered:
+                log.info("jobs_recovered", count=recovered)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, mode: str, lang: str, model: str, content: bytes, tenant: str | None = None) -> Job:
+        job = await asyncio.to_thread(self.store.create, mode, lang, model, content, tenant)
+        metrics.count("ocr_jobs_total", event="submitted", mode=mode)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def _worker(self, idx: int) -> None:
+        assert self._wakeup is not None
+        idle_rounds = 0
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception:
+                log.exception("job_claim_failed")
+                job = None
+            if job is None:
+                idle_rounds += 1
+                if idx == 0 and idle_rounds % 60 == 0:
+                    await asyncio.to_thread(self.store.prune, self.retention_s)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            idle_rounds = 0
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        content = await asyncio.to_thread(self.store.load_input, job.id)
+        if content is None:
+            # Cancelled between claim and load
+            return
+        structlog.contextvars.bind_contextvars(job_id=job.id)
+        try:
+            with metrics.recording() as rec:
+                # Lowest priority: jobs wait behind interactive and batch requests
+                result, cache_meta = await run_cached(job.mode, content, job.lang, job.model, resize=job.mode == "recognition", tenant=job.tenant or "anonymous", priority=BACKGROUND)
+            metrics.apply(rec.export(), **metric_labels(job.mode, job.lang, job.model))
+        except (QueueFullError, BackendUnavailable) as exc:
+            # Pool saturated or backend circuit open: put the job back and back off
+            await asyncio.to_thread(self.store.requeue, job.id)
+            await asyncio.sleep(exc.retry_after_s)
+            return
+        except InferenceTimeout:
+            await asyncio.to_thread(self.store.fail, job.id, "Timeout")
+            metrics.count("ocr_jobs_total", event="failed", mode=job.mode)
+            return
+        except Exception:
+            log.exception("job_failed")
+            await asyncio.to_thread(self.store.fail, job.id, "InternalServerError")
+            metrics.count("ocr_jobs_total", event="failed", mode=job.mode)
+            return
+        finally:
+            structlog.contextvars.unbind_contextvars("job_id")
+        meta: dict[str, Any] = {"lang": job.lang, "mode": job.mode, "model": job.model, "job_id": job.id, **cache_meta}
+        if await asyncio.to_thread(self.store.complete, job.id, result, meta):
+            metrics.count("ocr_jobs_total", event="succeeded", mode=job.mode)
+        else:
+            log.info("job_result_discarded", job_id=job.id)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"running": self.running, "concurrency": self.concurrency, "counts": self.store.counts()}
+
+
+scheduler = JobScheduler(
+    store_url=settings.jobs_store_url,
+    concurrency=settings.jobs_concurrency,
+    poll_interval_s=settings.jobs_poll_interval_s,
+    retention_s=settings.jobs_retention_s,
+)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from dataclasses import dataclass, asdict
+from typing import Any
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from app.api.responses import dumps
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    mode: str
+    lang: str
+    model: str
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: dict[str, Any] | None = None
+    meta: dict[str, Any] | None = None
+    # Authenticated tenant that submitted the job; scheduled under its quotas
+    tenant: str | None = None
+
+    def summary(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("result")
+        data.pop("meta")
+        data["job_id"] = data.pop("id")
+        return data
+
+
+class JobStore:
+    """Durable job queue interface.
+
+    The scheduler only talks to this interface, so the sqlite implementation
+    can be replaced by a shared one (e.g. Redis) without touching callers.
+    """
+
+    def create(self, mode: str, lang: str, model: str, content: bytes, tenant: str | None = None) -> Job:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Job | None:
+        raise NotImplementedError
+
+    def claim_next(self) -> Job | None:
+        """Atomically move the oldest queued job to running and return it."""
+        raise NotImplementedError
+
+    def load_input(self, job_id: str) -> bytes | None:
+        raise NotImplementedError
+
+    def complete(self, job_id: str, result: dict[str, Any], meta: dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str) -> bool:
+        raise NotImplementedError
+
+    def requeue(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> Job | None:
+        raise NotImplementedError
+
+    def recover(self) -> int:
+        """Requeue jobs left running by a previous process; returns how many."""
+        raise NotImplementedError
+
+    def prune(self, older_than_s: float) -> int:
+        raise NotImplementedError
+
+    def counts(self) -> dict[str, int]:
+        raise NotImplementedError
+
+
+class SqliteJobStore(JobStore):
+    def __init__(self, path: str) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, mode TEXT, lang TEXT, model TEXT, "
+                "created_at REAL, started_at REAL, finished_at REAL, error TEXT, result TEXT, meta TEXT)"
+            )
+            # Stores created before jobs carried a tenant
+            if "tenant" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS job_inputs (id TEXT PRIMARY KEY, content BLOB)")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            status=row["status"],
+            mode=row["mode"],
+            lang=row["lang"],
+            model=row["model"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            error=row["error"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            meta=json.loads(row["meta"]) if row["meta"] else None,
+            tenant=row["tenant"],
+        )
+
+    def create(self, mode: str, lang: str, model: str, content: bytes, tenant: str | None = None) -> Job:
+        job = Job(id=uuid.uuid4().hex, status=QUEUED, mode=mode, lang=lang, model=model, created_at=time.time(), tenant=tenant)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, mode, lang, model, created_at, tenant) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.mode, job.lang, job.model, job.created_at, job.tenant),
+            )
+            self._conn.execute("INSERT INTO job_inputs VALUES (?, ?)", (job.id, content))
+            self._conn.execute("COMMIT")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim_next(self) -> Job | None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, now, row["id"]))
+            self._conn.execute("COMMIT")
+        job = self._row_to_job(row)
+        job.status, job.started_at = RUNNING, now
+        return job
+
+    def load_input(self, job_id: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM job_inputs WHERE id = ?", (job_id,)).fetchone()
+        return bytes(row["content"]) if row else None
+
+    def _finish(self, job_id: str, status: str, **fields: Any) -> bool:
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            # Only a running job can finish; a job cancelled mid-flight stays cancelled
+            cur = self._conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, {assignments} WHERE id = ? AND status = ?",
+                (status, time.time(), *fields.values(), job_id, RUNNING),
+            )
+            self._conn.execute("DELETE FROM job_inputs WHERE id = ?", (job_id,))
+            self._conn.execute("COMMIT")
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, result: dict[str, Any], meta: dict[str, Any]) -> bool:
+        # The stored result is what GET /jobs/{id}/result returns: render boxes as JSON here
+        return self._finish(job_id, SUCCEEDED, result=dumps(result).decode(), meta=json.dumps(meta))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._finish(job_id, FAILED, error=error)
+
+    def requeue(self, job_id: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE id = ? AND status = ?", (QUEUED, job_id, RUNNING))
+        return cur.rowcount == 1
+
+    def cancel(self, job_id: str) -> Job | None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+            )
+            self._conn.execute("DELETE FROM job_inputs WHERE id = ? AND EXISTS (SELECT 1 FROM jobs WHERE id = ? AND status = ?)", (job_id, job_id, CANCELLED))
+            self._conn.execute("COMMIT")
+        return self.get(job_id)
+
+    def recover(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+        return cur.rowcount
+
+    def prune(self, older_than_s: float) -> int:
+        cutoff = time.time() - older_than_s
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*TERMINAL, cutoff),
+            )
+        return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def create_store(url: str) -> JobStore:
+    """Build a JobStore from a ``sqlite://`` URL.
+
+    As in SQLAlchemy, three slashes take a path relative to the working
+    directory (``sqlite:///ocr-jobs.sqlite``) and four an absolute one
+    (``sqlite:////var/lib/ocr/jobs.sqlite``); ``sqlite://`` alone is in-memory.
+    """
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite://"):]
+        if path.startswith("/"):
+            path = path[1:]
+        return SqliteJobStore(path or ":memory:")
+    raise ValueError(f"Unsupported job store URL: {url}")
@@ -1,19 +1,38 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from app.core.startup import startup, require_ready
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi import Depends
 from app.core.config import settings
 from app.core.logging import configure_logging
+from app.core import metrics
+from app.core.telemetry import sampler
 from app.api.schemas import StandardResponse, ok, fail
+from app.api.responses import FastJSONResponse, respond
 from app.api import errors as error_handlers
-from app.ocr.engine import OcrEngine
-from app.api.auth import require_auth
+from app.ocr.registry import registry
+from app.ocr.breaker import BackendUnavailable, InferenceFailed, breakers
+from app.ocr.executor import executor, QueueFullError, InferenceTimeout
+from app.ocr.pipeline import metric_labels, run_batch, SUPPORTED_MODES, REGIONS_MODE
+from app.ocr.regions import RegionError, parse_regions, templates
+from app.ocr.autolang import AUTO_LANG
+from app.ocr.preprocess import prepare
+from app.ocr.service import run_cached
+from app.ocr.tenants import BATCH, RateLimited, tenant_scheduler
+from app.api.auth import Principal, require_auth
 from app.middleware.request_id import RequestIdMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.body_limit import BodySizeLimitMiddleware
+from app.api.uploads import read_upload, UploadTooLarge
 from app.routes.debug import router as debug_router
-from PIL import Image
-from io import BytesIO
+from app.routes.jobs import router as jobs_router
+from app.routes.documents import router as documents_router
+from app.jobs.scheduler import scheduler
+import asyncio
 import structlog
-import subprocess
+from time import perf_counter
 from typing import Any, List
+from dataclasses import replace
 import os
 
 
@@ -21,9 +40,23 @@ configure_logging()
 log = structlog.get_logger()
 
 app = FastAPI(title="OCR FastAPI Backend")
-# Optional model preload on startup
-@app.on_event("startup")
-async def startup_preload():
+startup.mark_imported()
+
+
+def _import_backend() -> None:
+    from app.ocr.paddle_backend import _paddle_available, load_paddleocr
+
+    if _paddle_available and settings.ocr_backend == "paddle":
+        load_paddleocr()
+
+
+async def _warmup() -> None:
+    # Heavy imports and model preload run off the loop, after the port is open
+    with startup.phase("import_paddleocr"):
+        try:
+            await asyncio.to_thread(_import_backend)
+        except Exception:
+            log.warning("paddleocr_import_failed")
     if settings.preload_models:
         # Determine languages to preload: PRELOAD_LANGS env (comma-separated) or default_lang
         raw_langs = os.getenv("PRELOAD_LANGS")
@@ -35,11 +68,33 @@ async def startup_preload():
         for lang in dict.fromkeys(preload_langs):  # preserve order, dedupe
             try:
                 log.info("preload_model", lang=lang, model=settings.model_default)
-                OcrEngine(lang=lang, model=settings.model_default)
+                with startup.phase(f"preload:{lang}"):
+                    await asyncio.to_thread(registry.preload, lang, settings.model_default)
             except Exception:
                 # best-effort preload; continue on errors
                 log.warning("preload_failed", lang=lang, model=settings.model_default)
 
+
+# Warm-up (PaddleOCR import + optional model preload) in the background; ready when done
+@app.on_event("startup")
+async def startup_warmup():
+    startup.start_warmup(_warmup)
+
+
+@app.on_event("startup")
+async def startup_jobs():
+    scheduler.start()
+    sampler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    await startup.stop()
+    await scheduler.stop()
+    await sampler.stop()
+    executor.shutdown()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins or ["*"],
@@ -47,7 +102,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+# Inside RequestIdMiddleware: profiles are keyed by its request id
+app.add_middleware(ProfilingMiddleware)
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(BodySizeLimitMiddleware)
 
 # Minimal access log middleware
 @app.middleware("http")
@@ -58,156 +116,199 @@ async def access_log(request, call_next):
         response = await call_next(request)
         return response
     finally:
-        duration_ms = int((perf_counter() - started) * 1000)
+        elapsed = perf_counter() - started
+        duration_ms = int(elapsed * 1000)
+        route = request.scope.get("route")
+        metrics.HTTP_SECONDS.observe(elapsed, method=request.method, path=getattr(route, "path", "unmatched"), status=getattr(response, "status_code", 0))
         log.bind(method=request.method, path=request.url.path, status=getattr(response, "status_code", 0), latency_ms=duration_ms)
         log.info("access")
 
 # Routers
 app.include_router(debug_router)
+app.include_router(jobs_router)
+app.include_router(documents_router)
 
 # Exception handlers
 app.add_exception_handler(HTTPException, error_handlers.http_exception_handler)
+app.add_exception_handler(QueueFullError, error_handlers.queue_full_handler)
+app.add_exception_handler(RateLimited, error_handlers.rate_limited_handler)
+app.add_exception_handler(InferenceTimeout, error_handlers.inference_timeout_handler)
+app.add_exception_handler(BackendUnavailable, error_handlers.backend_unavailable_handler)
+app.add_exception_handler(InferenceFailed, error_handlers.inference_failed_handler)
 app.add_exception_handler(Exception, error_handlers.unhandled_exception_handler)
 
 
 @app.get("/health")
 async def health():
-    gpu: dict[str, Any] = {"visible": False}
-    paddle_info: dict[str, Any] = {"version": None, "compiled_with_cuda": None}
-    paddleocr_version: str | None = None
-    # Collect Paddle/PaddleOCR versions dynamically if available
-    try:
-        import paddle  # type: ignore
+    # Served from the sampler's snapshot: no imports, NVML or subprocesses per probe
+    snap = sampler.snapshot()
+    # Backends whose circuit is not closed are being served by a fallback (or refused)
+    degraded = [name for name, b in breakers.snapshot().items() if b["state"] != "closed"]
+    data = {"status": "degraded" if degraded else "ok", "ready": startup.ready, "gpu": snap["gpu"], "version": snap["version"]}
+    if degraded:
+        data["degraded_backends"] = degraded
+    return data
 
-        paddle_info["version"] = getattr(paddle, "__version__", None)
-        try:
-            paddle_info["compiled_with_cuda"] = bool(paddle.is_compiled_with_cuda())
-        except Exception:
-            paddle_info["compiled_with_cuda"] = None
-    except Exception:
-        paddle_info = {"version": None, "compiled_with_cuda": None}
-    try:
-        import paddleocr  # type: ignore
 
-        paddleocr_version = getattr(paddleocr, "__version__", None)
-    except Exception:
-        paddleocr_version = None
-    try:
-        # Prefer NVML if available
-        try:
-            import pynvml  # type: ignore
-
-            pynvml.nvmlInit()
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            util = pynvml.nvmlDeviceGetUtilizationRates(handle)
-            mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
-            gpu = {
-                "visible": True,
-                "utilization": int(util.gpu),
-                "memory_used_mb": int(mem.used / (1024 * 1024)),
-            }
-            pynvml.nvmlShutdown()
-        except Exception:
-            out = subprocess.check_output(
-                [
-                    "nvidia-smi",
-                    "--query-gpu=utilization.gpu,memory.used",
-                    "--format=csv,noheader,nounits",
-                ],
-                stderr=subprocess.STDOUT,
-                timeout=1,
-            ).decode().strip()
-            if out:
-                util, mem = out.split(",")
-                gpu = {"visible": True, "utilization": int(util.strip()), "memory_used_mb": int(mem.strip())}
-    except Exception:
-        gpu = {"visible": False}
-    return {
-        "status": "ok",
-        "gpu": gpu,
-        "version": {"paddleocr": paddleocr_version, "paddlepaddle": paddle_info["version"], "compiled_with_cuda": paddle_info["compiled_with_cuda"]},
-    }
-
-
-@app.post("/ocr", response_model=StandardResponse, dependencies=[Depends(require_auth)])
-async def ocr(file: UploadFile = File(...), lang: str = settings.default_lang, mode: str = "recognition", model: str = settings.model_default):
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    if not startup.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "ready": False})
+    return {"status": "ok", "ready": True, "models": [f"{lang}/{model}/{device}" for lang, model, device in registry.loaded()]}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    metrics.INFLIGHT.set(executor.inflight)
+    metrics.CAPACITY.set(executor.capacity)
+    metrics.RESIDENT_MODELS.set(len(registry.loaded()))
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/ocr", response_model=StandardResponse, dependencies=[Depends(require_ready)])
+async def ocr(
+    request: Request,
+    principal: Principal = Depends(require_auth),
+    file: UploadFile = File(...),
+    lang: str = settings.default_lang,
+    mode: str = "recognition",
+    model: str = settings.model_default,
+    regions: str | None = None,
+    template: str | None = None,
+    cls: bool | None = None,
+):
     # Normalize and validate language against allowed list
     lang = (lang or settings.default_lang).strip().lower()
-    if settings.allowed_langs and lang not in settings.allowed_langs:
+    if settings.allowed_langs and lang not in settings.allowed_langs and lang != AUTO_LANG:
         return fail("BadRequest", "Unsupported language code", {"lang": lang, "allowed": settings.allowed_langs})
-    # Guard by size if available (UploadFile.size may be undefined)
-    try:
-        size_attr = getattr(file, "size", None)
-        if size_attr is not None and size_attr > settings.max_file_mb * 1024 * 1024:
-            return fail("PayloadTooLarge", "File too large")
-    except Exception:
-        pass
-    # Optional server-side image size guard
-    buf = await file.read()
-    if settings.max_image_px:
+    spec = None
+    if mode == REGIONS_MODE:
+        if lang == AUTO_LANG:
+            return fail("BadRequest", "lang=auto is not supported with regions", {"mode": mode})
         try:
-            im = Image.open(BytesIO(buf))
-            w, h = im.size
-            if max(w, h) > settings.max_image_px:
-                im.thumbnail((settings.max_image_px, settings.max_image_px))
-                out = BytesIO()
-                im.save(out, format="PNG")
-                buf = out.getvalue()
-        except Exception:
-            # If not an image, skip resizing and proceed (tests send text/plain)
-            pass
-    content = buf
-    engine = OcrEngine(lang=lang, model=model)
-    if mode == "recognition":
-        res = engine.recognize(content)
-        return ok({"text": res.text, "boxes": [
-            {"box": b.points, "text": b.text, "score": b.score} for b in res.boxes
-        ]}, meta={"lang": lang, "mode": mode, "model": model})
-    if mode == "parsing":
-        res = engine.parse_structure(content)
-        return ok({"structure": {"tables": res.tables, "markdown": res.markdown}}, meta={"lang": lang, "mode": mode, "model": model})
-    if mode == "extraction":
-        res = engine.extract_info(content)
-        return ok({"extraction": {"entities": res.entities}}, meta={"lang": lang, "mode": mode, "model": model})
-    return fail("BadRequest", "Unsupported mode", {"mode": mode})
-
-
-@app.post("/structure", response_model=StandardResponse, dependencies=[Depends(require_auth)])
-async def structure(file: UploadFile = File(...), lang: str = settings.default_lang, model: str = settings.model_default):
-    content = await file.read()
-    engine = OcrEngine(lang=lang, model=model)
-    res = engine.parse_structure(content)
-    return ok({"structure": {"tables": res.tables, "markdown": res.markdown}})
-
-
-@app.post("/extraction", response_model=StandardResponse, dependencies=[Depends(require_auth)])
-async def extraction(file: UploadFile = File(...), lang: str = settings.default_lang, model: str = settings.model_default):
-    content = await file.read()
-    engine = OcrEngine(lang=lang, model=model)
-    res = engine.extract_info(content)
-    return ok({"extraction": {"entities": res.entities}})
+            if template:
+                spec = templates.get(template)
+                spec = spec if cls is None else replace(spec, cls=cls)
+            elif regions:
+                spec = parse_regions(regions, cls)
+            else:
+                return fail("BadRequest", "mode=regions needs regions or template", {"mode": mode})
+        except RegionError as exc:
+            return fail("BadRequest", str(exc), {"mode": mode, "template": template})
+    elif mode not in SUPPORTED_MODES:
+        return fail("BadRequest", "Unsupported mode", {"mode": mode})
+    tenant_scheduler.charge(principal.tenant)
+    with metrics.recording() as rec:
+        # Failed and rejected requests count too, or the histograms only show successes
+        try:
+            with metrics.stage("upload_read"):
+                try:
+                    content = await read_upload(file)
+                except UploadTooLarge:
+                    return fail("PayloadTooLarge", "File too large")
+            result, cache_meta = await run_cached(mode, content, lang, model, resize=True, tenant=principal.tenant, regions=spec)
+            with metrics.stage("serialization"):
+                meta = {"lang": lang, "mode": mode, "model": model, **cache_meta}
+                if template:
+                    meta["template"] = template
+                return respond(request, ok(result, meta=meta))
+        finally:
+            metrics.apply(rec.export(), **metric_labels(mode, lang, model))
+
+
+@app.post("/structure", response_model=StandardResponse, dependencies=[Depends(require_ready)])
+async def structure(request: Request, principal: Principal = Depends(require_auth), file: UploadFile = File(...), lang: str = settings.default_lang, model: str = settings.model_default):
+    tenant_scheduler.charge(principal.tenant)
+    with metrics.recording() as rec:
+        try:
+            with metrics.stage("upload_read"):
+                try:
+                    content = await read_upload(file)
+                except UploadTooLarge:
+                    return fail("PayloadTooLarge", "File too large")
+            result, cache_meta = await run_cached("parsing", content, lang, model, tenant=principal.tenant)
+            with metrics.stage("serialization"):
+                return respond(request, ok(result, meta=cache_meta))
+        finally:
+            metrics.apply(rec.export(), **metric_labels("parsing", lang, model))
+
+
+@app.post("/extraction", response_model=StandardResponse, dependencies=[Depends(require_ready)])
+async def extraction(request: Request, principal: Principal = Depends(require_auth), file: UploadFile = File(...), lang: str = settings.default_lang, model: str = settings.model_default):
+    tenant_scheduler.charge(principal.tenant)
+    with metrics.recording() as rec:
+        try:
+            with metrics.stage("upload_read"):
+                try:
+                    content = await read_upload(file)
+                except UploadTooLarge:
+                    return fail("PayloadTooLarge", "File too large")
+            result, cache_meta = await run_cached("extraction", content, lang, model, tenant=principal.tenant)
+            with metrics.stage("serialization"):
+                return respond(request, ok(result, meta=cache_meta))
+        finally:
+            metrics.apply(rec.export(), **metric_labels("extraction", lang, model))
 
 
 # Batch processing endpoint to support 6.3 (batch option)
-@app.post("/ocr/batch", response_model=StandardResponse, dependencies=[Depends(require_auth)])
-async def ocr_batch(files: List[UploadFile] = File(...), lang: str = settings.default_lang, mode: str = "recognition", model: str = settings.model_default):
-    engine = OcrEngine(lang=lang, model=model)
-    results: list[dict[str, Any]] = []
-    for f in files:
+@app.post("/ocr/batch", response_model=StandardResponse, dependencies=[Depends(require_ready)])
+async def ocr_batch(principal: Principal = Depends(require_auth), files: List[UploadFile] = File(...), lang: str = settings.default_lang, mode: str = "recognition", model: str = settings.model_default):
+    started = perf_counter()
+    if mode not in SUPPORTED_MODES:
+        results = [{"error": "BadRequest"} for _ in files]
+        return ok({"items": results}, meta={"count": len(results), "mode": mode, "model": model})
+    # Rate limits count images, so one large batch costs as much as many single calls
+    tenant_scheduler.charge(principal.tenant, len(files))
+    rec = metrics.Recorder()
+    results: list[dict[str, Any]] = [{} for _ in files]
+    t_read = perf_counter()
+    bufs = await asyncio.gather(*(read_upload(f) for f in files), return_exceptions=True)
+    rec.add("upload_read", perf_counter() - t_read)
+
+    async def decode(idx: int, buf: bytes) -> Any:
+        t0 = perf_counter()
+        image = await asyncio.to_thread(prepare, buf)
+        elapsed = perf_counter() - t0
+        rec.add("decode", elapsed)
+        results[idx]["decode_ms"] = int(elapsed * 1000)
+        return image
+
+    pending = [i for i, b in enumerate(bufs) if not isinstance(b, BaseException)]
+    for i, b in enumerate(bufs):
+        if isinstance(b, BaseException):
+            results[i]["error"] = "PayloadTooLarge" if isinstance(b, UploadTooLarge) else "BadImage"
+    images = await asyncio.gather(*(decode(i, bufs[i]) for i in pending))
+
+    size = max(1, settings.ocr_batch_size)
+    chunks = [(pending[k:k + size], images[k:k + size]) for k in range(0, len(pending), size)]
+
+    async def run_chunk(indices: list[int], chunk: list[Any]) -> None:
         try:
-            buf = await f.read()
-        except Exception:
-            results.append({"error": "BadImage"})
-            continue
-        if mode == "recognition":
-            r = engine.recognize(buf)
-            results.append({"text": r.text, "boxes": [{"box": b.points, "text": b.text, "score": b.score} for b in r.boxes]})
-        elif mode == "parsing":
-            r = engine.parse_structure(buf)
-            results.append({"structure": {"tables": r.tables, "markdown": r.markdown}})
-        elif mode == "extraction":
-            r = engine.extract_info(buf)
-            results.append({"extraction": {"entities": r.entities}})
-        else:
-            results.append({"error": "BadRequest"})
-    return ok({"items": results}, meta={"count": len(results), "mode": mode, "model": model})
+            # Batch chunks queue behind interactive requests
+            async with tenant_scheduler.slot(principal.tenant, BATCH):
+                with metrics.recording() as chunk_rec:
+                    items, worker_metrics = await executor.run(run_batch, mode, chunk, lang, model)
+            for name, secs in {**chunk_rec.stages, **worker_metrics["stages"]}.items():
+                rec.add(name, secs)
+            rec.counts.extend(worker_metrics["counts"])
+        except QueueFullError:
+            items = [{"error": "Overloaded"} for _ in indices]
+        except InferenceTimeout:
+            items = [{"error": "Timeout"} for _ in indices]
+        done_ms = int((perf_counter() - started) * 1000)
+        for idx, item in zip(indices, items):
+            results[idx].update(item)
+            results[idx]["latency_ms"] = done_ms
+
+    await asyncio.gather(*(run_chunk(ix, ch) for ix, ch in chunks))
+    latency_ms = int((perf_counter() - started) * 1000)
+    t_ser = perf_counter()
+    response = FastJSONResponse(ok({"items": results}, meta={"count": len(results), "mode": mode, "model": model, "batch_size": size, "chunks": len(chunks), "latency_ms": latency_ms}))
+    rec.add("serialization", perf_counter() - t_ser)
+    metrics.apply(rec.export(), **metric_labels(mode, lang, model))
+    return response
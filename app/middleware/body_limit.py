@@ -0,0 +1,58 @@
+from __future__ import annotations
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.api.schemas import fail
+from app.core.config import settings
+
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, limit: int) -> None:
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit} bytes")
+
+
+class BodySizeLimitMiddleware:
+    """Reject oversized request bodies while they stream in.
+
+    A declared ``Content-Length`` above the limit is refused before any body is
+    read. Otherwise bytes are counted as the ASGI server delivers them and the
+    request is aborted as soon as the running total passes the limit, so the
+    multipart parser never buffers more than ``max_bytes``.
+
+    Pure ASGI (not BaseHTTPMiddleware) so it wraps ``receive`` directly.
+    Without an explicit ``max_bytes`` the limit follows ``max_request_mb``.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int | None = None) -> None:
+        self.app = app
+        self._max_bytes = max_bytes
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return settings.max_request_mb * 1024 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_bytes = self.max_bytes
+        if scope["type"] != "http" or not max_bytes:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+            response = JSONResponse(status_code=413, content=fail("413", "Request body too large", {"limit_bytes": max_bytes}).model_dump())
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Surfaces through FastAPI's body parsing as a regular 413 HTTPException
+                    raise RequestTooLarge(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import structlog
+from app.core import profiling
+from app.core.config import settings
+
+
+class ProfilingMiddleware:
+    """Trace or profile requests sent with ``X-Debug-Profile`` when ``DEBUG_PROFILING`` is on.
+
+    Plain ASGI, so requests without the header (or with profiling off) pass
+    straight through. The profile is kept only if the request passed
+    ``require_auth``, under a server-generated id returned in
+    ``X-Debug-Profile-Id``, and is read back from the authenticated
+    ``/debug/profiles`` routes.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.debug_profiling:
+            await self.app(scope, receive, send)
+            return
+        mode = Headers(scope=scope).get(profiling.PROFILE_HEADER, "").strip().lower()
+        if mode not in (profiling.TRACE, profiling.PROFILE):
+            await self.app(scope, receive, send)
+            return
+        # Bound by RequestIdMiddleware, which wraps this one; kept for log correlation only
+        request_id = structlog.contextvars.get_contextvars().get("request_id", "")
+        with profiling.session(request_id, scope["path"], mode) as profile:
+
+            async def send_with_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    profile.status = message["status"]
+                    if profile.tenant is not None:
+                        # Stored now so the id is usable as soon as the caller sees it;
+                        # the duration is filled in when the response is complete
+                        profiling.profiles.put(profile)
+                        MutableHeaders(scope=message).append("X-Debug-Profile-Id", profile.id)
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, List, Sequence, Tuple
+import numpy as np
+
+
+@dataclass
+class TextBoxes:
+    """Columnar text boxes for one image.
+
+    ``points`` is ``(N, 4, 2)`` int32, ``scores`` is ``(N,)`` float32 and
+    ``texts`` holds the N strings. Dense pages carry thousands of boxes, so
+    they stay in arrays until the response is built instead of becoming one
+    Python object per point.
+    """
+
+    points: np.ndarray
+    texts: List[str]
+    scores: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "TextBoxes":
+        return cls(np.zeros((0, 4, 2), dtype=np.int32), [], np.zeros(0, dtype=np.float32))
+
+    @classmethod
+    def build(cls, points: Any, texts: Sequence[str], scores: Any) -> "TextBoxes":
+        if len(texts) == 0:
+            return cls.empty()
+        # astype truncates toward zero, matching the int() the per-point code used
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 4, 2).astype(np.int32)
+        return cls(pts, list(texts), np.asarray(scores, dtype=np.float32).reshape(-1))
+
+    @classmethod
+    def from_dicts(cls, boxes: Sequence[dict[str, Any]]) -> "TextBoxes":
+        """Rebuild from the JSON payload form (``{"box", "text", "score"}`` dicts)."""
+        return cls.build([b["box"] for b in boxes], [b["text"] for b in boxes], [b["score"] for b in boxes])
+
+    @classmethod
+    def concat(cls, parts: Sequence["TextBoxes"]) -> "TextBoxes":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        return cls(np.concatenate([p.points for p in parts]), [t for p in parts for t in p.texts], np.concatenate([p.scores for p in parts]))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def take(self, index: Any) -> "TextBoxes":
+        index = np.asarray(index, dtype=np.int64)
+        return TextBoxes(self.points[index], [self.texts[i] for i in index.tolist()], self.scores[index])
+
+    def shifted(self, dx: int, dy: int) -> "TextBoxes":
+        return TextBoxes(self.points + np.array([dx, dy], dtype=np.int32), self.texts, self.scores)
+
+    def to_dicts(self) -> list[dict[str, Any]]:
+        # One tolist() per column instead of per-point tuple building
+        return [{"box": p, "text": t, "score": s} for p, t, s in zip(self.points.tolist(), self.texts, self.scores.tolist())]
+
+
+@dataclass
+class AnalysisContext:
+    """Per-request memo of intermediate OCR results.
+
+    One context follows a single input through every stage that runs on it,
+    so the structure fallback and extraction reuse the decoded array,
+    detection boxes and recognition output instead of recomputing them
+    (including the retry of a failed call on the fallback device).
+    """
+
+    image: np.ndarray | None = None
+    boxes: List[np.ndarray] | None = None
+    recognition: Tuple[str, TextBoxes] | None = None
+    structure: dict[str, Any] | None = None
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Dict, List
+import numpy as np
+from app.core import metrics
+from app.core.config import settings
+from .analysis import AnalysisContext, TextBoxes
+from .engine import OcrEngine, RecognitionResult
+from .registry import get_engine
+
+
+AUTO_LANG = "auto"
+
+AUTO_LANG_BOXES = metrics.REGISTRY.counter("ocr_auto_lang_boxes_total", "Boxes recognized under lang=auto, by routed language")
+
+
+def candidates() -> List[str]:
+    """Languages ``lang=auto`` routes between, in preference order."""
+    langs = [lang for lang in settings.auto_langs if not settings.allowed_langs or lang in settings.allowed_langs]
+    return list(dict.fromkeys(langs)) or [settings.default_lang]
+
+
+def _sample(n: int, k: int) -> List[int]:
+    """Up to ``k`` crop indices spread evenly over the page (reading order)."""
+    if n <= k:
+        return list(range(n))
+    return sorted(set(np.linspace(0, n - 1, max(1, k)).round().astype(int).tolist()))
+
+
+def recognize_auto(content: Any, model: str, ctx: AnalysisContext | None = None, langs: List[str] | None = None) -> RecognitionResult:
+    """Recognize mixed-language input with one detection pass.
+
+    Detection runs once with the first candidate's engine (PP-OCR detectors
+    are script-agnostic). Every candidate recognizer then scores an evenly
+    spread sample of crops; the winners tell which languages are on the page.
+    The remaining crops go to the most frequent language first, and only
+    crops it reads below ``AUTO_LANG_MIN_SCORE`` cascade to the next one, so
+    a single-language page costs one detection, a small probe and one
+    recognition pass instead of a full pass per candidate. Engines come from
+    the shared registry.
+    """
+    langs = langs or candidates()
+    engines: Dict[str, OcrEngine] = {lang: get_engine(lang, model) for lang in langs}
+    probe = engines[langs[0]]
+    if not probe.splittable:
+        # Stub or an opaque backend: nothing to route, answer with the first candidate
+        metrics.count("ocr_fallbacks_total", op="recognize_auto", reason="unsplittable")
+        res = probe.recognize(content, ctx)
+        res.langs = [langs[0]] * len(res.boxes)
+        return res
+    if ctx is not None and ctx.recognition is not None:
+        text, boxes = ctx.recognition
+        return RecognitionResult(text=text, boxes=boxes)
+    boxes, crops = probe.detect_crops(content, ctx)
+    n = len(crops)
+    best: List[tuple[str, float] | None] = [None] * n
+    routed: List[str] = [langs[0]] * n
+
+    sample = _sample(n, settings.auto_lang_sample_size)
+    wins: Counter[str] = Counter()
+    if len(langs) > 1 and sample:
+        with metrics.stage("lang_probe"):
+            probed = {lang: engine.recognize_crops([crops[i] for i in sample]) for lang, engine in engines.items()}
+        scores = np.array([[score for _, score in probed[lang]] for lang in langs], dtype=np.float64)
+        # Ties go to the earlier candidate (argmax returns the first maximum)
+        for j, i in enumerate(sample):
+            lang = langs[int(scores[:, j].argmax())]
+            best[i] = probed[lang][j]
+            routed[i] = lang
+            wins[lang] += 1
+    present = [lang for lang, _ in wins.most_common()] or langs[:1]
+
+    pending = [i for i in range(n) if best[i] is None]
+    for lang in present:
+        if not pending:
+            break
+        retry = []
+        for i, (text, score) in zip(pending, engines[lang].recognize_crops([crops[i] for i in pending])):
+            if best[i] is None or score > best[i][1]:  # type: ignore[index]
+                best[i] = (text, score)
+                routed[i] = lang
+            if score < settings.auto_lang_min_score:
+                retry.append(i)
+        pending = retry
+
+    results = [r for r in best if r is not None]
+    scores = np.fromiter((score for _, score in results), dtype=np.float64, count=len(results))
+    keep = np.flatnonzero(scores >= probe.drop_score).tolist()
+    texts = [results[i][0] for i in keep]
+    kept_langs = [routed[i] for i in keep]
+    points = np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)[keep]
+    out = TextBoxes.build(points, texts, scores[keep])
+    for lang, count in Counter(kept_langs).items():
+        metrics.count("ocr_auto_lang_boxes_total", count, lang=lang)
+    if ctx is not None:
+        ctx.recognition = (" ".join(texts), out)
+    return RecognitionResult(text=" ".join(texts), boxes=out, langs=kept_langs)
+
+
+def dominant(res: RecognitionResult, langs: List[str] | None = None) -> str:
+    """Most frequent routed language; the engine later stages (structure, extraction) use."""
+    if res.langs:
+        return Counter(res.langs).most_common(1)[0][0]
+    return (langs or candidates())[0]
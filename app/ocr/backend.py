@@ -0,0 +1,268 @@
+from __future__ import annotations
+from typing import Any, Callable
+from io import BytesIO
+from PIL import Image
+import numpy as np
+from app.core import metrics
+from .analysis import AnalysisContext, TextBoxes
+from .tiling import plan_tiles, suppress_duplicates
+
+
+class InvalidImage(ValueError):
+    """The input could not be decoded; says nothing about the backend's health."""
+
+
+def sorted_boxes(dt_boxes: Any) -> list[np.ndarray]:
+    # Same reading order as PaddleOCR's TextSystem: top-to-bottom, then left-to-right per line
+    boxes = sorted(list(dt_boxes), key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_box(image: np.ndarray, box: np.ndarray, rotate_crop: Callable[[np.ndarray, np.ndarray], np.ndarray] | None = None) -> np.ndarray:
+    pts = np.asarray(box, dtype=np.float32)
+    if rotate_crop is not None:
+        return rotate_crop(image, pts.copy())
+    # Axis-aligned fallback when no perspective-crop helper is available
+    h, w = image.shape[:2]
+    x0, y0 = np.clip(pts.min(axis=0).astype(int), 0, [w, h])
+    x1, y1 = np.clip(np.ceil(pts.max(axis=0)).astype(int), 0, [w, h])
+    return image[y0:y1, x0:x1]
+
+
+class OcrBackend:
+    """Inference backend behind ``OcrEngine``.
+
+    A backend provides two primitives, ``detect`` (boxes in reading order)
+    and ``recognize_crops`` (text and score per crop); recognition, tiling,
+    regions, batching and the text fallbacks for structure and extraction are
+    built on them here, so every backend gets the same per-stage timings and
+    ``AnalysisContext`` reuse. Backends that can only run detection and
+    recognition together return False from ``_split_available`` and
+    implement ``_recognize_whole`` / ``_recognize_lines`` instead.
+    """
+
+    # Reported in /health, startup and benchmark output
+    name = "base"
+    # Whether the backend honours OCR_DEVICE (and so can fall back to another device)
+    uses_device = False
+
+    def detect(self, image: np.ndarray) -> list[np.ndarray]:
+        """Text detection only; boxes come back in reading order."""
+        raise NotImplementedError
+
+    def recognize_crops(self, crops: list[np.ndarray], cls: bool = True) -> list[tuple[str, float]]:
+        """Angle classification (optional) and recognition over a list of crops."""
+        raise NotImplementedError
+
+    @property
+    def drop_score(self) -> float:
+        return 0.5
+
+    def _split_available(self) -> bool:
+        return True
+
+    def _recognize_whole(self, image: np.ndarray) -> tuple[str, TextBoxes]:
+        raise NotImplementedError
+
+    def _recognize_lines(self, crops: list[np.ndarray], cls: bool) -> list[tuple[str, float]]:
+        raise NotImplementedError
+
+    def _crop(self, image: np.ndarray, box: np.ndarray) -> np.ndarray:
+        return crop_box(image, box)
+
+    def _decode(self, content: Any) -> Any:
+        """Decode encoded input (bytes or any buffer, e.g. an mmap'd upload) to an RGB array.
+
+        Anything that does not decode raises ``InvalidImage``, so the breaker
+        never counts a client's bad upload against the backend.
+        """
+        try:
+            if hasattr(content, "read"):
+                content.seek(0)
+                img = Image.open(content).convert("RGB")
+            else:
+                img = Image.open(BytesIO(content)).convert("RGB")
+        except Exception as exc:
+            raise InvalidImage(str(exc)) from exc
+        return np.array(img)
+
+    def _image(self, image: Any | bytes, ctx: AnalysisContext | None) -> Any:
+        if ctx is not None and ctx.image is not None:
+            return ctx.image
+        if not isinstance(image, np.ndarray):
+            with metrics.stage("decode"):
+                image = self._decode(image)
+        if ctx is not None and isinstance(image, np.ndarray):
+            ctx.image = image
+        return image
+
+    def recognize(self, image: Any | bytes, ctx: AnalysisContext | None = None) -> tuple[str, TextBoxes]:
+        if ctx is not None and ctx.recognition is not None:
+            return ctx.recognition
+        image = self._image(image, ctx)
+        result = self._recognize(image, ctx)
+        if ctx is not None:
+            ctx.recognition = result
+        return result
+
+    def _recognize(self, image: Any, ctx: AnalysisContext | None) -> tuple[str, TextBoxes]:
+        if self._split_available():
+            # det -> crop -> cls -> rec, with per-stage timing
+            boxes, crops = self.detect_crops(image, ctx)
+            return self._format(boxes, self.recognize_crops(crops))
+        return self._recognize_whole(image)
+
+    def recognize_tiled(self, image: Any | bytes, tile_px: int, overlap_px: int, nms_threshold: float = 0.5, ctx: AnalysisContext | None = None) -> tuple[str, TextBoxes]:
+        """Recognize a large image at full resolution through overlapping tiles.
+
+        Detection runs per tile, so each detector call sees at most
+        ``tile_px`` squared pixels. Boxes are shifted to page coordinates and
+        de-duplicated across seams before recognition; crops are then cut from
+        the full image, so a line straddling a seam is recognized whole and
+        every crop goes through one batched recognition pass.
+        """
+        if ctx is not None and ctx.recognition is not None:
+            return ctx.recognition
+        image = self._image(image, ctx)
+        h, w = image.shape[:2]
+        tiles = plan_tiles(h, w, tile_px, overlap_px)
+        if self._split_available():
+            found: list[np.ndarray] = []
+            for y0, x0, y1, x1 in tiles:
+                found.extend(np.asarray(b, dtype=np.float32) + (x0, y0) for b in self.detect(image[y0:y1, x0:x1]))
+            with metrics.stage("tile_merge"):
+                keep = suppress_duplicates(np.stack(found), nms_threshold) if found else []
+                boxes = sorted_boxes([found[i] for i in keep])
+            if ctx is not None:
+                ctx.boxes = boxes
+            with metrics.stage("crop"):
+                crops = [self._crop(image, b) for b in boxes]
+            result = self._format(boxes, self.recognize_crops(crops))
+        else:
+            merged = TextBoxes.concat([self._recognize(image[y0:y1, x0:x1], None)[1].shifted(x0, y0) for y0, x0, y1, x1 in tiles])
+            with metrics.stage("tile_merge"):
+                keep = suppress_duplicates(merged.points, nms_threshold, merged.scores)
+                # Reading order by the first corner: top-to-bottom, then left-to-right
+                first = merged.points[keep, 0] if len(keep) else np.zeros((0, 2), dtype=np.int32)
+                kept = merged.take(keep[np.lexsort((first[:, 0], first[:, 1]))])
+            result = (" ".join(kept.texts), kept)
+        if ctx is not None:
+            ctx.recognition = result
+        return result
+
+    def recognize_regions(self, image: Any | bytes, boxes: np.ndarray, cls: bool = False) -> list[tuple[str, float]]:
+        """Recognition only, over known ``[x0, y0, x1, y1]`` pixel boxes.
+
+        Crops are numpy views into the decoded page (no copies) and go to the
+        recognizer as one batch; detection never runs. Empty boxes (fully
+        outside the image) come back as ``("", 0.0)``.
+        """
+        image = self._image(image, None)
+        with metrics.stage("crop"):
+            crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes.tolist()]
+        valid = [i for i, crop in enumerate(crops) if crop.size]
+        out: list[tuple[str, float]] = [("", 0.0)] * len(crops)
+        if self._split_available():
+            rec_res = self.recognize_crops([crops[i] for i in valid], cls=cls)
+        else:
+            rec_res = self._recognize_lines([crops[i] for i in valid], cls)
+        for i, (text, score) in zip(valid, rec_res):
+            out[i] = (str(text), float(score))
+        return out
+
+    def detect_crops(self, image: Any | bytes, ctx: AnalysisContext | None = None) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        """Detection plus crops cut from the image; boxes are memoized on ``ctx``."""
+        image = self._image(image, ctx)
+        if ctx is not None and ctx.boxes is not None:
+            boxes = ctx.boxes
+        else:
+            boxes = self.detect(image)
+            if ctx is not None:
+                ctx.boxes = boxes
+        with metrics.stage("crop"):
+            crops = [self._crop(image, b) for b in boxes]
+        return boxes, crops
+
+    def _format(self, boxes: list[np.ndarray], rec_res: list[tuple[str, float]]) -> tuple[str, TextBoxes]:
+        if not boxes or not rec_res:
+            return ("", TextBoxes.empty())
+        scores = np.fromiter((score for _, score in rec_res), dtype=np.float64, count=len(rec_res))
+        keep = np.flatnonzero(scores >= self.drop_score)
+        texts = [rec_res[i][0] for i in keep.tolist()]
+        points = np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)[keep]
+        return (" ".join(texts), TextBoxes.build(points, texts, scores[keep]))
+
+    def recognize_batch(self, images: list[Any | bytes]) -> list[tuple[str, TextBoxes] | Exception]:
+        """Recognize several images with one shared recognition pass.
+
+        Detection runs per image (it is shape-dependent); every crop from every
+        image is then fed to the recognizer together. Per-image failures are
+        returned in place as exceptions so the caller can report them per item.
+        """
+        if not self._split_available():
+            out: list[tuple[str, TextBoxes] | Exception] = []
+            for image in images:
+                try:
+                    out.append(self.recognize(image))
+                except Exception as exc:
+                    out.append(exc)
+            return out
+        results: list[tuple[str, TextBoxes] | Exception | None] = [None] * len(images)
+        all_crops: list[np.ndarray] = []
+        spans: list[tuple[int, list[np.ndarray], int, int]] = []
+        for idx, image in enumerate(images):
+            try:
+                if not isinstance(image, np.ndarray):
+                    with metrics.stage("decode"):
+                        image = self._decode(image)
+                boxes = self.detect(image)
+                start = len(all_crops)
+                with metrics.stage("crop"):
+                    all_crops.extend(self._crop(image, b) for b in boxes)
+                spans.append((idx, boxes, start, len(all_crops)))
+            except Exception as exc:
+                results[idx] = exc
+        rec_res = self.recognize_crops(all_crops)
+        for idx, boxes, start, end in spans:
+            results[idx] = self._format(boxes, rec_res[start:end])
+        return results  # type: ignore[return-value]
+
+    def parse_structure(self, image: Any | bytes, ctx: AnalysisContext | None = None) -> dict:
+        if ctx is not None and ctx.structure is not None:
+            return ctx.structure
+        image = self._image(image, ctx)
+        data = self._parse_structure(image, ctx)
+        if ctx is not None:
+            ctx.structure = data
+        return data
+
+    def _parse_structure(self, image: Any, ctx: AnalysisContext | None) -> dict:
+        # No layout/table model in this backend
+        metrics.count("ocr_fallbacks_total", op="parse_structure", reason="unsupported")
+        return self._text_structure(image, ctx)
+
+    def _text_structure(self, image: Any, ctx: AnalysisContext | None) -> dict:
+        # OCR text as markdown-like output (reuses ctx recognition when present)
+        text, _ = self.recognize(image, ctx)
+        return {"tables": [], "markdown": text}
+
+    def extract(self, image: Any | bytes, ctx: AnalysisContext | None = None) -> dict:
+        image = self._image(image, ctx)
+        # Placeholder: ChatOCRv4/ERNIE PoC hook — gated by settings
+        try:
+            from app.core.config import settings  # lazy import to avoid cycles
+            if getattr(settings, "chatocr_enabled", False) and settings.chatocr_api_token:
+                # PoC: enrich with a dummy entity indicating ChatOCR path used
+                text, _ = self.recognize(image, ctx)
+                return {"entities": [{"text": text, "type": "chatocr_poc"}]}
+        except Exception:
+            pass
+        # Default fallback
+        text, _ = self.recognize(image, ctx)
+        return {"entities": [{"text": text, "type": "summary"}]}
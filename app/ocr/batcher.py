@@ -0,0 +1,93 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Set, Tuple
+import asyncio
+from app.core import metrics
+from app.core.config import settings
+from .executor import executor
+from .pipeline import run_recognition_batch
+
+
+BATCH_SIZE = metrics.REGISTRY.histogram("ocr_microbatch_size", "Requests per micro-batch forward pass", buckets=(1, 2, 4, 8, 16, 32, 64))
+BATCH_FILL = metrics.REGISTRY.histogram("ocr_microbatch_fill_ratio", "Micro-batch size / max batch size", buckets=(0.125, 0.25, 0.5, 0.75, 1.0))
+BATCH_FLUSHES = metrics.REGISTRY.counter("ocr_microbatch_flushes_total", "Micro-batch flushes by trigger")
+
+BatchKey = Tuple[str, str, Any]
+
+
+@dataclass
+class _Pending:
+    items: List[Tuple[Any, asyncio.Future]] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+    flushed: float | None = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-image recognition requests into shared passes.
+
+    Requests for the same (lang, model) key are collected until ``max_size``
+    items are waiting or ``max_wait_ms`` has passed since the first one, then
+    run as one batch on the inference pool. Each caller gets its own result
+    (or the batch's exception) through its own future.
+    """
+
+    def __init__(self, max_size: int = 8, max_wait_ms: float = 10, runner: Callable[..., Any] = run_recognition_batch) -> None:
+        self.max_size = max(1, int(max_size))
+        self.max_wait_s = max(0.0, max_wait_ms / 1000)
+        self.runner = runner
+        self._pending: Dict[BatchKey, _Pending] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, content: Any, lang: str, model: str, max_px: int | None = None) -> tuple[dict[str, Any], dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        key = (lang, model, max_px)
+        fut: asyncio.Future = loop.create_future()
+        pending = self._pending.setdefault(key, _Pending())
+        pending.items.append((content, fut))
+        enqueued = perf_counter()
+        if len(pending.items) >= self.max_size:
+            self._flush(key, "full")
+        elif pending.timer is None:
+            pending.timer = loop.call_later(self.max_wait_s, self._flush, key, "timeout")
+        try:
+            return await fut
+        finally:
+            # Time spent waiting for the batch to fill, separate from queue_wait/inference
+            metrics.record("batch_wait", (pending.flushed or perf_counter()) - enqueued)
+
+    def _flush(self, key: BatchKey, reason: str) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is None or not pending.items:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        pending.flushed = perf_counter()
+        BATCH_FLUSHES.inc(reason=reason)
+        BATCH_SIZE.observe(len(pending.items))
+        BATCH_FILL.observe(len(pending.items) / self.max_size)
+        task = asyncio.ensure_future(self._run(key, pending.items))
+        # Hold a reference until done; the loop only keeps weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: BatchKey, items: List[Tuple[Any, asyncio.Future]]) -> None:
+        lang, model, max_px = key
+        try:
+            with metrics.recording() as rec:
+                payloads, worker_metrics = await executor.run(self.runner, [c for c, _ in items], lang, model, max_px)
+                metrics.merge(worker_metrics)
+        except BaseException as exc:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        shared = rec.export()
+        for i, ((_, fut), payload) in enumerate(zip(items, payloads)):
+            if fut.done():
+                continue
+            # Every caller waited through the whole pass; counters are attributed once
+            fut.set_result((payload, shared if i == 0 else {"stages": shared["stages"], "counts": []}))
+
+
+batcher = MicroBatcher(max_size=settings.microbatch_max_size, max_wait_ms=settings.microbatch_max_wait_ms)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator
+import threading
+import time
+import structlog
+from app.core import metrics
+from app.core.config import settings
+
+
+log = structlog.get_logger()
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# served_by of results made up without any backend (runtime not installed)
+STUB = "stub"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.REGISTRY.gauge("ocr_backend_circuit_state", "Circuit breaker state per backend/device (0 closed, 1 half-open, 2 open)")
+BREAKER_TRANSITIONS = metrics.REGISTRY.counter("ocr_backend_circuit_transitions_total", "Circuit breaker state changes per backend/device")
+DEGRADED = metrics.REGISTRY.counter("ocr_degraded_total", "Requests served by a fallback backend or refused by an open circuit")
+
+
+class BackendUnavailable(Exception):
+    """The backend's circuit is open and no fallback can serve; mapped to 503 + Retry-After."""
+
+    def __init__(self, backend: str, retry_after_s: int) -> None:
+        # Positional args only, so the exception pickles across the process pool
+        super().__init__(backend, retry_after_s)
+        self.backend = backend
+        self.retry_after_s = retry_after_s
+
+    def __str__(self) -> str:
+        return f"OCR backend {self.backend} is unavailable"
+
+
+class InferenceFailed(Exception):
+    """The backend raised and no fallback could serve the call; mapped to 500."""
+
+    def __init__(self, backend: str, op: str) -> None:
+        super().__init__(backend, op)
+        self.backend = backend
+        self.op = op
+
+    def __str__(self) -> str:
+        return f"OCR backend {self.backend} failed in {self.op}"
+
+
+@dataclass
+class BreakerStats:
+    successes: int = 0
+    failures: int = 0
+    slow_calls: int = 0
+    rejected: int = 0
+    trips: int = 0
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one backend instance (backend/device).
+
+    Closed: calls pass; ``failure_threshold`` consecutive failures (errors or
+    calls slower than the slow-call limit) open it. Open: calls are refused
+    until ``reset_timeout_s`` has passed, then one probe call is let through
+    (half-open). A successful probe closes the circuit, a failed one opens it
+    for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self.state = CLOSED
+        self.stats = BreakerStats()
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(_STATE_VALUES[CLOSED], backend=name)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        log.warning("backend_circuit_" + state, backend=self.name, consecutive_failures=self._consecutive)
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUES[state], backend=self.name)
+        BREAKER_TRANSITIONS.inc(backend=self.name, to=state)
+        if state == OPEN:
+            self.stats.trips += 1
+            self._opened_at = self.clock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to this backend now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.reset_timeout_s:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                return True
+            self.stats.rejected += 1
+            return False
+
+    def retry_after_s(self) -> int:
+        with self._lock:
+            remaining = self.reset_timeout_s - (self.clock() - self._opened_at) if self.state == OPEN else 1
+        return max(1, int(remaining + 0.999))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.stats.successes += 1
+            self._consecutive = 0
+            self._probing = False
+            self._transition(CLOSED)
+
+    def record_failure(self, slow: bool = False) -> None:
+        with self._lock:
+            self.stats.failures += 1
+            if slow:
+                self.stats.slow_calls += 1
+            self._consecutive += 1
+            was_probe, self._probing = self._probing, False
+            if was_probe or self.state == HALF_OPEN or self._consecutive >= self.failure_threshold:
+                if self.state == OPEN:
+                    self._opened_at = self.clock()
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """End a call that says nothing about backend health (e.g. an undecodable image)."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = {"state": self.state, "consecutive_failures": self._consecutive, **self.stats.__dict__}
+            if self.state == OPEN:
+                data["opened_s_ago"] = round(self.clock() - self._opened_at, 3)
+        return data
+
+
+class BreakerRegistry:
+    """One breaker per backend/device, shared by every engine (language) on it."""
+
+    def __init__(self) -> None:
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, settings.breaker_failure_threshold, settings.breaker_reset_timeout_s)
+            return breaker
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.snapshot() for b in breakers}
+
+
+breakers = BreakerRegistry()
+
+
+# Degradations noted while one unit of work runs; the pipeline reports them in meta
+_degraded: ContextVar[Dict[str, str] | None] = ContextVar("ocr_degraded", default=None)
+
+
+@contextmanager
+def tracking() -> Iterator[Dict[str, str]]:
+    notes: Dict[str, str] = {}
+    token = _degraded.set(notes)
+    try:
+        yield notes
+    finally:
+        _degraded.reset(token)
+
+
+def note_degraded(backend: str, served_by: str, reason: str) -> None:
+    metrics.count("ocr_degraded_total", backend=backend, served_by=served_by, reason=reason)
+    notes = _degraded.get()
+    if notes is not None:
+        notes.update({"backend": backend, "served_by": served_by, "reason": reason})
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import structlog
+from app.core.config import settings
+from .analysis import TextBoxes
+
+
+log = structlog.get_logger()
+
+
+# Cached payloads keep TextBoxes columnar: {"__text_boxes__": [points, texts, scores]}
+_BOXES_TAG = "__text_boxes__"
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, TextBoxes):
+        return {_BOXES_TAG: [obj.points.tolist(), obj.texts, obj.scores.tolist()]}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode(obj: dict[str, Any]) -> Any:
+    if _BOXES_TAG in obj:
+        points, texts, scores = obj[_BOXES_TAG]
+        return TextBoxes.build(points, texts, scores)
+    return obj
+
+
+def _loads(blob: bytes) -> dict[str, Any]:
+    return json.loads(blob, object_hook=_decode)
+
+
+@dataclass
+class CacheStats:
+    hits_memory: int = 0
+    hits_disk: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+
+
+class _DiskTier:
+    """sqlite-backed tier that survives restarts; values are stored as JSON."""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires REAL, stored REAL, value BLOB)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_stored ON results(stored)")
+        self._conn.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # A connection must not be used across fork(); forked workers open their own
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def get(self, key: str) -> tuple[bytes, float] | None:
+        with self._lock:
+            row = self.conn.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            return bytes(row[0]), float(row[1])
+
+    def put(self, key: str, value: bytes, expires: float) -> None:
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, expires, time.time(), value))
+            self._puts += 1
+            # Trim occasionally rather than on every write
+            if self._puts % 100 == 0:
+                self.conn.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+                self.conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM results")
+
+
+class ResultCache:
+    """Content-addressed cache of serialized OCR results.
+
+    Keys are a BLAKE2b digest of the upload bytes combined with every parameter
+    that changes the output (lang, model, mode, preprocessing). The memory tier
+    is an LRU bounded by entry count, total bytes and TTL; an optional sqlite
+    tier behind it keeps results across restarts.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 3600, disk_path: str | None = None, disk_max_entries: int = 10000) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_s = ttl_s
+        self._mem: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path, disk_max_entries) if disk_path else None
+        self.stats = CacheStats()
+
+    @staticmethod
+    def make_key(content: Any, **params: Any) -> str:
+        h = hashlib.blake2b(content, digest_size=20)
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _store_mem(self, key: str, expires: float, blob: bytes) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old[1])
+        if len(blob) > self.max_bytes:
+            return
+        self._mem[key] = (expires, blob)
+        self._mem_bytes += len(blob)
+        while len(self._mem) > self.max_entries or self._mem_bytes > self.max_bytes:
+            _, (_, evicted) = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self.stats.evictions += 1
+
+    def get(self, key: str) -> tuple[dict[str, Any] | None, str | None]:
+        """Return ``(value, tier)``; tier is ``"memory"`` or ``"disk"`` on a hit."""
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._mem.move_to_end(key)
+                    self.stats.hits_memory += 1
+                    return _loads(entry[1]), "memory"
+                self._mem.pop(key)
+                self._mem_bytes -= len(entry[1])
+                self.stats.expired += 1
+        if self._disk is not None:
+            try:
+                found = self._disk.get(key)
+            except sqlite3.Error:
+                log.warning("result_cache_disk_error", op="get")
+                found = None
+            if found is not None:
+                blob, expires = found
+                with self._lock:
+                    # Promote to memory so repeats skip sqlite
+                    self._store_mem(key, expires, blob)
+                    self.stats.hits_disk += 1
+                return _loads(blob), "disk"
+        with self._lock:
+            self.stats.misses += 1
+        return None, None
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        blob = json.dumps(value, separators=(",", ":"), default=_encode).encode()
+        expires = time.time() + self.ttl_s
+        with self._lock:
+            self._store_mem(key, expires, blob)
+            self.stats.stores += 1
+        if self._disk is not None:
+            try:
+                self._disk.put(key, blob, expires)
+            except sqlite3.Error:
+                log.warning("result_cache_disk_error", op="put")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            data = asdict(self.stats)
+            data["entries"] = len(self._mem)
+            data["bytes"] = self._mem_bytes
+        data["disk"] = self._disk is not None
+        return data
+
+
+result_cache: ResultCache | None = (
+    ResultCache(
+        max_entries=settings.result_cache_max_entries,
+        max_bytes=settings.result_cache_max_mb * 1024 * 1024,
+        ttl_s=settings.result_cache_ttl_s,
+        disk_path=settings.result_cache_path,
+        disk_max_entries=settings.result_cache_disk_max_entries,
+    )
+    if settings.result_cache_enabled
+    else None
+)
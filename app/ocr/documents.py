@@ -0,0 +1,102 @@
+from __future__ import annotations
+from io import BytesIO
+from typing import Any, Iterator
+from PIL import Image
+import numpy as np
+
+try:
+    import pypdfium2 as pdfium  # type: ignore
+    _pdf_available = True
+except Exception:  # pragma: no cover
+    pdfium = None  # type: ignore
+    _pdf_available = False
+
+
+class DocumentError(Exception):
+    """Raised for inputs that cannot be split into pages."""
+
+
+def _open(content: Any) -> Image.Image:
+    if hasattr(content, "read"):
+        content.seek(0)
+        return Image.open(content)
+    return Image.open(BytesIO(content))
+
+
+def detect_kind(content: Any) -> str:
+    head = bytes(content[:8])
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return "image"
+
+
+def _to_array(im: Image.Image, max_px: int | None) -> np.ndarray:
+    im = im.convert("RGB")
+    if max_px and max(im.size) > max_px:
+        im.thumbnail((max_px, max_px), Image.Resampling.BILINEAR, reducing_gap=None)
+    return np.ascontiguousarray(np.array(im, dtype=np.uint8))
+
+
+def page_count(content: Any) -> int:
+    kind = detect_kind(content)
+    if kind == "pdf":
+        if not _pdf_available:
+            raise DocumentError("PDF support requires pypdfium2")
+        doc = pdfium.PdfDocument(bytes(content))
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+    try:
+        return int(getattr(_open(content), "n_frames", 1))
+    except Exception as exc:
+        raise DocumentError("Unsupported document") from exc
+
+
+def iter_pages(content: Any, dpi: int = 200, max_px: int | None = None, max_pages: int | None = None) -> Iterator[np.ndarray]:
+    """Yield pages as RGB arrays one at a time.
+
+    Only the page being yielded is rasterized/decoded, so memory stays bounded
+    by a single page regardless of document length. PDFs are rendered at
+    ``dpi``; TIFF frames (and plain images, as one page) are decoded as stored.
+    A page that cannot be rendered or decoded raises ``DocumentError``.
+    """
+    kind = detect_kind(content)
+    if kind == "pdf":
+        if not _pdf_available:
+            raise DocumentError("PDF support requires pypdfium2")
+        doc = pdfium.PdfDocument(bytes(content))
+        try:
+            total = len(doc) if max_pages is None else min(len(doc), max_pages)
+            for i in range(total):
+                try:
+                    page = doc[i]
+                    try:
+                        bitmap = page.render(scale=dpi / 72)
+                        arr = _to_array(bitmap.to_pil(), max_px)
+                        bitmap.close()
+                    finally:
+                        page.close()
+                except Exception as exc:
+                    raise DocumentError(f"Unreadable page {i}") from exc
+                yield arr
+        finally:
+            doc.close()
+        return
+    try:
+        im = _open(content)
+    except Exception as exc:
+        raise DocumentError("Unsupported document") from exc
+    total = int(getattr(im, "n_frames", 1))
+    if max_pages is not None:
+        total = min(total, max_pages)
+    for i in range(total):
+        try:
+            im.seek(i)
+            arr = _to_array(im, max_px)
+        except Exception as exc:
+            # Truncated or corrupt frame: the pages before it were already streamed
+            raise DocumentError(f"Unreadable page {i}") from exc
+        yield arr
@@ -1,21 +1,35 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Any
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List, TypeVar
+import threading
+import numpy as np
+import structlog
+from app.core import metrics
+from app.core.config import settings
+from .analysis import AnalysisContext, TextBoxes
+from .backend import InvalidImage, OcrBackend
+from .breaker import STUB, BackendUnavailable, CircuitBreaker, InferenceFailed, breakers, note_degraded
+from .fake_backend import FakeBackend
+from .onnx_backend import OnnxBackend, _onnx_available
 from .paddle_backend import PaddleBackend, _paddle_available
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 
-@dataclass
-class Box:
-    points: List[Tuple[int, int]]
-    text: str
-    score: float
+log = structlog.get_logger()
+
+T = TypeVar("T")
 
 
 @dataclass
 class RecognitionResult:
     text: str
-    boxes: List[Box]
+    boxes: TextBoxes = field(default_factory=TextBoxes.empty)
+    # Set only by batch recognition, where failures are reported per item
+    error: str | None = None
+    # Set only by lang=auto: the language each box was recognized with
+    langs: List[str] | None = None
+    # Set only by region recognition: the field name of each box
+    names: List[str] | None = None
 
 
 @dataclass
@@ -29,48 +43,266 @@ class ExtractionResult:
     entities: List[Dict[str, Any]]
 
 
+# Small blank page: enough to initialise predictors without real work
+_WARMUP_IMAGE = np.full((64, 256, 3), 255, dtype=np.uint8)
+
+
+def _device_label(device: str | None) -> str:
+    return (device or "auto").strip().lower()
+
+
+def _use_gpu(device: str | None) -> bool | None:
+    if device is None:
+        return None
+    return device.strip().lower() == "gpu"
+
+
+BACKENDS = ("paddle", "onnx", "fake")
+
+
+def backend_for(model: str) -> tuple[str, str]:
+    """``(backend, model name)`` for a ``model`` parameter.
+
+    ``onnx:<name>`` / ``paddle:<name>`` pick the backend explicitly and a bare
+    backend name means its default model; anything else runs on
+    ``settings.ocr_backend``.
+    """
+    kind, sep, name = model.partition(":")
+    if sep and kind in BACKENDS:
+        return kind, name or settings.model_default
+    if model in BACKENDS:
+        return model, settings.model_default
+    return settings.ocr_backend, model
+
+
+def model_label(model: str) -> str:
+    """``model`` as a metric label: ``<backend>:<name>`` for the default model, ``<backend>:other`` otherwise.
+
+    Model names are free text from the query string; labelling with them as
+    given would let callers create any number of series.
+    """
+    backend, name = backend_for(model or settings.model_default)
+    return f"{backend}:{name if name == settings.model_default else 'other'}"
+
+
+def lang_label(lang: str) -> str:
+    """``lang`` as a metric label: allowed languages as given, anything else ``other``."""
+    lang = (lang or "").strip().lower()
+    return lang if lang in settings.allowed_langs or lang == settings.default_lang else "other"
+
+
+def _create_backend(kind: str, lang: str, name: str, device: str | None) -> OcrBackend | None:
+    # None keeps the stub behaviour when the backend's runtime is not installed
+    if kind == "fake":
+        return FakeBackend(lang=lang)
+    if kind == "onnx":
+        return OnnxBackend(lang=lang, model=name) if _onnx_available else None
+    if kind == "paddle":
+        return PaddleBackend(lang=lang, use_gpu=_use_gpu(device)) if _paddle_available else None
+    raise ValueError(f"unknown OCR backend: {kind}")
+
+
 class OcrEngine:
-    def __init__(self, lang: str = "en", model: str = "pp-ocrv5") -> None:
+    def __init__(self, lang: str = "en", model: str = "pp-ocrv5", device: str | None = None) -> None:
         self.lang = lang
         self.model = model
-        self._paddle: PaddleBackend | None = None
-        if _paddle_available:
-            try:
-                self._paddle = PaddleBackend(lang=lang)
-            except Exception:
-                self._paddle = None
-
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=0.2, min=0.2, max=1))
-    def recognize(self, content: bytes) -> RecognitionResult:
-        if self._paddle is not None:
-            try:
-                text, boxes = self._paddle.recognize(content)
-                return RecognitionResult(
-                    text=text,
-                    boxes=[Box(points=pts, text=txt, score=score) for pts, txt, score in boxes],
-                )
-            except Exception:
-                # Graceful fallback on runtime errors
-                return RecognitionResult(text="", boxes=[])
-        # Fallback stub
-        return RecognitionResult(text="stub", boxes=[])
-
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=0.2, min=0.2, max=1))
-    def parse_structure(self, content: bytes) -> StructureResult:
-        if self._paddle is not None:
-            try:
-                data = self._paddle.parse_structure(content)
-                return StructureResult(tables=data.get("tables", []), markdown=data.get("markdown"))
-            except Exception:
-                return StructureResult(tables=[], markdown="")
-        return StructureResult(tables=[], markdown="")
-
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=0.2, min=0.2, max=1))
-    def extract_info(self, content: bytes) -> ExtractionResult:
-        if self._paddle is not None:
-            try:
-                data = self._paddle.extract(content)
-                return ExtractionResult(entities=data.get("entities", []))
-            except Exception:
-                return ExtractionResult(entities=[])
-        return ExtractionResult(entities=[])
+        self.device = device
+        # Paddle predictors are not thread-safe; engines are shared across pool threads
+        self._lock = threading.Lock()
+        self.backend_name, name = backend_for(model)
+        self._backend: OcrBackend | None = None
+        self.warmed = False
+        try:
+            self._backend = _create_backend(self.backend_name, lang, name, device)
+        except Exception as exc:
+            log.warning("engine_backend_unavailable", backend=self.backend_name, model=name, lang=lang, error=repr(exc))
+            self._backend = None
+        # Shared by every language on the same backend and device
+        self.breaker: CircuitBreaker = breakers.get(f"{self.backend_name}/{_device_label(device)}")
+
+    def warmup(self) -> None:
+        """Run one tiny inference so the first real request does not pay predictor init."""
+        if self._backend is not None:
+            with self._lock:
+                self._backend.recognize(_WARMUP_IMAGE)
+        self.warmed = True
+
+    def _stub(self, op: str, n: int = 1) -> None:
+        # No backend runtime: placeholder output, reported as degraded (and never cached)
+        metrics.count("ocr_fallbacks_total", n, op=op, reason="stub")
+        note_degraded(self.breaker.name, STUB, "unavailable")
+
+    def _fallback(self) -> "OcrEngine | None":
+        device = settings.fallback_device
+        if not device or self._backend is None or not self._backend.uses_device or _device_label(self.device) == _device_label(device):
+            return None
+        # Imported lazily: the registry builds engines
+        from .registry import registry
+
+        try:
+            engine = registry.get(self.lang, self.model, device)
+        except Exception:
+            log.warning("fallback_engine_unavailable", lang=self.lang, model=self.model, device=device)
+            return None
+        return engine if engine._backend is not None else None
+
+    def _call(self, op: str, fn: Callable[[OcrBackend], T]) -> T:
+        """Run ``fn`` on the backend behind this engine's circuit breaker.
+
+        Errors and calls slower than ``BREAKER_SLOW_CALL_S`` count against the
+        breaker. A failed call, or any call while the circuit is open, goes
+        once to the same model on ``FALLBACK_DEVICE`` and the request is
+        reported degraded. Without a fallback an open circuit raises
+        ``BackendUnavailable`` (shed load instead of queueing on a broken
+        device) and a failed call ``InferenceFailed``. Undecodable input is the
+        caller's problem: ``InvalidImage`` passes through without touching the
+        breaker.
+        """
+        breaker = self.breaker
+        if not breaker.allow():
+            return self._degrade(op, fn, "circuit_open")
+        started = perf_counter()
+        try:
+            with metrics.span(f"engine.{op}", backend=breaker.name, lang=self.lang), self._lock:
+                out = fn(self._backend)  # type: ignore[arg-type]
+        except InvalidImage:
+            breaker.release()
+            raise
+        except Exception as exc:
+            breaker.record_failure()
+            log.warning("backend_call_failed", backend=breaker.name, op=op, error=repr(exc))
+            return self._degrade(op, fn, "error", exc)
+        slow_s = settings.breaker_slow_call_s or settings.inference_timeout_s
+        if slow_s and perf_counter() - started > slow_s:
+            breaker.record_failure(slow=True)
+        else:
+            breaker.record_success()
+        return out
+
+    def _degrade(self, op: str, fn: Callable[[OcrBackend], T], reason: str, exc: Exception | None = None) -> T:
+        fallback = self._fallback()
+        if fallback is None:
+            metrics.count("ocr_degraded_total", backend=self.breaker.name, served_by="none", reason=reason)
+            if exc is None:
+                raise BackendUnavailable(self.breaker.name, self.breaker.retry_after_s())
+            raise InferenceFailed(self.breaker.name, op) from exc
+        note_degraded(self.breaker.name, fallback.breaker.name, reason)
+        return fallback._call(op, fn)
+
+    def _invoke(self, op: str, fn: Callable[[OcrBackend], T]) -> T | None:
+        """``_call`` for single-image ops; None when the input cannot be decoded."""
+        try:
+            return self._call(op, fn)
+        except InvalidImage:
+            metrics.count("ocr_fallbacks_total", op=op, reason="bad_image")
+            return None
+
+    def recognize(self, content: bytes | np.ndarray, ctx: AnalysisContext | None = None) -> RecognitionResult:
+        if self._backend is None:
+            self._stub("recognize")
+            return RecognitionResult(text="stub")
+        out = self._invoke("recognize", lambda b: b.recognize(content, ctx))
+        if out is None:
+            return RecognitionResult(text="")
+        text, boxes = out
+        return RecognitionResult(text=text, boxes=boxes)
+
+    def recognize_tiled(self, content: bytes | np.ndarray, tile_px: int, overlap_px: int, nms_threshold: float = 0.5, ctx: AnalysisContext | None = None) -> RecognitionResult:
+        """Full-resolution recognition of a large image through overlapping tiles."""
+        if self._backend is None:
+            self._stub("recognize_tiled")
+            return RecognitionResult(text="stub")
+        out = self._invoke("recognize_tiled", lambda b: b.recognize_tiled(content, tile_px, overlap_px, nms_threshold, ctx))
+        if out is None:
+            return RecognitionResult(text="")
+        text, boxes = out
+        return RecognitionResult(text=text, boxes=boxes)
+
+    def recognize_regions(self, content: bytes | np.ndarray, boxes: np.ndarray, names: List[str], cls: bool = False) -> RecognitionResult:
+        """Recognize known ``(N, 4)`` pixel boxes without detection; every region is reported."""
+        points = np.stack([boxes[:, [0, 1]], boxes[:, [2, 1]], boxes[:, [2, 3]], boxes[:, [0, 3]]], axis=1)
+        blank = TextBoxes.build(points, [""] * len(names), np.zeros(len(names)))
+        if self._backend is None:
+            self._stub("recognize_regions")
+            return RecognitionResult(text="stub", boxes=blank, names=names)
+        rec_res = self._invoke("recognize_regions", lambda b: b.recognize_regions(content, boxes, cls))
+        if rec_res is None:
+            return RecognitionResult(text="", boxes=blank, names=names)
+        texts = [text for text, _ in rec_res]
+        return RecognitionResult(text=" ".join(t for t in texts if t), boxes=TextBoxes.build(points, texts, [score for _, score in rec_res]), names=names)
+
+    @property
+    def splittable(self) -> bool:
+        """Whether detection and recognition can run separately (needed by lang=auto)."""
+        return self._backend is not None and self._backend._split_available()
+
+    @property
+    def drop_score(self) -> float:
+        return self._backend.drop_score if self._backend is not None else 0.5
+
+    def detect_crops(self, content: bytes | np.ndarray, ctx: AnalysisContext | None = None) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        """Text detection only; returns boxes in reading order and their crops."""
+        if not self.splittable:
+            raise RuntimeError("Backend cannot run detection separately")
+        return self._call("detect_crops", lambda b: b.detect_crops(content, ctx))
+
+    def recognize_crops(self, crops: List[np.ndarray]) -> List[tuple[str, float]]:
+        """Recognition only, over crops detected by any engine."""
+        if not self.splittable:
+            raise RuntimeError("Backend cannot run recognition separately")
+        return self._call("recognize_crops", lambda b: b.recognize_crops(crops))
+
+    def recognize_batch(self, contents: List[Any], strict: bool = False) -> List[RecognitionResult]:
+        """Recognize several images in one model-level batch, preserving input order.
+
+        Undecodable items come back with ``error="BadImage"``. Any other
+        per-item failure is a backend failure: it counts against the breaker
+        and the call is degraded like a single one. When the backend is
+        unavailable or fails, every item carries the error, or with ``strict``
+        the exception propagates (micro-batched ``/ocr`` requests then fail
+        like single ones).
+        """
+        if self._backend is None:
+            self._stub("recognize_batch", len(contents))
+            return [RecognitionResult(text="stub") for _ in contents]
+
+        def run(backend: OcrBackend) -> List[Any]:
+            raw = backend.recognize_batch(contents)
+            for item in raw:
+                if isinstance(item, Exception) and not isinstance(item, InvalidImage):
+                    raise item
+            return raw
+
+        try:
+            raw = self._call("recognize_batch", run)
+        except (BackendUnavailable, InferenceFailed) as exc:
+            if strict:
+                raise
+            error = "Unavailable" if isinstance(exc, BackendUnavailable) else "InferenceError"
+            return [RecognitionResult(text="", error=error) for _ in contents]
+        results: List[RecognitionResult] = []
+        for item in raw:
+            if isinstance(item, Exception):
+                results.append(RecognitionResult(text="", error="BadImage"))
+                continue
+            text, boxes = item
+            results.append(RecognitionResult(text=text, boxes=boxes))
+        return results
+
+    def parse_structure(self, content: bytes | np.ndarray, ctx: AnalysisContext | None = None) -> StructureResult:
+        if self._backend is None:
+            self._stub("parse_structure")
+            return StructureResult(tables=[], markdown="")
+        data = self._invoke("parse_structure", lambda b: b.parse_structure(content, ctx))
+        if data is None:
+            return StructureResult(tables=[], markdown="")
+        return StructureResult(tables=data.get("tables", []), markdown=data.get("markdown"))
+
+    def extract_info(self, content: bytes | np.ndarray, ctx: AnalysisContext | None = None) -> ExtractionResult:
+        if self._backend is None:
+            self._stub("extract_info")
+            return ExtractionResult(entities=[])
+        data = self._invoke("extract_info", lambda b: b.extract(content, ctx))
+        if data is None:
+            return ExtractionResult(entities=[])
+        return ExtractionResult(entities=data.get("entities", []))
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+import asyncio
+import contextvars
+import mmap
+import multiprocessing
+import threading
+import time
+import structlog
+from app.core import metrics, profiling
+from app.core.config import settings
+
+
+log = structlog.get_logger()
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue is full; mapped to 503 + Retry-After."""
+
+    def __init__(self, retry_after_s: int) -> None:
+        super().__init__("Inference queue is full")
+        self.retry_after_s = retry_after_s
+
+
+class InferenceTimeout(Exception):
+    """Raised when a submitted task does not finish within its deadline; mapped to 504."""
+
+    def __init__(self, timeout_s: float) -> None:
+        super().__init__(f"Inference did not finish within {timeout_s}s")
+        self.timeout_s = timeout_s
+
+
+def _picklable(arg: Any) -> Any:
+    # Also inside the list of contents a micro-batch carries
+    if isinstance(arg, mmap.mmap):
+        return bytes(arg)
+    if isinstance(arg, (list, tuple)) and any(isinstance(a, mmap.mmap) for a in arg):
+        return type(arg)(bytes(a) if isinstance(a, mmap.mmap) else a for a in arg)
+    return arg
+
+
+def _timed_call(submitted_at: float, fn: Callable[..., Any], *args: Any) -> tuple[float, Any]:
+    # Wall clock, not perf_counter: the task may start in another process
+    waited = max(0.0, time.time() - submitted_at)
+    return waited, fn(*args)
+
+
+def _profiled_call(submitted_at: float, interval_s: float | None, fn: Callable[..., Any], *args: Any) -> tuple[float, Any, dict[str, int] | None]:
+    # _timed_call for a profiled request: spans are kept (worker processes do
+    # not inherit the request context) and the stack is sampled when asked
+    waited = max(0.0, time.time() - submitted_at)
+    with metrics.tracing():
+        if interval_s is None:
+            return waited, fn(*args), None
+        with profiling.StackSampler(threading.get_ident(), interval_s) as sampler:
+            result = fn(*args)
+    return waited, result, dict(sampler.stacks)
+
+
+class InferenceExecutor:
+    """Bounded worker pool that keeps blocking OCR work off the event loop.
+
+    At most ``workers + queue_size`` tasks are admitted at once; further
+    submissions fail fast with ``QueueFullError`` instead of piling up.
+    A slot is released only when the worker actually finishes, so timed-out
+    tasks still count against capacity until they return.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 1, queue_size: int = 16, timeout_s: float = 60.0, retry_after_s: int = 1) -> None:
+        self.kind = (kind or "thread").strip().lower()
+        if self.kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported inference pool: {kind}")
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self.timeout_s = timeout_s
+        self.retry_after_s = retry_after_s
+        self._pool: Executor | None = None
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn: forking a process that already holds Paddle/CUDA state is unsafe
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-infer")
+        return self._pool
+
+    def _admit(self, slots: int = 1) -> None:
+        with self._lock:
+            if self._inflight + slots > self.capacity:
+                log.warning("inference_rejected", inflight=self._inflight, capacity=self.capacity)
+                raise QueueFullError(self.retry_after_s)
+            self._inflight += slots
+
+    def _release(self, _: Future | None = None) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Admit and submit one task; raises ``QueueFullError`` when saturated."""
+        self._admit()
+        try:
+            if self.kind == "thread":
+                # Carry request-scoped contextvars (request_id log binding) into the worker
+                ctx = contextvars.copy_context()
+                fut = self._get_pool().submit(ctx.run, fn, *args)
+            else:
+                # mmap'd uploads cannot be pickled; ship their bytes to the worker process
+                args = tuple(_picklable(a) for a in args)
+                fut = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        fut.add_done_callback(self._release)
+        return fut
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout_s: float | None = None) -> Any:
+        timeout = self.timeout_s if timeout_s is None else timeout_s
+        if profiling.active() is None:
+            fut = self.submit(_timed_call, time.time(), fn, *args)
+        else:
+            fut = self.submit(_profiled_call, time.time(), profiling.sample_interval_s(), fn, *args)
+        try:
+            waited, result, *stacks = await asyncio.wait_for(asyncio.wrap_future(fut), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            # Drops the task if it has not started yet; a running task finishes in the background
+            fut.cancel()
+            raise InferenceTimeout(timeout)
+        except Exception as exc:
+            # Counters recorded by a task that failed (e.g. a shed call) still count
+            metrics.merge(getattr(exc, "worker_metrics", None))
+            raise
+        metrics.record("queue_wait", waited)
+        if stacks:
+            profiling.add_stacks(stacks[0])
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+executor = InferenceExecutor(
+    kind=settings.inference_pool,
+    workers=settings.inference_workers,
+    queue_size=settings.inference_queue_size,
+    timeout_s=settings.inference_timeout_s,
+    retry_after_s=settings.inference_retry_after_s,
+)
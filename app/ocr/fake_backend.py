@@ -0,0 +1,46 @@
+from __future__ import annotations
+from typing import List
+import numpy as np
+from app.core import metrics
+from .backend import OcrBackend
+
+
+class FakeBackend(OcrBackend):
+    """Deterministic backend without model files, for tests and serving benchmarks.
+
+    Every band of rows holding dark pixels is one text line, boxed from its
+    leftmost to its rightmost dark column. A crop reads as ``"<w>x<h>"``, so
+    results depend only on the image and callers can check which pixels
+    reached the recognizer.
+    """
+
+    name = "fake"
+
+    def __init__(self, lang: str = "en", threshold: int = 128, score: float = 0.99) -> None:
+        self.lang = lang
+        self.threshold = threshold
+        self.score = score
+        self.det_calls = 0
+        self.rec_calls: List[int] = []
+
+    def detect(self, image: np.ndarray) -> list[np.ndarray]:
+        self.det_calls += 1
+        with metrics.stage("detection"):
+            gray = image if image.ndim == 2 else image.min(axis=2)
+            ink = gray < self.threshold
+            rows = ink.any(axis=1)
+            # Run starts/ends of consecutive inked rows
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], rows.astype(np.int8), [0]))))
+            boxes = []
+            for y0, y1 in edges.reshape(-1, 2).tolist():
+                cols = np.flatnonzero(ink[y0:y1].any(axis=0))
+                x0, x1 = int(cols[0]), int(cols[-1]) + 1
+                boxes.append(np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32))
+        return boxes
+
+    def recognize_crops(self, crops: list[np.ndarray], cls: bool = True) -> list[tuple[str, float]]:
+        if not crops:
+            return []
+        self.rec_calls.append(len(crops))
+        with metrics.stage("recognition"):
+            return [(f"{crop.shape[1]}x{crop.shape[0]}", self.score) for crop in crops]
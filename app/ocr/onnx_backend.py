@@ -0,0 +1,251 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, List, Sequence
+import math
+import numpy as np
+import structlog
+from app.core import metrics
+from app.core.config import settings
+from .backend import OcrBackend, crop_box, sorted_boxes
+
+try:
+    import onnxruntime as ort  # type: ignore
+    import cv2  # type: ignore
+    import pyclipper  # type: ignore
+    _onnx_available = True
+except Exception:  # pragma: no cover
+    ort = cv2 = pyclipper = None  # type: ignore
+    _onnx_available = False
+
+
+log = structlog.get_logger()
+
+# PP-OCR export defaults (det_db_*, rec_image_shape, cls_thresh)
+DET_LIMIT_SIDE = 960
+DET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+DET_THRESH = 0.3
+DET_BOX_THRESH = 0.6
+DET_UNCLIP_RATIO = 1.5
+DET_MAX_CANDIDATES = 1000
+REC_HEIGHT = 48
+REC_MIN_WIDTH = 320
+REC_BATCH = 6
+CLS_SHAPE = (48, 192)
+CLS_THRESH = 0.9
+
+
+def det_target_size(h: int, w: int, limit: int = DET_LIMIT_SIDE) -> tuple[int, int]:
+    """Detector input size: longest side at most ``limit``, both sides multiples of 32."""
+    ratio = min(1.0, limit / max(h, w))
+    return max(32, int(round(h * ratio / 32)) * 32), max(32, int(round(w * ratio / 32)) * 32)
+
+
+def ctc_decode(probs: np.ndarray, charset: Sequence[str]) -> List[tuple[str, float]]:
+    """Greedy CTC decode of ``(N, T, C)`` probabilities; index 0 is the blank.
+
+    Repeated indices collapse and blanks drop out; the score is the mean
+    probability of the kept characters (0 for an empty line).
+    """
+    idx = probs.argmax(axis=2)
+    prob = probs.max(axis=2)
+    out: List[tuple[str, float]] = []
+    for row, p in zip(idx, prob):
+        keep = np.ones(len(row), dtype=bool)
+        keep[1:] = row[1:] != row[:-1]
+        keep &= row != 0
+        chars = [charset[i] for i in row[keep].tolist() if i < len(charset)]
+        out.append(("".join(chars), float(p[keep].mean()) if keep.any() else 0.0))
+    return out
+
+
+def _order_points(pts: np.ndarray) -> np.ndarray:
+    # Clockwise from the top-left corner, as PaddleOCR's get_mini_boxes
+    pts = pts[np.argsort(pts[:, 0])]
+    left, right = pts[:2], pts[2:]
+    tl, bl = left[np.argsort(left[:, 1])]
+    tr, br = right[np.argsort(right[:, 1])]
+    return np.array([tl, tr, br, bl], dtype=np.float32)
+
+
+def _mini_box(contour: np.ndarray) -> tuple[np.ndarray, float]:
+    rect = cv2.minAreaRect(contour)
+    return _order_points(cv2.boxPoints(rect)), min(rect[1])
+
+
+def _box_score(pred: np.ndarray, box: np.ndarray) -> float:
+    # Mean probability inside the polygon, over its bounding rectangle only
+    h, w = pred.shape
+    x0, x1 = int(np.clip(np.floor(box[:, 0].min()), 0, w - 1)), int(np.clip(np.ceil(box[:, 0].max()), 0, w - 1))
+    y0, y1 = int(np.clip(np.floor(box[:, 1].min()), 0, h - 1)), int(np.clip(np.ceil(box[:, 1].max()), 0, h - 1))
+    mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+    cv2.fillPoly(mask, [(box - (x0, y0)).astype(np.int32)], 1)
+    return float(cv2.mean(pred[y0 : y1 + 1, x0 : x1 + 1], mask)[0])
+
+
+def _unclip(box: np.ndarray, ratio: float) -> np.ndarray | None:
+    poly = box.astype(np.float64)
+    area = abs(float(np.dot(poly[:, 0], np.roll(poly[:, 1], 1)) - np.dot(poly[:, 1], np.roll(poly[:, 0], 1)))) / 2
+    length = float(np.linalg.norm(poly - np.roll(poly, 1, axis=0), axis=1).sum())
+    if length == 0:
+        return None
+    offset = pyclipper.PyclipperOffset()
+    offset.AddPath([tuple(p) for p in poly.round().astype(int).tolist()], pyclipper.JT_ROUND, pyclipper.ET_CLOSEDPOLYGON)
+    expanded = offset.Execute(area * ratio / length)
+    if len(expanded) != 1:
+        return None
+    return np.asarray(expanded[0], dtype=np.float32).reshape(-1, 1, 2)
+
+
+def db_postprocess(pred: np.ndarray, src_h: int, src_w: int) -> List[np.ndarray]:
+    """DB probability map ``(H, W)`` to quadrilaterals in source-image pixels."""
+    h, w = pred.shape
+    bitmap = (pred > DET_THRESH).astype(np.uint8) * 255
+    contours, _ = cv2.findContours(bitmap, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    boxes: List[np.ndarray] = []
+    for contour in contours[:DET_MAX_CANDIDATES]:
+        box, side = _mini_box(contour)
+        if side < 3 or _box_score(pred, box) < DET_BOX_THRESH:
+            continue
+        expanded = _unclip(box, DET_UNCLIP_RATIO)
+        if expanded is None:
+            continue
+        box, side = _mini_box(expanded)
+        if side < 5:
+            continue
+        box[:, 0] = np.clip(np.round(box[:, 0] / w * src_w), 0, src_w)
+        box[:, 1] = np.clip(np.round(box[:, 1] / h * src_h), 0, src_h)
+        if np.linalg.norm(box[0] - box[1]) <= 3 or np.linalg.norm(box[0] - box[3]) <= 3:
+            continue
+        boxes.append(box)
+    return boxes
+
+
+def rotate_crop(image: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    """Perspective crop of a quadrilateral, turned upright when taller than wide."""
+    width = int(max(np.linalg.norm(pts[0] - pts[1]), np.linalg.norm(pts[2] - pts[3])))
+    height = int(max(np.linalg.norm(pts[0] - pts[3]), np.linalg.norm(pts[1] - pts[2])))
+    dst = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(pts.astype(np.float32), dst)
+    crop = cv2.warpPerspective(image, matrix, (max(1, width), max(1, height)), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if crop.shape[0] / max(1, crop.shape[1]) >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def _rec_input(crops: List[np.ndarray], height: int = REC_HEIGHT) -> np.ndarray:
+    # One padded batch, width set by the widest aspect ratio (at least REC_MIN_WIDTH)
+    max_ratio = max(c.shape[1] / max(1, c.shape[0]) for c in crops)
+    width = max(REC_MIN_WIDTH, int(math.ceil(height * max_ratio)))
+    batch = np.zeros((len(crops), 3, height, width), dtype=np.float32)
+    for i, crop in enumerate(crops):
+        w = min(width, max(1, int(math.ceil(height * crop.shape[1] / max(1, crop.shape[0])))))
+        resized = cv2.resize(crop, (w, height)).astype(np.float32)
+        batch[i, :, :, :w] = ((resized / 255.0 - 0.5) / 0.5).transpose(2, 0, 1)
+    return batch
+
+
+def _session_options() -> Any:
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if settings.onnx_intra_op_threads > 0:
+        opts.intra_op_num_threads = settings.onnx_intra_op_threads
+    if settings.onnx_inter_op_threads > 0:
+        opts.inter_op_num_threads = settings.onnx_inter_op_threads
+        if settings.onnx_inter_op_threads > 1:
+            opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return opts
+
+
+class OnnxBackend(OcrBackend):
+    """PP-OCR detection, angle classification and recognition on ONNX Runtime (CPU).
+
+    Models are PaddleOCR inference models exported with paddle2onnx, laid out
+    as ``<ONNX_MODEL_DIR>/<name>/[<lang>/]{det,cls,rec}.onnx`` plus
+    ``dict.txt`` (one character per line); files in the language directory
+    win over shared ones, so one detector can serve every language. With
+    ``ONNX_QUANTIZED`` the ``*.int8.onnx`` variants are used where present.
+    """
+
+    name = "onnx"
+
+    def __init__(self, lang: str = "en", model: str = "pp-ocrv5") -> None:
+        if not _onnx_available:
+            raise RuntimeError("onnxruntime, opencv and pyclipper are required for the ONNX backend")
+        self.lang = lang
+        root = Path(settings.onnx_model_dir) / model
+        self._dirs = [root / lang, root]
+        opts = _session_options()
+        self.det = ort.InferenceSession(str(self._model_path("det")), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.rec = ort.InferenceSession(str(self._model_path("rec")), sess_options=opts, providers=["CPUExecutionProvider"])
+        cls_path = self._model_path("cls", required=False)
+        self.cls = ort.InferenceSession(str(cls_path), sess_options=opts, providers=["CPUExecutionProvider"]) if cls_path else None
+        with open(self._find("dict.txt", required=True), encoding="utf-8") as fh:  # type: ignore[arg-type]
+            chars = [line.rstrip("\r\n") for line in fh]
+        # Index 0 is the CTC blank; PP-OCR appends the space character
+        self.charset = ["", *chars, " "]
+
+    def _find(self, filename: str, required: bool = False) -> Path | None:
+        for d in self._dirs:
+            if (d / filename).is_file():
+                return d / filename
+        if required:
+            raise FileNotFoundError(f"{filename} not found in {', '.join(map(str, self._dirs))}")
+        return None
+
+    def _model_path(self, part: str, required: bool = True) -> Path | None:
+        if settings.onnx_quantized:
+            path = self._find(f"{part}.int8.onnx")
+            if path is not None:
+                return path
+        return self._find(f"{part}.onnx", required=required)
+
+    def detect(self, image: np.ndarray) -> list[np.ndarray]:
+        with metrics.stage("detection"):
+            h, w = image.shape[:2]
+            th, tw = det_target_size(h, w)
+            # Exported PP-OCR models expect BGR input
+            resized = cv2.resize(np.ascontiguousarray(image[..., ::-1]), (tw, th)).astype(np.float32) / 255.0
+            batch = ((resized - DET_MEAN) / DET_STD).transpose(2, 0, 1)[None]
+            pred = self.det.run(None, {self.det.get_inputs()[0].name: batch})[0][0, 0]
+            boxes = db_postprocess(pred, h, w)
+        return sorted_boxes(boxes) if boxes else []
+
+    def _crop(self, image: np.ndarray, box: np.ndarray) -> np.ndarray:
+        return crop_box(image, box, rotate_crop)
+
+    def _classify(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        ch, cw = CLS_SHAPE
+        out = list(crops)
+        for start in range(0, len(crops), REC_BATCH):
+            chunk = crops[start : start + REC_BATCH]
+            batch = np.zeros((len(chunk), 3, ch, cw), dtype=np.float32)
+            for i, crop in enumerate(chunk):
+                w = min(cw, max(1, int(math.ceil(ch * crop.shape[1] / max(1, crop.shape[0])))))
+                resized = cv2.resize(crop, (w, ch)).astype(np.float32)
+                batch[i, :, :, :w] = ((resized / 255.0 - 0.5) / 0.5).transpose(2, 0, 1)
+            probs = self.cls.run(None, {self.cls.get_inputs()[0].name: batch})[0]
+            for i, p in enumerate(probs):
+                # Label 1 is "180": flip upside-down lines before recognition
+                if int(p.argmax()) == 1 and float(p[1]) > CLS_THRESH:
+                    out[start + i] = np.ascontiguousarray(np.rot90(chunk[i], 2))
+        return out
+
+    def recognize_crops(self, crops: list[np.ndarray], cls: bool = True) -> list[tuple[str, float]]:
+        """Recognition in batches of similar aspect ratio, so padding stays small."""
+        if not crops:
+            return []
+        crops = [np.ascontiguousarray(c[..., ::-1]) for c in crops]
+        if cls and self.cls is not None:
+            with metrics.stage("classification"):
+                crops = self._classify(crops)
+        out: list[tuple[str, float]] = [("", 0.0)] * len(crops)
+        order = np.argsort([c.shape[1] / max(1, c.shape[0]) for c in crops], kind="stable")
+        with metrics.stage("recognition"):
+            name = self.rec.get_inputs()[0].name
+            for start in range(0, len(order), REC_BATCH):
+                idx = order[start : start + REC_BATCH].tolist()
+                probs = self.rec.run(None, {name: _rec_input([crops[i] for i in idx])})[0]
+                for i, res in zip(idx, ctc_decode(probs, self.charset)):
+                    out[i] = res
+        return out
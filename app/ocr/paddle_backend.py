@@ -1,64 +1,127 @@
 from __future__ import annotations
-from typing import Any, List, Tuple
-from io import BytesIO
-from PIL import Image
+from typing import Any
+import importlib.util
+import threading
 import numpy as np
+from app.core import metrics
+from .analysis import AnalysisContext, TextBoxes
+from .backend import OcrBackend, crop_box, sorted_boxes
 
-try:
-    from paddleocr import PaddleOCR  # type: ignore
-    _paddle_available = True
-except Exception:  # pragma: no cover
-    PaddleOCR = None  # type: ignore
-    _paddle_available = False
+# Cheap presence check only: importing paddleocr pulls in paddle and takes
+# seconds, so the real import is deferred to the first backend (or warm-up)
+_paddle_available = importlib.util.find_spec("paddleocr") is not None
+_paddle_modules: dict[str, Any] | None = None
+_paddle_import_error: BaseException | None = None
+_import_lock = threading.Lock()
 
-try:
-    # PP-Structure entrypoint (if packaged)
-    from paddleocr import PPStructure  # type: ignore
-    _pp_structure_available = True
-except Exception:  # pragma: no cover
-    PPStructure = None  # type: ignore
-    _pp_structure_available = False
 
+def load_paddleocr() -> dict[str, Any]:
+    """Import PaddleOCR once per process; safe to call from a warm-up thread.
+
+    Returns the entrypoints this backend uses. ``PPStructure`` and
+    ``get_rotate_crop_image`` are None when not packaged. A failed import is
+    remembered and re-raised instead of being retried on every engine.
+    """
+    global _paddle_modules, _paddle_import_error
+    with _import_lock:
+        if _paddle_modules is None:
+            if _paddle_import_error is not None:
+                raise RuntimeError("PaddleOCR not available") from _paddle_import_error
+            try:
+                from paddleocr import PaddleOCR  # type: ignore
+            except BaseException as exc:
+                _paddle_import_error = exc
+                raise RuntimeError("PaddleOCR not available") from exc
+            modules: dict[str, Any] = {"PaddleOCR": PaddleOCR, "PPStructure": None, "get_rotate_crop_image": None}
+            try:
+                # PP-Structure entrypoint (if packaged)
+                from paddleocr import PPStructure  # type: ignore
+
+                modules["PPStructure"] = PPStructure
+            except Exception:  # pragma: no cover
+                pass
+            try:
+                # paddleocr registers its bundled ``tools`` package on import
+                from tools.infer.utility import get_rotate_crop_image  # type: ignore
+
+                modules["get_rotate_crop_image"] = get_rotate_crop_image
+            except Exception:  # pragma: no cover
+                pass
+            _paddle_modules = modules
+        return _paddle_modules
+
+
+class PaddleBackend(OcrBackend):
+    name = "paddle"
+    uses_device = True
 
-class PaddleBackend:
     def __init__(self, lang: str = "en", use_gpu: bool | None = None) -> None:
         if not _paddle_available:
             raise RuntimeError("PaddleOCR not available")
-        self.ocr = PaddleOCR(use_angle_cls=True, lang=lang, use_gpu=use_gpu)
+        self.ocr = load_paddleocr()["PaddleOCR"](use_angle_cls=True, lang=lang, use_gpu=use_gpu)
         # Lazily create PP-Structure only when needed to avoid SystemExit on unsupported langs
         self._pp_structure = None
 
-    def _decode(self, content: bytes) -> Any:
-        img = Image.open(BytesIO(content)).convert("RGB")
-        return np.array(img)
-
-    def recognize(self, image: Any | bytes) -> tuple[str, list[tuple[list[tuple[int, int]], str, float]]]:
-        if isinstance(image, (bytes, bytearray)):
-            image = self._decode(image)
-        result = self.ocr.ocr(image, cls=True)
-        text_all: List[str] = []
-        boxes_all: list[tuple[list[tuple[int, int]], str, float]] = []
-        for line in result[0]:
-            box_points = [(int(x), int(y)) for x, y in line[0]]
-            txt = line[1][0]
-            score = float(line[1][1])
-            text_all.append(txt)
-            boxes_all.append((box_points, txt, score))
-        return (" ".join(text_all), boxes_all)
-
-    def parse_structure(self, image: Any | bytes) -> dict:
-        if isinstance(image, (bytes, bytearray)):
-            image = self._decode(image)
+    def _split_available(self) -> bool:
+        return hasattr(self.ocr, "text_detector") and hasattr(self.ocr, "text_recognizer")
+
+    def detect(self, image: np.ndarray) -> list[np.ndarray]:
+        """Text detection only; boxes come back in reading order."""
+        with metrics.stage("detection"):
+            dt_boxes, _ = self.ocr.text_detector(image)
+        if dt_boxes is None or len(dt_boxes) == 0:
+            return []
+        return sorted_boxes(dt_boxes)
+
+    def recognize_crops(self, crops: list[np.ndarray], cls: bool = True) -> list[tuple[str, float]]:
+        """Angle classification (optional) and recognition over a list of crops.
+
+        The recognizer batches crops internally (``rec_batch_num``), so crops
+        from several images share forward passes.
+        """
+        if not crops:
+            return []
+        if cls and getattr(self.ocr, "use_angle_cls", False) and getattr(self.ocr, "text_classifier", None) is not None:
+            with metrics.stage("classification"):
+                crops, _, _ = self.ocr.text_classifier(crops)
+        with metrics.stage("recognition"):
+            rec_res, _ = self.ocr.text_recognizer(crops)
+        return [(str(txt), float(score)) for txt, score in rec_res]
+
+    @property
+    def drop_score(self) -> float:
+        return float(getattr(self.ocr, "drop_score", 0.5))
+
+    def _crop(self, image: np.ndarray, box: np.ndarray) -> np.ndarray:
+        return crop_box(image, box, _paddle_modules.get("get_rotate_crop_image") if _paddle_modules else None)
+
+    def _recognize_whole(self, image: np.ndarray) -> tuple[str, TextBoxes]:
+        with metrics.stage("detection_recognition"):
+            result = self.ocr.ocr(image, cls=True)
+        lines = result[0] or []
+        texts = [str(line[1][0]) for line in lines]
+        boxes = TextBoxes.build([line[0] for line in lines], texts, [float(line[1][1]) for line in lines])
+        return (" ".join(texts), boxes)
+
+    def _recognize_lines(self, crops: list[np.ndarray], cls: bool) -> list[tuple[str, float]]:
+        # Recognition-only call of the bundled pipeline, one crop at a time
+        with metrics.stage("recognition"):
+            return [tuple((self.ocr.ocr(crop, det=False, cls=cls)[0] or [("", 0.0)])[0]) for crop in crops]
+
+    def _parse_structure(self, image: Any, ctx: AnalysisContext | None) -> dict:
         # Lazy init PP-Structure here
-        if self._pp_structure is None and _pp_structure_available:
+        # Modules are loaded by __init__; PP-Structure itself is created on first use
+        pp_structure = _paddle_modules.get("PPStructure") if self._pp_structure is None and _paddle_modules else None
+        if pp_structure is not None:
             try:
-                self._pp_structure = PPStructure(layout=True, table=True, ocr=True, lang=self.ocr.lang)  # type: ignore
+                self._pp_structure = pp_structure(layout=True, table=True, ocr=True, lang=self.ocr.lang)  # type: ignore
             except BaseException:
                 # Catch SystemExit raised internally by PP-Structure on unsupported languages
                 self._pp_structure = None
         if self._pp_structure is not None:
             try:
-                elements = self._pp_structure(image)  # type: ignore
+                with metrics.stage("structure"):
+                    elements = self._pp_structure(image)  # type: ignore
                 tables: list[dict] = []
                 md_lines: list[str] = []
                 for el in elements:
@@ -70,23 +133,7 @@ class PaddleBackend:
                 return {"tables": tables, "markdown": "\n".join(md_lines)}
             except Exception:
                 # If runtime error, fall back below
-                pass
-        # Fallback to OCR text as markdown-like output
-        text, _ = self.recognize(image)
-        return {"tables": [], "markdown": text}
-
-    def extract(self, image: Any | bytes) -> dict:
-        if isinstance(image, (bytes, bytearray)):
-            image = self._decode(image)
-        # Placeholder: ChatOCRv4/ERNIE PoC hook — gated by settings
-        try:
-            from app.core.config import settings  # lazy import to avoid cycles
-            if getattr(settings, "chatocr_enabled", False) and settings.chatocr_api_token:
-                # PoC: enrich with a dummy entity indicating ChatOCR path used
-                text, _ = self.recognize(image)
-                return {"entities": [{"text": text, "type": "chatocr_poc"}]}
-        except Exception:
-            pass
-        # Default fallback
-        text, _ = self.recognize(image)
-        return {"entities": [{"text": text, "type": "summary"}]}
+                metrics.count("ocr_fallbacks_total", op="parse_structure", reason="pp_structure_error")
+        else:
+            metrics.count("ocr_fallbacks_total", op="parse_structure", reason="pp_structure_unavailable")
+        return self._text_structure(image, ctx)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from app.core import metrics
+from app.core.config import settings
+from .analysis import AnalysisContext
+from .autolang import AUTO_LANG, dominant, recognize_auto
+from .breaker import BackendUnavailable, InferenceFailed, tracking
+from .engine import lang_label, model_label
+from .preprocess import prepare, prepare_adaptive
+from .regions import RegionSpec
+from .registry import get_engine
+
+
+# "all" returns recognition, structure and extraction from one shared analysis
+SUPPORTED_MODES = ("recognition", "parsing", "extraction", "all")
+# /ocr only: recognize caller-given regions (or a stored template), no detection
+REGIONS_MODE = "regions"
+# Payload entry for response meta (inference scale, degraded serving); split off by split_meta
+META_KEY = "_meta"
+
+
+def _payload(mode: str, res: Any) -> dict[str, Any]:
+    # "boxes" stays a TextBoxes; it becomes per-box dicts only when rendered as JSON
+    if mode == "all":
+        rec, struct, extr = res
+        return {**_payload("recognition", rec), **_payload("parsing", struct), **_payload("extraction", extr)}
+    if mode == REGIONS_MODE:
+        return {"text": res.text, "boxes": res.boxes, "fields": dict(zip(res.names, res.boxes.texts))}
+    if mode == "recognition":
+        if res.langs is not None:
+            return {"text": res.text, "boxes": res.boxes, "langs": res.langs}
+        return {"text": res.text, "boxes": res.boxes}
+    if mode == "parsing":
+        return {"structure": {"tables": res.tables, "markdown": res.markdown}}
+    return {"extraction": {"entities": res.entities}}
+
+
+def metric_labels(mode: str, lang: str, model: str) -> dict[str, str]:
+    """``ocr_stage_seconds`` labels for a request, bounded whatever the client sent."""
+    return {"mode": mode, "lang": AUTO_LANG if lang == AUTO_LANG else lang_label(lang), "model": model_label(model)}
+
+
+def split_meta(result: dict[str, Any], cached: bool = False) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Separate a payload from its response meta (the payload itself is not modified)."""
+    if META_KEY not in result:
+        return result, {}
+    payload = dict(result)
+    meta = dict(payload.pop(META_KEY))
+    if cached:
+        # The cached answer is served without touching any backend
+        meta.pop("degraded", None)
+    return payload, meta
+
+
+def _with_meta(payload: dict[str, Any], scaling: dict[str, Any], degraded: dict[str, str]) -> dict[str, Any]:
+    meta = dict(scaling)
+    if degraded:
+        meta["degraded"] = dict(degraded)
+    if meta:
+        payload[META_KEY] = meta
+    return payload
+
+
+@contextmanager
+def _recording() -> Iterator[tuple[metrics.Recorder, Dict[str, str]]]:
+    """Worker-side recorder plus degradation notes for one unit of work.
+
+    A shed or failed call never returns the recorder export, so its counters
+    (``ocr_degraded_total`` among them) ride on the exception as
+    ``worker_metrics``; the executor merges them on the caller's side.
+    """
+    with metrics.recording() as rec, tracking() as degraded:
+        try:
+            yield rec, degraded
+        except (BackendUnavailable, InferenceFailed) as exc:
+            exc.worker_metrics = {"stages": {}, "counts": list(rec.counts)}  # type: ignore[attr-defined]
+            raise
+
+
+def _prepare_resized(content: Any, max_px: int | None) -> tuple[Any, dict[str, Any]]:
+    """Decode an ``/ocr`` input at its inference scale.
+
+    With ``adaptive_resize`` the scale follows the estimated text height and
+    is reported as ``{"scale", "text_px"}``; otherwise inputs are capped at
+    ``max_px`` (None when recognition will tile them).
+    """
+    if not settings.adaptive_resize:
+        return prepare(content, max_px), {}
+    image, info = prepare_adaptive(
+        content,
+        text_px_range=(settings.adaptive_text_px_min, settings.adaptive_text_px_max),
+        max_upscale=settings.adaptive_max_upscale,
+        max_px=settings.adaptive_max_px,
+        fallback_max_px=max_px,
+        thumb_px=settings.adaptive_thumb_px,
+    )
+    if info:
+        scale = info["scale"]
+        metrics.count("ocr_adaptive_resize_total", outcome="estimate_failed" if info["text_px"] is None else "down" if scale < 1 else "up" if scale > 1 else "keep")
+    return image, info
+
+
+def _tiled(image: Any) -> bool:
+    """Whether a decoded input is large enough to go through tiled recognition."""
+    return bool(settings.ocr_tiling and settings.max_image_px and isinstance(image, np.ndarray) and max(image.shape[:2]) > settings.max_image_px)
+
+
+def run_mode(mode: str, content: bytes, lang: str, model: str, resize: bool = False, regions: RegionSpec | None = None) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Blocking unit of work executed on the inference pool.
+
+    Kept as a module-level function so it can be pickled for the process pool;
+    each worker process resolves engines through its own registry. Returns the
+    result payload and the exported stage timings/counters for the caller.
+    """
+    if mode == REGIONS_MODE and regions is not None:
+        with _recording() as (rec, degraded):
+            # Full resolution: only the regions are cropped, nothing scans the whole page
+            with metrics.stage("decode"):
+                image = prepare(content, None)
+            # Undecodable input resolves to empty boxes; the engine reports them as blank fields
+            boxes = regions.resolve(*(image.shape[:2] if isinstance(image, np.ndarray) else (0, 0)))
+            res = get_engine(lang, model).recognize_regions(image, boxes, regions.names, cls=regions.cls)
+            payload = _with_meta(_payload(REGIONS_MODE, res), {}, degraded)
+        return payload, rec.export()
+    if mode not in SUPPORTED_MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    with _recording() as (rec, degraded):
+        # Decode once, downscaling /ocr inputs to max_image_px unless recognition will tile them
+        full_res = resize and settings.ocr_tiling and mode in ("recognition", "all") and lang != AUTO_LANG
+        with metrics.stage("decode"):
+            if resize:
+                content, scaling = _prepare_resized(content, None if full_res else settings.max_image_px)
+            else:
+                content, scaling = prepare(content, None), {}
+        if lang == AUTO_LANG:
+            payload = _analyze_auto(mode, content, model)
+        else:
+            payload = _analyze(get_engine(lang, model), mode, content, tiled=full_res and _tiled(content))
+        _with_meta(payload, scaling, degraded)
+    return payload, rec.export()
+
+
+def _analyze_auto(mode: str, content: Any, model: str) -> dict[str, Any]:
+    """``lang=auto``: routed recognition first; later stages reuse it on the dominant language's engine."""
+    ctx = AnalysisContext()
+    rec = recognize_auto(content, model, ctx)
+    lang = dominant(rec)
+    if mode == "recognition":
+        return {**_payload(mode, rec), "lang_detected": lang}
+    payload = _analyze(get_engine(lang, model), mode, content, ctx=ctx)
+    if mode == "all":
+        payload.update(_payload("recognition", rec))
+    return {**payload, "lang_detected": lang}
+
+
+def _analyze(engine: Any, mode: str, content: Any, tiled: bool = False, ctx: AnalysisContext | None = None) -> dict[str, Any]:
+    ctx = ctx or AnalysisContext()
+
+    def recognize() -> Any:
+        if tiled:
+            return engine.recognize_tiled(content, settings.tile_px, settings.tile_overlap_px, settings.tile_nms_threshold, ctx)
+        return engine.recognize(content, ctx)
+
+    if mode == "recognition":
+        res = recognize()
+    elif mode == "parsing":
+        res = engine.parse_structure(content, ctx)
+    elif mode == "extraction":
+        res = engine.extract_info(content, ctx)
+    else:
+        # Later stages pick up the decoded image, boxes and text memoized by earlier ones
+        res = (recognize(), engine.parse_structure(content, ctx), engine.extract_info(content, ctx))
+    return _payload(mode, res)
+
+
+def run_batch(mode: str, items: List[Any], lang: str, model: str) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Run one chunk of a batch request on a worker, returning items in input order.
+
+    Recognition goes through a single model-level batch; the other modes have
+    no batched entrypoint and run item by item. ``infer_ms`` is the wall
+    time of the whole chunk, which is what each item actually waited for.
+    """
+    started = perf_counter()
+    out: list[dict[str, Any]] = []
+    with metrics.recording() as rec, tracking() as degraded:
+        if lang == AUTO_LANG:
+            # Routing is per image: no shared model-level batch across languages
+            for item in items:
+                try:
+                    out.append(_analyze_auto(mode, item, model))
+                except BackendUnavailable:
+                    out.append({"error": "Unavailable"})
+                except Exception:
+                    out.append({"error": "InferenceError"})
+        elif mode == "recognition":
+            for res in get_engine(lang, model).recognize_batch(items):
+                out.append({"error": res.error} if res.error else _payload(mode, res))
+        else:
+            engine = get_engine(lang, model)
+            for item in items:
+                try:
+                    out.append(_analyze(engine, mode, item))
+                except BackendUnavailable:
+                    out.append({"error": "Unavailable"})
+                except Exception:
+                    out.append({"error": "InferenceError"})
+    infer_ms = int((perf_counter() - started) * 1000)
+    for entry in out:
+        entry["infer_ms"] = infer_ms
+        if degraded and "error" not in entry:
+            # One chunk shares its backends, so a degradation applies to all of it
+            entry["degraded"] = dict(degraded)
+    return out, rec.export()
+
+
+def run_recognition_batch(contents: List[Any], lang: str, model: str, max_px: int | None = None) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Recognize independent requests in one model-level batch (micro-batching).
+
+    Unlike ``run_batch`` this mirrors single-request ``/ocr`` semantics: inputs
+    are downscaled like ``run_mode(resize=True)``, an undecodable item comes
+    back as the same empty result ``OcrEngine.recognize`` would give it, and an
+    unavailable or failing backend fails every request in the batch.
+    """
+    with _recording() as (rec, degraded):
+        with metrics.stage("decode"):
+            if max_px:
+                prepared = [_prepare_resized(c, None if settings.ocr_tiling else max_px) for c in contents]
+            else:
+                prepared = [(prepare(c, None), {}) for c in contents]
+            images = [image for image, _ in prepared]
+        engine = get_engine(lang, model)
+        payloads: list[dict[str, Any]] = [{} for _ in images]
+        # Oversized inputs are tiled one by one; the rest share one batch
+        tiled = {i for i, image in enumerate(images) if max_px and _tiled(image)}
+        for i in sorted(tiled):
+            payloads[i] = _analyze(engine, "recognition", images[i], tiled=True)
+        rest = [i for i in range(len(images)) if i not in tiled]
+        for i, res in zip(rest, engine.recognize_batch([images[i] for i in rest], strict=True)):
+            payloads[i] = _payload("recognition", res)
+        for payload, (_, scaling) in zip(payloads, prepared):
+            _with_meta(payload, scaling, degraded)
+    return payloads, rec.export()
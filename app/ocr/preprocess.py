@@ -0,0 +1,169 @@
+from __future__ import annotations
+from io import BytesIO
+from typing import Any, Dict
+from PIL import Image
+import numpy as np
+
+
+# Adaptive resize never shrinks the longest side below this (or the original size)
+_MIN_SIDE_PX = 640
+
+
+def _open(content: Any) -> Image.Image:
+    if hasattr(content, "read"):
+        # File-like (e.g. an mmap'd upload): decode straight from it
+        content.seek(0)
+        return Image.open(content)
+    return Image.open(BytesIO(content))
+
+
+def decode_image(content: Any, max_px: int | None = None) -> np.ndarray:
+    """Decode an encoded image once into a contiguous RGB uint8 array.
+
+    When ``max_px`` is set and the image is larger, JPEGs are decoded in draft
+    mode (DCT-domain downscale by 1/2, 1/4 or 1/8) to the smallest size that is
+    still >= the target, then resized the rest of the way. No intermediate
+    re-encode happens; the array goes straight to the backend.
+    """
+    im = _open(content)
+    if max_px and max(im.size) > max_px:
+        if im.format == "JPEG":
+            w, h = im.size
+            scale = max_px / max(w, h)
+            im.draft("RGB", (max(1, int(w * scale)), max(1, int(h * scale))))
+        im = im.convert("RGB")
+        im.thumbnail((max_px, max_px), Image.Resampling.BILINEAR, reducing_gap=None)
+    else:
+        im = im.convert("RGB")
+    return np.ascontiguousarray(np.array(im, dtype=np.uint8))
+
+
+def prepare(content: Any, max_px: int | None = None) -> np.ndarray | Any:
+    """Decode for inference; arrays and anything PIL cannot open pass through unchanged."""
+    if isinstance(content, np.ndarray):
+        return content
+    try:
+        return decode_image(content, max_px)
+    except Exception:
+        # Not an image: let the engine decide (tests send text/plain to the stub)
+        return content
+
+
+def estimate_text_height(gray: np.ndarray, strips: int = 8, min_runs: int = 3) -> float | None:
+    """Dominant text line height in pixels of ``gray`` (2-D uint8), or None.
+
+    Otsu-binarizes the image (the class filling the margins is background,
+    so light-on-dark works too), splits it into vertical strips so columns do not merge lines,
+    and takes the row projection profile of each strip. Runs of inked rows
+    are text lines; the median run height is the estimate. Pages with fewer
+    than ``min_runs`` plausible lines (photos, blank pages) return None.
+    """
+    h, w = gray.shape[:2]
+    if h < 16 or w < 16:
+        return None
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    p = hist / hist.sum()
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    t = int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+    dark = gray <= t
+    # Background is whatever fills the margins (dark-mode screenshots included)
+    border = np.concatenate((dark[0], dark[-1], dark[:, 0], dark[:, -1]))
+    ink = dark if border.mean() < 0.5 else ~dark
+    strips = max(1, min(strips, w // 8))
+    sw = w // strips
+    density = ink[:, : sw * strips].reshape(h, strips, sw).mean(axis=2)
+    # A row belongs to a line when it holds a fair share of its strip's densest row
+    on = density > np.maximum(0.01, 0.15 * density.max(axis=0))
+    padded = np.zeros((strips, h + 2), dtype=np.int8)
+    padded[:, 1:-1] = on.T
+    edges = np.diff(padded, axis=1)
+    # Strip-major order, and every run starts and ends inside its strip
+    heights = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    heights = heights[(heights >= 2) & (heights <= h / 8)]
+    if len(heights) < min_runs:
+        return None
+    return float(np.median(heights))
+
+
+def choose_scale(text_px: float, min_px: float, max_px: float, max_upscale: float = 2.0) -> float:
+    """Scale that brings ``text_px`` into ``[min_px, max_px]``; 1.0 when it already is."""
+    if text_px > max_px:
+        return max_px / text_px
+    if text_px < min_px:
+        return min(max_upscale, min_px / text_px)
+    return 1.0
+
+
+def decode_adaptive(
+    content: Any,
+    *,
+    text_px_range: tuple[float, float],
+    max_upscale: float,
+    max_px: int,
+    fallback_max_px: int | None,
+    thumb_px: int = 1024,
+) -> tuple[np.ndarray, Dict[str, Any]]:
+    """Decode at the scale that puts the dominant text height in ``text_px_range``.
+
+    The text height comes from ``estimate_text_height`` on a grayscale
+    thumbnail (JPEGs decode it in draft mode, then decode again straight to
+    the chosen size), or on a full-resolution window when the text is too
+    small to resolve on the thumbnail. Without an estimate the image is capped at
+    ``fallback_max_px`` like ``decode_image``; the longest side never exceeds
+    ``max_px``. Returns the RGB array and ``{"scale", "text_px"}``, with
+    ``text_px`` in pixels of the original image.
+    """
+    im = _open(content)
+    w, h = im.size
+    full = None
+    if im.format == "JPEG":
+        ratio = thumb_px / max(w, h)
+        if ratio < 1:
+            im.draft("L", (max(1, int(w * ratio)), max(1, int(h * ratio))))
+        thumb = im.convert("L")
+    else:
+        full = im.convert("RGB")
+        thumb = full.convert("L")
+    thumb.thumbnail((thumb_px, thumb_px), Image.Resampling.BILINEAR, reducing_gap=None)
+    text_px = estimate_text_height(np.asarray(thumb))
+    ratio = w / thumb.size[0]
+    if text_px is not None and text_px < 4 and ratio > 1.5:
+        # Too small to measure on the thumbnail: use a full-resolution window
+        # from the middle of the page (small text needs the full decode anyway)
+        if full is None:
+            full = _open(content).convert("RGB")
+        x0, y0 = max(0, (w - thumb_px) // 2), max(0, (h - thumb_px) // 2)
+        fine = estimate_text_height(np.asarray(full.crop((x0, y0, x0 + min(w, thumb_px), y0 + min(h, thumb_px))).convert("L")))
+        if fine is not None:
+            text_px, ratio = fine, 1.0
+    if text_px is not None:
+        text_px *= ratio
+        scale = choose_scale(text_px, *text_px_range, max_upscale=max_upscale)
+        # Never below a legible page size, never above the memory ceiling
+        scale = max(scale, min(1.0, _MIN_SIDE_PX / max(w, h)))
+    else:
+        scale = min(1.0, fallback_max_px / max(w, h)) if fallback_max_px else 1.0
+    scale = min(scale, max_px / max(w, h))
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    if full is None:
+        im = _open(content)
+        if scale < 1:
+            im.draft("RGB", size)
+        full = im.convert("RGB")
+    if full.size != size:
+        full = full.resize(size, Image.Resampling.BICUBIC if scale > 1 else Image.Resampling.BILINEAR, reducing_gap=None if scale > 1 else 2.0)
+    info = {"scale": round(size[0] / w, 4), "text_px": round(text_px, 1) if text_px is not None else None}
+    return np.ascontiguousarray(np.array(full, dtype=np.uint8)), info
+
+
+def prepare_adaptive(content: Any, **options: Any) -> tuple[np.ndarray | Any, Dict[str, Any]]:
+    """``decode_adaptive`` with ``prepare``'s pass-through for arrays and non-images."""
+    if isinstance(content, np.ndarray):
+        return content, {}
+    try:
+        return decode_adaptive(content, **options)
+    except Exception:
+        return content, {}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+import json
+import os
+import threading
+import numpy as np
+from app.core.config import settings
+
+
+class RegionError(ValueError):
+    """Invalid region list or unknown template; reported as a 400-style failure."""
+
+
+@dataclass
+class RegionSpec:
+    """Named boxes to recognize without running detection.
+
+    ``boxes`` is ``(N, 4)`` float ``[x0, y0, x1, y1]``, in pixels of the
+    uploaded image or, with ``units="relative"``, as fractions of its width
+    and height (robust to scan resolution, the usual choice for templates).
+    """
+
+    names: List[str]
+    boxes: np.ndarray
+    units: str = "px"
+    cls: bool = False
+
+    def resolve(self, height: int, width: int) -> np.ndarray:
+        """Integer pixel boxes clipped to the image, ``(N, 4)`` int32."""
+        boxes = self.boxes * np.array([width, height, width, height], dtype=np.float64) if self.units == "relative" else self.boxes
+        boxes = np.rint(boxes).astype(np.int64)
+        boxes[:, 0::2] = np.clip(boxes[:, 0::2], 0, width)
+        boxes[:, 1::2] = np.clip(boxes[:, 1::2], 0, height)
+        return boxes.astype(np.int32)
+
+    def key(self) -> dict[str, Any]:
+        """Everything that changes the output, for the result cache key."""
+        return {"names": self.names, "boxes": self.boxes.round(6).tolist(), "units": self.units, "cls": self.cls}
+
+
+def parse_regions(data: Any, cls: bool | None = None) -> RegionSpec:
+    """Build a spec from ``[{"name", "box"}, ...]`` or ``{"units", "cls", "regions": [...]}``."""
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError as exc:
+            raise RegionError(f"regions is not valid JSON: {exc}") from exc
+    options: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        options, data = data, data.get("regions")
+    if not isinstance(data, list) or not data:
+        raise RegionError("regions must be a non-empty list")
+    if len(data) > 256:
+        raise RegionError("at most 256 regions per request")
+    names: List[str] = []
+    boxes: List[List[float]] = []
+    for i, item in enumerate(data):
+        box = item.get("box") if isinstance(item, dict) else item
+        try:
+            x0, y0, x1, y1 = (float(v) for v in box)
+        except (TypeError, ValueError):
+            raise RegionError(f"region {i}: box must be [x0, y0, x1, y1]")
+        if x1 <= x0 or y1 <= y0:
+            raise RegionError(f"region {i}: box must have x1 > x0 and y1 > y0")
+        name = str(item.get("name", i)) if isinstance(item, dict) else str(i)
+        if name in names:
+            raise RegionError(f"region {i}: duplicate name {name!r}")
+        names.append(name)
+        boxes.append([x0, y0, x1, y1])
+    units = str(options.get("units", "px"))
+    if units not in ("px", "relative"):
+        raise RegionError("units must be 'px' or 'relative'")
+    return RegionSpec(
+        names=names,
+        boxes=np.asarray(boxes, dtype=np.float64),
+        units=units,
+        cls=bool(options.get("cls", False)) if cls is None else cls,
+    )
+
+
+@dataclass
+class TemplateStore:
+    """Named region templates from a JSON file, reloaded when the file changes.
+
+    The file maps template names to the object form accepted by
+    ``parse_regions``; specs are parsed once per file version.
+    """
+
+    path: str | None
+    _specs: Dict[str, RegionSpec] = field(default_factory=dict)
+    _mtime: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _load(self) -> Dict[str, RegionSpec]:
+        if not self.path:
+            return {}
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path) as fh:
+                    raw = json.load(fh)
+                self._specs = {str(name): parse_regions(spec) for name, spec in raw.items()}
+                self._mtime = mtime
+            return self._specs
+
+    def get(self, name: str) -> RegionSpec:
+        spec = self._load().get(name)
+        if spec is None:
+            raise RegionError(f"unknown template: {name}")
+        return spec
+
+    def names(self) -> List[str]:
+        return sorted(self._load())
+
+
+templates = TemplateStore(settings.templates_path)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from time import perf_counter
+from typing import Any, Dict, Tuple
+import threading
+import structlog
+from app.core import metrics
+from app.core.config import settings
+from .engine import OcrEngine, _device_label, lang_label, model_label
+
+
+log = structlog.get_logger()
+
+EngineKey = Tuple[str, str, str]
+
+
+@dataclass
+class RegistryStats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    load_failures: int = 0
+    evictions: int = 0
+    load_ms_total: float = 0.0
+    load_ms_last: float = 0.0
+    load_ms_by_key: Dict[str, float] = field(default_factory=dict)
+
+
+class EngineRegistry:
+    """Process-wide LRU of loaded OcrEngine instances keyed by (lang, model, device)."""
+
+    def __init__(self, max_models: int = 4) -> None:
+        self.max_models = max(1, int(max_models))
+        self._engines: "OrderedDict[EngineKey, OcrEngine]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key locks so concurrent misses on the same key load the model once
+        self._loading: dict[EngineKey, threading.Lock] = {}
+        self.stats = RegistryStats()
+
+    def key(self, lang: str, model: str, device: str | None = None) -> EngineKey:
+        return (lang, model, _device_label(device if device is not None else settings.ocr_device))
+
+    def get(self, lang: str, model: str, device: str | None = None, warmup: bool = False) -> OcrEngine:
+        key = self.key(lang, model, device)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                self.stats.hits += 1
+                return engine
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                engine = self._engines.get(key)
+                if engine is not None:
+                    self._engines.move_to_end(key)
+                    self.stats.hits += 1
+                    return engine
+                self.stats.misses += 1
+            engine = self._load(key, warmup=warmup)
+            with self._lock:
+                self._engines[key] = engine
+                self._engines.move_to_end(key)
+                self._loading.pop(key, None)
+                while len(self._engines) > self.max_models:
+                    evicted, _ = self._engines.popitem(last=False)
+                    self.stats.evictions += 1
+                    log.info("engine_evicted", lang=evicted[0], model=evicted[1], device=evicted[2])
+            return engine
+
+    def _load(self, key: EngineKey, warmup: bool = False) -> OcrEngine:
+        lang, model, device = key
+        started = perf_counter()
+        try:
+            with metrics.stage("model_load"):
+                engine = OcrEngine(lang=lang, model=model, device=None if device == "auto" else device)
+                if warmup:
+                    engine.warmup()
+        except Exception:
+            with self._lock:
+                self.stats.load_failures += 1
+                self._loading.pop(key, None)
+            raise
+        elapsed_ms = (perf_counter() - started) * 1000
+        with self._lock:
+            self.stats.loads += 1
+            self.stats.load_ms_total += elapsed_ms
+            self.stats.load_ms_last = elapsed_ms
+            self.stats.load_ms_by_key["/".join(key)] = round(elapsed_ms, 1)
+        metrics.count("ocr_model_loads_total", lang=lang_label(lang), model=model_label(model), device=device)
+        log.info("engine_loaded", lang=lang, model=model, device=device, load_ms=int(elapsed_ms), warmup=warmup)
+        return engine
+
+    def preload(self, lang: str, model: str, device: str | None = None) -> OcrEngine:
+        engine = self.get(lang, model, device, warmup=True)
+        # Engines inherited from a preloading supervisor (app.serve) are loaded but cold
+        if not engine.warmed:
+            engine.warmup()
+        return engine
+
+    def loaded(self) -> list[EngineKey]:
+        with self._lock:
+            return list(self._engines.keys())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._engines.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            data = asdict(self.stats)
+            data["resident"] = ["/".join(k) for k in self._engines.keys()]
+            data["max_models"] = self.max_models
+        return data
+
+
+registry = EngineRegistry(max_models=settings.max_resident_models)
+
+
+def get_engine(lang: str, model: str, device: str | None = None) -> OcrEngine:
+    return registry.get(lang, model, device)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+from typing import Any
+import asyncio
+from app.core import metrics
+from app.core.config import settings
+from .autolang import AUTO_LANG, candidates
+from .breaker import STUB
+from .cache import result_cache
+from .engine import backend_for
+from .executor import executor
+from .pipeline import META_KEY, run_mode, split_meta
+from .regions import RegionSpec
+from .tenants import INTERACTIVE, tenant_scheduler
+
+
+async def _infer(mode: str, content: Any, lang: str, model: str, resize: bool, tenant: str, priority: int, regions: RegionSpec | None) -> tuple[dict[str, Any], dict[str, Any]]:
+    async with tenant_scheduler.slot(tenant, priority):
+        # Micro-batches are keyed by language; auto routing runs per request
+        if mode == "recognition" and settings.microbatch_enabled and lang != AUTO_LANG:
+            # Imported lazily: the batcher is only built when micro-batching is on
+            from .batcher import batcher
+
+            return await batcher.submit(content, lang, model, settings.max_image_px if resize else None)
+        return await executor.run(run_mode, mode, content, lang, model, resize, regions)
+
+
+async def run_cached(mode: str, content: bytes, lang: str, model: str, resize: bool = False, tenant: str = "anonymous", priority: int = INTERACTIVE, regions: RegionSpec | None = None) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Serve from the result cache when possible, otherwise run on the inference pool.
+
+    Cache misses wait for a dispatch slot of ``tenant`` at ``priority``.
+    Returns the result payload and response meta describing the cache
+    outcome, plus the inference scale (adaptive resizing) and ``degraded``
+    when a fallback backend served the request.
+    """
+    if result_cache is None:
+        with metrics.span("infer"):
+            result, worker_metrics = await _infer(mode, content, lang, model, resize, tenant, priority, regions)
+            metrics.merge(worker_metrics)
+        return split_meta(result)
+    # Everything that changes the output must be part of the key; a bare model
+    # name runs on OCR_BACKEND, so the key carries the backend it resolves to
+    backend, name = backend_for(model)
+    params = {"lang": lang, "backend": backend, "model": name, "mode": mode, "max_image_px": settings.max_image_px if resize else None}
+    if resize and settings.adaptive_resize and regions is None:
+        params["adaptive"] = (
+            settings.adaptive_text_px_min,
+            settings.adaptive_text_px_max,
+            settings.adaptive_max_upscale,
+            settings.adaptive_max_px,
+            settings.adaptive_thumb_px,
+        )
+    if regions is not None:
+        params["regions"] = regions.key()
+    elif lang == AUTO_LANG:
+        params["auto"] = (candidates(), settings.auto_lang_sample_size, settings.auto_lang_min_score)
+    elif resize and settings.ocr_tiling:
+        params["tiling"] = (settings.tile_px, settings.tile_overlap_px, settings.tile_nms_threshold)
+    # Hashing large uploads and the sqlite tier are blocking; keep them off the loop
+    key = await asyncio.to_thread(result_cache.make_key, content, **params)
+    cached, tier = await asyncio.to_thread(result_cache.get, key)
+    if cached is not None:
+        metrics.count("ocr_cache_requests_total", result="hit", tier=tier)
+        payload, extra = split_meta(cached, cached=True)
+        return payload, {"cache_hit": True, "cache_tier": tier, **extra}
+    metrics.count("ocr_cache_requests_total", result="miss")
+    with metrics.span("infer"):
+        result, worker_metrics = await _infer(mode, content, lang, model, resize, tenant, priority, regions)
+        metrics.merge(worker_metrics)
+    if result.get(META_KEY, {}).get("degraded", {}).get("served_by") != STUB:
+        # Placeholder output from a boot without the backend runtime must not outlive it
+        await asyncio.to_thread(result_cache.put, key, result)
+    payload, extra = split_meta(result)
+    return payload, {"cache_hit": False, **extra}
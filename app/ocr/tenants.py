@@ -0,0 +1,269 @@
+from __future__ import annotations
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, List
+import asyncio
+import math
+import threading
+import time
+import structlog
+from app.core import metrics
+from app.core.config import settings
+from .executor import QueueFullError, InferenceTimeout
+
+
+log = structlog.get_logger()
+
+# Lower runs first: interactive /ocr ahead of /ocr/batch and documents, ahead of async jobs
+INTERACTIVE, BATCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "async"}
+
+TENANT_WAIT = metrics.REGISTRY.histogram("ocr_tenant_wait_seconds", "Time a request waited for a tenant dispatch slot")
+TENANT_QUEUED = metrics.REGISTRY.gauge("ocr_tenant_queue_depth", "Requests waiting for a dispatch slot, per tenant")
+TENANT_RUNNING = metrics.REGISTRY.gauge("ocr_tenant_running", "Requests holding a dispatch slot, per tenant")
+TENANT_REJECTIONS = metrics.REGISTRY.counter("ocr_tenant_rejections_total", "Requests refused by tenant quotas, by reason")
+
+
+class RateLimited(Exception):
+    """Raised when a tenant's token bucket is empty; mapped to 429 + Retry-After."""
+
+    def __init__(self, tenant: str, retry_after_s: int) -> None:
+        super().__init__(f"Rate limit exceeded for {tenant}")
+        self.tenant = tenant
+        self.retry_after_s = retry_after_s
+
+
+@dataclass(frozen=True)
+class TenantLimits:
+    # 0 means unlimited for both; burst defaults to one second of rate
+    max_concurrency: int = 0
+    rate_per_s: float = 0.0
+    burst: float = 0.0
+
+    @property
+    def capacity(self) -> float:
+        return self.burst or max(1.0, self.rate_per_s)
+
+
+class QuotaBackend:
+    """Token-bucket state for rate limits.
+
+    ``take`` debits ``cost`` tokens and returns 0, or leaves the bucket alone
+    and returns the seconds until enough tokens will be available. The local
+    backend keeps state in this process; a shared store (e.g. Redis) can
+    implement the same method to apply limits across replicas.
+    """
+
+    def take(self, tenant: str, cost: float, rate_per_s: float, capacity: float) -> float:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, float]:
+        return {}
+
+
+class LocalQuotaBackend(QuotaBackend):
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, tenant: str, cost: float, rate_per_s: float, capacity: float) -> float:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(tenant, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate_per_s)
+            # A request larger than the bucket can still pass once it is full
+            need = min(cost, capacity)
+            if tokens < need:
+                self._buckets[tenant] = [tokens, now]
+                return (need - tokens) / rate_per_s
+            self._buckets[tenant] = [tokens - cost, now]
+            return 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {tenant: round(tokens, 3) for tenant, (tokens, _) in self._buckets.items()}
+
+
+@dataclass
+class TenantStats:
+    queued: int = 0
+    running: int = 0
+    dispatched: int = 0
+    rejected_rate: int = 0
+    rejected_queue: int = 0
+    wait_s_total: float = 0.0
+    wait_s_max: float = 0.0
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    seq: int
+    tenant: str
+    future: asyncio.Future
+
+
+class TenantScheduler:
+    """Fair dispatch in front of the inference pool, keyed on the authenticated tenant.
+
+    At most ``slots`` requests hold a dispatch slot at once and each tenant at
+    most its ``max_concurrency``. Requests that cannot start wait in one
+    queue ordered by (priority, arrival), skipping tenants that are already
+    at their limit, so a tenant flooding ``/ocr/batch`` neither starves other
+    tenants nor interactive calls. Rate limits are token buckets charged per
+    request (per image for batches) before any work is queued.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        max_queue: int = 16,
+        limits: TenantLimits | None = None,
+        overrides: Dict[str, TenantLimits] | None = None,
+        backend: QuotaBackend | None = None,
+        wait_timeout_s: float | None = None,
+        retry_after_s: int = 1,
+    ) -> None:
+        self.slots = max(1, int(slots))
+        self.max_queue = max(0, int(max_queue))
+        self.limits = limits or TenantLimits()
+        self.overrides = dict(overrides or {})
+        self.backend = backend or LocalQuotaBackend()
+        self.wait_timeout_s = wait_timeout_s
+        self.retry_after_s = retry_after_s
+        self.stats: Dict[str, TenantStats] = {}
+        self._running = 0
+        self._waiting: List[_Waiter] = []
+        self._seq = count()
+
+    def limits_for(self, tenant: str) -> TenantLimits:
+        return self.overrides.get(tenant, self.limits)
+
+    def _stats(self, tenant: str) -> TenantStats:
+        stats = self.stats.get(tenant)
+        if stats is None:
+            stats = self.stats[tenant] = TenantStats()
+        return stats
+
+    def _publish(self, tenant: str) -> None:
+        stats = self._stats(tenant)
+        TENANT_QUEUED.set(stats.queued, tenant=tenant)
+        TENANT_RUNNING.set(stats.running, tenant=tenant)
+
+    def charge(self, tenant: str, cost: float = 1) -> None:
+        """Debit the tenant's token bucket or raise ``RateLimited``."""
+        limits = self.limits_for(tenant)
+        if limits.rate_per_s <= 0 or cost <= 0:
+            return
+        wait = self.backend.take(tenant, cost, limits.rate_per_s, limits.capacity)
+        if wait > 0:
+            self._stats(tenant).rejected_rate += 1
+            TENANT_REJECTIONS.inc(tenant=tenant, reason="rate")
+            raise RateLimited(tenant, max(1, math.ceil(wait)))
+
+    def _has_room(self, tenant: str) -> bool:
+        limit = self.limits_for(tenant).max_concurrency
+        return limit <= 0 or self._stats(tenant).running < limit
+
+    def _start(self, tenant: str) -> None:
+        self._running += 1
+        stats = self._stats(tenant)
+        stats.running += 1
+        stats.dispatched += 1
+
+    def _dispatch(self) -> None:
+        while self._running < self.slots and self._waiting:
+            eligible = [w for w in self._waiting if self._has_room(w.tenant)]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: (w.priority, w.seq))
+            self._waiting.remove(waiter)
+            self._stats(waiter.tenant).queued -= 1
+            self._start(waiter.tenant)
+            waiter.future.set_result(None)
+            self._publish(waiter.tenant)
+
+    def _release(self, tenant: str) -> None:
+        self._running -= 1
+        self._stats(tenant).running -= 1
+        self._publish(tenant)
+        self._dispatch()
+
+    async def _acquire(self, tenant: str, priority: int) -> float:
+        started = time.perf_counter()
+        if not self._waiting and self._running < self.slots and self._has_room(tenant):
+            self._start(tenant)
+            self._publish(tenant)
+            return 0.0
+        if len(self._waiting) >= self.max_queue:
+            self._stats(tenant).rejected_queue += 1
+            TENANT_REJECTIONS.inc(tenant=tenant, reason="queue_full")
+            raise QueueFullError(self.retry_after_s)
+        waiter = _Waiter(priority, next(self._seq), tenant, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        self._stats(tenant).queued += 1
+        self._publish(tenant)
+        self._dispatch()
+        try:
+            # Background work has no caller waiting on it: it queues until load drops
+            timeout = None if priority >= BACKGROUND else self.wait_timeout_s
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout or None)
+        except BaseException as exc:
+            if waiter.future.done():
+                # Granted just as we gave up: hand the slot on
+                self._release(tenant)
+            else:
+                waiter.future.cancel()
+                self._waiting.remove(waiter)
+                self._stats(tenant).queued -= 1
+                self._publish(tenant)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise InferenceTimeout(self.wait_timeout_s or 0)
+            raise
+        return time.perf_counter() - started
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, priority: int = INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one dispatch slot for ``tenant`` while the block runs."""
+        waited = await self._acquire(tenant, priority)
+        stats = self._stats(tenant)
+        stats.wait_s_total += waited
+        stats.wait_s_max = max(stats.wait_s_max, waited)
+        TENANT_WAIT.observe(waited, tenant=tenant, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        metrics.record("tenant_wait", waited)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def snapshot(self) -> Dict[str, Any]:
+        tokens = self.backend.snapshot()
+        tenants = {}
+        for tenant, stats in self.stats.items():
+            data = asdict(stats)
+            data["wait_s_mean"] = round(stats.wait_s_total / stats.dispatched, 4) if stats.dispatched else 0.0
+            data["limits"] = asdict(self.limits_for(tenant))
+            if tenant in tokens:
+                data["tokens"] = tokens[tenant]
+            tenants[tenant] = data
+        return {"slots": self.slots, "running": self._running, "queued": len(self._waiting), "tenants": tenants}
+
+
+def _dispatch_slots() -> int:
+    if settings.tenant_dispatch_slots > 0:
+        return settings.tenant_dispatch_slots
+    workers = max(1, settings.inference_workers)
+    # Micro-batching needs concurrent requests in flight to have anything to coalesce
+    return workers * max(1, settings.microbatch_max_size) if settings.microbatch_enabled else workers
+
+
+tenant_scheduler = TenantScheduler(
+    slots=_dispatch_slots(),
+    max_queue=settings.inference_queue_size,
+    limits=TenantLimits(settings.tenant_max_concurrency, settings.tenant_rate_per_s, settings.tenant_burst),
+    overrides={tenant: TenantLimits(**values) for tenant, values in settings.tenant_limits.items()},
+    wait_timeout_s=settings.inference_timeout_s,
+    retry_after_s=settings.inference_retry_after_s,
+)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+from typing import List, Tuple
+import numpy as np
+
+
+Tile = Tuple[int, int, int, int]  # y0, x0, y1, x1
+
+
+def _starts(length: int, tile: int, step: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile + 1, step))
+    if starts[-1] + tile < length:
+        # Last tile is aligned to the edge rather than padded
+        starts.append(length - tile)
+    return starts
+
+
+def plan_tiles(height: int, width: int, tile_px: int, overlap_px: int) -> List[Tile]:
+    """Cover an image with ``tile_px`` squares overlapping by ``overlap_px``.
+
+    The overlap has to exceed the tallest text line for every line to appear
+    whole in at least one tile; the fragments cut at seams are removed by
+    ``suppress_duplicates``.
+    """
+    tile_px = max(1, int(tile_px))
+    step = max(1, tile_px - max(0, int(overlap_px)))
+    return [
+        (y, x, min(y + tile_px, height), min(x + tile_px, width))
+        for y in _starts(height, tile_px, step)
+        for x in _starts(width, tile_px, step)
+    ]
+
+
+def suppress_duplicates(boxes: np.ndarray, threshold: float = 0.5, scores: np.ndarray | None = None) -> np.ndarray:
+    """Greedy NMS over quadrilaterals, vectorized against all remaining boxes.
+
+    ``boxes`` is ``(N, 4, 2)``. Overlap is intersection over the *smaller*
+    axis-aligned box, so a line truncated at a tile seam is suppressed by the
+    complete copy from the neighbouring tile even though their IoU is low.
+    Larger (more complete) boxes win; ``scores`` weights that when given.
+    Returns the indices to keep, in priority order.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    x0, y0 = boxes[..., 0].min(axis=1), boxes[..., 1].min(axis=1)
+    x1, y1 = boxes[..., 0].max(axis=1), boxes[..., 1].max(axis=1)
+    area = np.maximum(x1 - x0, 0) * np.maximum(y1 - y0, 0)
+    priority = area if scores is None else area * np.asarray(scores, dtype=np.float32)
+    order = np.argsort(-priority, kind="stable")
+    keep: List[int] = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        iw = np.clip(np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]), 0, None)
+        ih = np.clip(np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]), 0, None)
+        smaller = np.maximum(np.minimum(area[i], area[rest]), 1e-6)
+        order = rest[(iw * ih) / smaller <= threshold]
+    return np.asarray(keep, dtype=np.int64)
@@ -1,12 +1,20 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends
-from app.api.auth import require_auth
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+import asyncio
+from app.core.profiling import profiles
+from app.core.startup import startup
+from app.api.auth import Principal, require_auth
+from app.ocr.registry import registry
+from app.ocr.breaker import breakers
+from app.ocr.cache import result_cache
+from app.ocr.regions import templates
+from app.ocr.tenants import tenant_scheduler
 
 router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(require_auth)])
 
 
-@router.get("/paddle")
-async def paddle_status():
+def _paddle_status() -> dict:
     status = {"available": False, "compiled_with_cuda": None, "run_check": None, "version": None}
     try:
         import paddle  # type: ignore
@@ -27,3 +35,65 @@ async def paddle_status():
     except Exception:
         pass
     return status
+
+
+@router.get("/paddle")
+async def paddle_status():
+    # Imports paddle and runs run_check(): seconds of blocking work, keep it off the loop
+    return await asyncio.to_thread(_paddle_status)
+
+
+@router.get("/startup")
+async def startup_status():
+    return startup.report()
+
+
+@router.get("/engines")
+async def engines_status():
+    return registry.snapshot()
+
+
+@router.get("/backends")
+async def backends_status():
+    return breakers.snapshot()
+
+
+@router.get("/cache")
+async def cache_status():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.snapshot()}
+
+
+@router.get("/tenants")
+async def tenants_status():
+    return tenant_scheduler.snapshot()
+
+
+@router.get("/templates")
+async def templates_status():
+    return {"path": templates.path, "templates": {name: templates.get(name).key() for name in templates.names()}}
+
+
+def _get_profile(profile_id: str, principal: Principal):
+    profile = profiles.get(profile_id)
+    # Like jobs: another tenant's profile is reported as missing
+    if profile is None or profile.tenant != principal.tenant:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles")
+async def profiles_list(principal: Principal = Depends(require_auth)):
+    return {"profiles": profiles.list(principal.tenant)}
+
+
+@router.get("/profiles/{profile_id}")
+async def profile_report(profile_id: str, principal: Principal = Depends(require_auth)):
+    return _get_profile(profile_id, principal).report()
+
+
+@router.get("/profiles/{profile_id}/collapsed")
+async def profile_collapsed(profile_id: str, principal: Principal = Depends(require_auth)):
+    # Collapsed stacks: feed to flamegraph.pl or load into speedscope
+    return PlainTextResponse(_get_profile(profile_id, principal).collapsed())
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi.responses import StreamingResponse
+from time import perf_counter
+from typing import Any, AsyncIterator, Iterator
+import asyncio
+import structlog
+from app.api.auth import Principal, require_auth
+from app.core.startup import require_ready
+from app.api.responses import render_json
+from app.api.schemas import StandardResponse, ok, fail
+from app.api.uploads import read_upload, UploadTooLarge
+from app.core import metrics
+from app.core.config import settings
+from app.ocr.documents import DocumentError, iter_pages, page_count
+from app.ocr.breaker import BackendUnavailable, InferenceFailed
+from app.ocr.executor import executor, QueueFullError, InferenceTimeout
+from app.ocr.pipeline import metric_labels, run_mode, split_meta, SUPPORTED_MODES
+from app.ocr.autolang import AUTO_LANG
+from app.ocr.tenants import BATCH, tenant_scheduler
+
+log = structlog.get_logger()
+
+router = APIRouter(tags=["documents"], dependencies=[Depends(require_auth)])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _frame(fmt: str, event: str, body: StandardResponse) -> bytes:
+    data = render_json(body).decode()
+    if fmt == "sse":
+        return f"event: {event}\ndata: {data}\n\n".encode()
+    return (data + "\n").encode()
+
+
+async def _infer_page(mode: str, image: Any, lang: str, model: str, tenant: str) -> tuple[dict[str, Any], dict[str, Any]]:
+    # The stream is already committed to 200, so wait for capacity instead of failing the page
+    deadline = perf_counter() + settings.inference_timeout_s
+    while True:
+        try:
+            async with tenant_scheduler.slot(tenant, BATCH):
+                return await executor.run(run_mode, mode, image, lang, model)
+        except QueueFullError as exc:
+            if perf_counter() + exc.retry_after_s > deadline:
+                raise
+            await asyncio.sleep(exc.retry_after_s)
+
+
+async def _stream(content: bytes, fmt: str, mode: str, lang: str, model: str, dpi: int, tenant: str) -> AsyncIterator[bytes]:
+    started = perf_counter()
+    pages: Iterator[Any] = iter_pages(content, dpi=dpi, max_px=settings.max_image_px, max_pages=settings.document_max_pages)
+    # Decode page N+1 on a thread while page N is on the inference pool
+    next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+    index = 0
+    try:
+        while True:
+            t_decode = perf_counter()
+            image = await next_page
+            if image is None:
+                break
+            decode_s = perf_counter() - t_decode
+            next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+            t_page = perf_counter()
+            meta: dict[str, Any] = {"page": index, "lang": lang, "mode": mode, "model": model}
+            try:
+                with metrics.recording() as rec:
+                    result, worker_metrics = await _infer_page(mode, image, lang, model, tenant)
+                    metrics.merge(worker_metrics)
+                result, extra = split_meta(result)
+                meta.update(extra)
+                rec.add("page_decode", decode_s)
+                metrics.apply(rec.export(), **metric_labels(mode, lang, model))
+                meta["latency_ms"] = int((perf_counter() - t_page) * 1000)
+                yield _frame(fmt, "page", ok(result, meta=meta))
+            except (QueueFullError, InferenceTimeout, BackendUnavailable, InferenceFailed) as exc:
+                code = {QueueFullError: "Overloaded", InferenceTimeout: "Timeout", BackendUnavailable: "Unavailable"}.get(type(exc), "InferenceError")
+                yield _frame(fmt, "page", fail(code, str(exc), meta=meta))
+            del image
+            index += 1
+    except DocumentError as exc:
+        yield _frame(fmt, "error", fail("BadDocument", str(exc), meta={"page": index}))
+    finally:
+        next_page.cancel()
+    yield _frame(fmt, "done", ok({"pages": index}, meta={"done": True, "latency_ms": int((perf_counter() - started) * 1000)}))
+
+
+@router.post("/ocr/document", response_model=StandardResponse, dependencies=[Depends(require_ready)])
+async def ocr_document(principal: Principal = Depends(require_auth), file: UploadFile = File(...), lang: str = settings.default_lang, mode: str = "recognition", model: str = settings.model_default, dpi: int = settings.document_dpi, format: str = "ndjson"):
+    """Multi-page PDF/TIFF OCR with one streamed result per page (NDJSON or SSE)."""
+    lang = (lang or settings.default_lang).strip().lower()
+    if settings.allowed_langs and lang not in settings.allowed_langs and lang != AUTO_LANG:
+        return fail("BadRequest", "Unsupported language code", {"lang": lang, "allowed": settings.allowed_langs})
+    if mode not in SUPPORTED_MODES:
+        return fail("BadRequest", "Unsupported mode", {"mode": mode})
+    if format not in MEDIA_TYPES:
+        return fail("BadRequest", "Unsupported format", {"format": format, "allowed": list(MEDIA_TYPES)})
+    dpi = max(36, min(int(dpi), settings.document_max_dpi))
+    try:
+        content = await read_upload(file, max_bytes=settings.document_max_mb * 1024 * 1024)
+    except UploadTooLarge:
+        return fail("PayloadTooLarge", "File too large")
+    try:
+        total = await asyncio.to_thread(page_count, content)
+    except DocumentError as exc:
+        return fail("BadDocument", str(exc))
+    # Charged per page, like /ocr/batch per image
+    tenant_scheduler.charge(principal.tenant, min(total, settings.document_max_pages))
+    log.info("document_accepted", pages=total, dpi=dpi, format=format)
+    return StreamingResponse(
+        _stream(content, format, mode, lang, model, dpi, principal.tenant),
+        media_type=MEDIA_TYPES[format],
+        headers={"X-Page-Count": str(min(total, settings.document_max_pages)), "Cache-Control": "no-cache"},
+    )
@@ -0,0 +1,66 @@
+from __future__ import annotations
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import asyncio
+from app.api.auth import Principal, require_auth
+from app.api.schemas import StandardResponse, ok, fail
+from app.api.uploads import read_upload, UploadTooLarge
+from app.core.config import settings
+from app.jobs.scheduler import scheduler
+from app.jobs.store import SUCCEEDED, TERMINAL
+from app.ocr.pipeline import SUPPORTED_MODES
+from app.ocr.autolang import AUTO_LANG
+from app.ocr.tenants import tenant_scheduler
+
+router = APIRouter(prefix="/jobs", tags=["jobs"], dependencies=[Depends(require_auth)])
+
+
+async def _get_job(job_id: str, principal: Principal):
+    job = await asyncio.to_thread(scheduler.store.get, job_id)
+    # Another tenant's job is reported as missing, not forbidden: ids do not leak
+    if job is None or job.tenant != principal.tenant:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", response_model=StandardResponse)
+async def submit_job(principal: Principal = Depends(require_auth), file: UploadFile = File(...), lang: str = settings.default_lang, mode: str = "recognition", model: str = settings.model_default):
+    lang = (lang or settings.default_lang).strip().lower()
+    if settings.allowed_langs and lang not in settings.allowed_langs and lang != AUTO_LANG:
+        return fail("BadRequest", "Unsupported language code", {"lang": lang, "allowed": settings.allowed_langs})
+    if mode not in SUPPORTED_MODES:
+        return fail("BadRequest", "Unsupported mode", {"mode": mode})
+    # Charged at submission; execution only competes for dispatch slots
+    tenant_scheduler.charge(principal.tenant)
+    try:
+        upload = await read_upload(file)
+    except UploadTooLarge:
+        return fail("PayloadTooLarge", "File too large")
+    # The durable queue keeps its own copy of the input
+    content = upload if isinstance(upload, bytes) else bytes(upload)
+    # Started lazily too, for deployments/tests that skip lifespan events
+    scheduler.start()
+    job = await scheduler.submit(mode, lang, model, content, principal.tenant)
+    return ok(job.summary(), meta={"lang": lang, "mode": mode, "model": model})
+
+
+@router.get("/{job_id}", response_model=StandardResponse)
+async def job_status(job_id: str, principal: Principal = Depends(require_auth)):
+    job = await _get_job(job_id, principal)
+    return ok(job.summary())
+
+
+@router.get("/{job_id}/result", response_model=StandardResponse)
+async def job_result(job_id: str, principal: Principal = Depends(require_auth)):
+    job = await _get_job(job_id, principal)
+    if job.status == SUCCEEDED:
+        return ok(job.result, meta=job.meta)
+    if job.status in TERMINAL:
+        return fail(job.error or "JobCancelled", f"Job {job.status}", {"status": job.status})
+    return fail("JobNotReady", "Job has not finished yet", {"status": job.status})
+
+
+@router.delete("/{job_id}", response_model=StandardResponse)
+async def cancel_job(job_id: str, principal: Principal = Depends(require_auth)):
+    await _get_job(job_id, principal)
+    job = await asyncio.to_thread(scheduler.store.cancel, job_id)
+    return ok(job.summary() if job else {})
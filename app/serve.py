@@ -0,0 +1,179 @@
+"""Preload-and-fork server: one supervisor, N uvicorn workers, models shared copy-on-write.
+
+    python -m app.serve --workers 4 --port 8080
+
+The supervisor imports the app, loads PaddleOCR and the PRELOAD_LANGS engines,
+freezes the GC so those objects are never touched again, binds the listening
+socket and then forks the workers. Every worker accepts on the same socket, so
+the kernel spreads connections across them, and the model weights stay in
+pages shared with the supervisor instead of being loaded once per worker.
+
+GPU note: a CUDA context cannot be shared across fork(). With OCR_DEVICE=gpu
+(or auto on a CUDA build) the supervisor skips the preload and each worker
+loads its own engines after fork; the shared-memory win applies to CPU serving.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+import structlog
+import uvicorn
+
+from app.core.config import settings
+from app.core.logging import configure_logging
+
+
+log = structlog.get_logger()
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _fork_safe_preload() -> bool:
+    if settings.ocr_device and settings.ocr_device.strip().lower() == "cpu":
+        return True
+    if settings.ocr_device and settings.ocr_device.strip().lower() == "gpu":
+        return False
+    # auto: only safe when paddle cannot pick a GPU
+    try:
+        import paddle  # type: ignore
+
+        return not paddle.is_compiled_with_cuda()
+    except Exception:
+        return True
+
+
+def preload(langs: List[str], model: str) -> List[str]:
+    """Import the app and load engines in the supervisor, before any thread starts."""
+    from app.main import app  # noqa: F401  (imports every module the workers need)
+    from app.ocr.paddle_backend import _paddle_available, load_paddleocr
+    from app.ocr.registry import registry
+
+    if _paddle_available and settings.ocr_backend == "paddle":
+        load_paddleocr()
+    loaded = []
+    for lang in dict.fromkeys(langs):
+        # No warm-up inference here: it would start native thread pools that do
+        # not survive fork(). Workers warm their inherited engines on startup.
+        registry.get(lang, model)
+        loaded.append(lang)
+    return loaded
+
+
+def _worker(sock: socket.socket, host: str, port: int) -> None:
+    # Siblings share the job store; only the supervisor requeues orphans
+    from app.jobs.scheduler import scheduler
+    from app.main import app
+
+    scheduler.recover_on_start = False
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, host=host, port=port, log_config=None, access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, host: str, port: int, workers: int) -> None:
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(self.sock, self.host, self.port)
+            except BaseException:
+                log.exception("serve_worker_crashed")
+                code = 1
+            finally:
+                # Skip the supervisor's atexit handlers and inherited buffers
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        log.info("serve_worker_started", pid=pid)
+
+    def _terminate(self, signum: int, _frame: object) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._terminate)
+        signal.signal(signal.SIGINT, self._terminate)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, time.monotonic())
+            log.info("serve_worker_exited", pid=pid, status=status)
+            if not self.stopping:
+                # Back off on crash loops instead of forking as fast as possible
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)
+                self.spawn()
+        return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Preload models once, then fork HTTP workers that share them.")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=settings.app_port)
+    p.add_argument("--workers", type=int, default=settings.serve_workers or (os.cpu_count() or 1))
+    p.add_argument("--langs", default=os.getenv("PRELOAD_LANGS") or settings.default_lang, help="comma-separated languages to preload")
+    p.add_argument("--no-preload", action="store_true", help="fork first; each worker loads its own engines")
+    args = p.parse_args(argv)
+    configure_logging()
+
+    # Keep the collector from touching (and un-sharing) objects created during preload
+    gc.disable()
+    started = time.perf_counter()
+    langs = [part.strip() for part in args.langs.split(",") if part.strip()]
+    if args.no_preload or not _fork_safe_preload():
+        from app.main import app  # noqa: F401
+
+        log.info("serve_preload_skipped", reason="disabled" if args.no_preload else "gpu")
+    else:
+        loaded = preload(langs, settings.model_default)
+        log.info("serve_preloaded", langs=loaded, model=settings.model_default, load_ms=int((time.perf_counter() - started) * 1000))
+    # Requeue jobs orphaned by a previous run once, here, not in every worker
+    from app.jobs.scheduler import scheduler
+
+    recovered = scheduler.store.recover()
+    if recovered:
+        log.info("jobs_recovered", count=recovered)
+    # Drop the supervisor's sqlite connection: connections must not cross fork()
+    scheduler._store = None
+    gc.freeze()
+    gc.enable()
+
+    sock = _bind(args.host, args.port)
+    log.info("serve_listening", host=args.host, port=args.port, workers=args.workers)
+    return Supervisor(sock, args.host, args.port, max(1, args.workers)).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
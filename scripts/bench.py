@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Offline latency/throughput benchmark for the OCR engine and the API.
+
+Generates synthetic document images (several sizes and text densities) and
+drives either ``OcrEngine`` directly or the ASGI app in-process at the given
+concurrency levels. Reports throughput, latency percentiles and peak RSS per
+scenario and writes everything to JSON so runs can be compared across releases:
+
+    python3 scripts/bench.py --out bench-results/current.json
+    python3 scripts/bench.py --compare bench-results/baseline.json
+
+Works with the stub engine when Paddle is not installed (numbers then measure
+the serving overhead only; the report records which backend ran). To compare
+inference backends on the same documents, pass several models:
+
+    python3 scripts/bench.py --targets engine --models pp-ocrv5,onnx:pp-ocrv5
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+SIZES = {"small": (640, 480), "a4": (1654, 2339), "a4-300dpi": (2480, 3508)}
+# Text lines per 1000px of page height
+DENSITIES = {"sparse": 8, "normal": 25, "dense": 60}
+WORDS = "invoice total amount date customer address order quantity price tax number account balance due paid".split()
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    # Must run before app modules are imported: singletons read settings at import
+    if not args.cache:
+        os.environ["RESULT_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("AUTH_MODE", "api-key")
+    os.environ.setdefault("API_KEY", "")
+
+
+def make_document(size: str, density: str, seed: int, fmt: str = "PNG") -> bytes:
+    from PIL import Image, ImageDraw
+
+    w, h = SIZES[size]
+    rng = random.Random(seed)
+    im = Image.new("RGB", (w, h), "white")
+    draw = ImageDraw.Draw(im)
+    lines = max(1, DENSITIES[density] * h // 1000)
+    step = h / (lines + 1)
+    for i in range(lines):
+        x = rng.randint(10, max(11, w // 8))
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        draw.text((x, int((i + 0.5) * step)), text, fill="black")
+    buf = io.BytesIO()
+    im.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class RssSampler:
+    """Peak resident set size over a scenario (``/proc`` polling, ru_maxrss fallback)."""
+
+    def __init__(self, interval_s: float = 0.01) -> None:
+        self.interval_s = interval_s
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._page_kb = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+    def _current_kb(self) -> int:
+        try:
+            with open("/proc/self/statm") as fh:
+                return int(fh.read().split()[1]) * self._page_kb
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self._current_kb())
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self._current_kb())
+
+
+def summarize(latencies: List[float], wall_s: float, errors: int, peak_kb: int) -> Dict[str, Any]:
+    import numpy as np
+
+    lat = np.asarray(latencies, dtype=np.float64) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_s, 3) if wall_s > 0 else None,
+        "latency_ms": {
+            "p50": round(float(np.percentile(lat, 50)), 3),
+            "p95": round(float(np.percentile(lat, 95)), 3),
+            "p99": round(float(np.percentile(lat, 99)), 3),
+            "mean": round(float(lat.mean()), 3),
+            "max": round(float(lat.max()), 3),
+        },
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def bench_engine(mode: str, images: List[bytes], concurrency: int, lang: str, model: str) -> Dict[str, Any]:
+    from app.ocr.pipeline import run_mode
+
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(content: bytes) -> None:
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            run_mode(mode, content, lang, model, resize=True)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, images))
+        wall = time.perf_counter() - started
+    return summarize(latencies, wall, errors, rss.peak_kb)
+
+
+def bench_api(mode: str, images: List[bytes], concurrency: int, lang: str, model: str) -> Dict[str, Any]:
+    import httpx
+    from app.main import app
+
+    latencies: List[float] = []
+    errors = 0
+
+    async def run() -> float:
+        nonlocal errors
+        sem = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def one(i: int, content: bytes) -> None:
+                nonlocal errors
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await client.post("/ocr", params={"mode": mode, "lang": lang, "model": model}, files={"file": (f"page{i}.png", content, "image/png")})
+                    elapsed = time.perf_counter() - t0
+                if r.status_code != 200 or not r.json().get("success"):
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i, c) for i, c in enumerate(images)))
+            return time.perf_counter() - started
+
+    with RssSampler() as rss:
+        wall = asyncio.run(run())
+    return summarize(latencies, wall, errors, rss.peak_kb)
+
+
+TARGETS: Dict[str, Callable[..., Dict[str, Any]]] = {"engine": bench_engine, "api": bench_api}
+
+
+def environment() -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.ocr.onnx_backend import _onnx_available
+    from app.ocr.paddle_backend import _paddle_available
+
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, timeout=5).decode().strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend": "paddle" if _paddle_available else "stub",
+        "runtimes": {"paddle": _paddle_available, "onnx": _onnx_available},
+        "settings": {
+            "ocr_backend": settings.ocr_backend,
+            "onnx_intra_op_threads": settings.onnx_intra_op_threads,
+            "onnx_inter_op_threads": settings.onnx_inter_op_threads,
+            "onnx_quantized": settings.onnx_quantized,
+            "inference_pool": settings.inference_pool,
+            "inference_workers": settings.inference_workers,
+            "max_image_px": settings.max_image_px,
+            "result_cache_enabled": settings.result_cache_enabled,
+            "microbatch_enabled": settings.microbatch_enabled,
+        },
+    }
+
+
+def scenario_key(s: Dict[str, Any]) -> str:
+    key = "{target}/{mode}/{size}/{density}/c{concurrency}".format(**s)
+    # Baselines written before --models had no model field
+    return f"{s['model']}/{key}" if s.get("model") else key
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, tolerance: float) -> List[str]:
+    """Regressions vs a previous run: p95 slower or throughput lower by more than ``tolerance``."""
+    from app.core.config import settings
+
+    baseline = {scenario_key(s): s for s in json.loads(baseline_path.read_text())["scenarios"]}
+    regressions = []
+    for s in results:
+        old = baseline.get(scenario_key(s))
+        if old is None and s.get("model") == settings.model_default:
+            # Pre---models baselines ran the default model only
+            old = baseline.get(scenario_key({**s, "model": None}))
+        if old is None:
+            continue
+        p95, old_p95 = s["latency_ms"]["p95"], old["latency_ms"]["p95"]
+        rps, old_rps = s["throughput_rps"] or 0, old["throughput_rps"] or 0
+        if old_p95 and p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{scenario_key(s)}: p95 {old_p95:.1f} -> {p95:.1f} ms")
+        if old_rps and rps < old_rps * (1 - tolerance):
+            regressions.append(f"{scenario_key(s)}: throughput {old_rps:.2f} -> {rps:.2f} rps")
+    return regressions
+
+
+def _csv(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--targets", type=_csv, default=["engine", "api"], help=f"comma list of {sorted(TARGETS)}")
+    p.add_argument("--modes", type=_csv, default=["recognition"], help="OCR modes (recognition,parsing,extraction,all)")
+    p.add_argument("--sizes", type=_csv, default=["small", "a4"], help=f"comma list of {sorted(SIZES)}")
+    p.add_argument("--densities", type=_csv, default=["sparse", "dense"], help=f"comma list of {sorted(DENSITIES)}")
+    p.add_argument("--concurrency", type=lambda v: [int(x) for x in _csv(v)], default=[1, 4], help="comma list of concurrency levels")
+    p.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    p.add_argument("--warmup", type=int, default=2, help="untimed requests per scenario")
+    p.add_argument("--lang", default="en")
+    p.add_argument("--models", "--model", type=_csv, default=["pp-ocrv5"], help="comma list of models, e.g. pp-ocrv5,onnx:pp-ocrv5,fake")
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--cache", action="store_true", help="leave the result cache on (off by default: every image is distinct anyway)")
+    p.add_argument("--out", type=Path, default=None, help="write JSON results here")
+    p.add_argument("--compare", type=Path, default=None, help="baseline JSON; exit 1 on regressions")
+    p.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression for --compare")
+    args = p.parse_args(argv)
+    _configure_env(args)
+
+    for name, allowed in (("targets", TARGETS), ("sizes", SIZES), ("densities", DENSITIES)):
+        unknown = set(getattr(args, name)) - set(allowed)
+        if unknown:
+            p.error(f"unknown {name}: {sorted(unknown)}")
+
+    scenarios: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        for density in args.densities:
+            # Distinct documents per request so neither cache nor decode shortcuts skew results
+            images = [make_document(size, density, args.seed + i) for i in range(args.requests + args.warmup)]
+            for model in args.models:
+                for target in args.targets:
+                    for mode in args.modes:
+                        for conc in args.concurrency:
+                            TARGETS[target](mode, images[: args.warmup], 1, args.lang, model)
+                            result = TARGETS[target](mode, images[args.warmup:], conc, args.lang, model)
+                            scenario = {"model": model, "target": target, "mode": mode, "size": size, "density": density, "concurrency": conc, **result}
+                            scenarios.append(scenario)
+                            lat = result["latency_ms"]
+                            print(
+                                f"{scenario_key(scenario):56s} {result['throughput_rps'] or 0:8.2f} rps  "
+                                f"p50 {lat['p50']:8.1f}  p95 {lat['p95']:8.1f}  p99 {lat['p99']:8.1f} ms  "
+                                f"rss {result['peak_rss_mb']:7.1f} MB  errors {result['errors']}",
+                                flush=True,
+                            )
+
+    report = {"environment": environment(), "scenarios": scenarios}
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"wrote {args.out}")
+    if args.compare:
+        regressions = compare(scenarios, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Where does boot time go? Import-time breakdown plus time-to-live/ready.
+
+1. Runs ``python -X importtime -c "import app.main"`` and lists the modules
+   with the largest cumulative import time.
+2. Starts uvicorn on a free port and measures how long until ``/health/live``
+   and ``/health/ready`` answer 200, then prints the app's own
+   ``/debug/startup`` phase report.
+
+    python3 scripts/startup_report.py --top 20
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def import_times(module: str = "app.main") -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) from ``-X importtime``, largest cumulative first."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us), int(cum_us)))
+    return sorted(rows, key=lambda r: r[2], reverse=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, headers: Dict[str, str]) -> Tuple[int, Any]:
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=1) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as exc:
+        return exc.code, None
+
+
+def boot_times(timeout_s: float, api_key: str | None) -> Dict[str, Any]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    headers = {"x-api-key": api_key} if api_key else {}
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], cwd=ROOT, env=os.environ.copy())
+    out: Dict[str, Any] = {"live_s": None, "ready_s": None}
+    try:
+        while time.perf_counter() - started < timeout_s and proc.poll() is None:
+            try:
+                if out["live_s"] is None and _get(base + "/health/live", headers)[0] == 200:
+                    out["live_s"] = round(time.perf_counter() - started, 3)
+                if out["live_s"] is not None and _get(base + "/health/ready", headers)[0] == 200:
+                    out["ready_s"] = round(time.perf_counter() - started, 3)
+                    out["app_report"] = _get(base + "/debug/startup", headers)[1]
+                    break
+            except OSError:
+                pass  # port not open yet
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return out
+
+
+def main(argv: List[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--top", type=int, default=15, help="modules to list")
+    p.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for readiness")
+    p.add_argument("--api-key", default=os.getenv("API_KEY"), help="for /debug/startup when API_KEY is set")
+    p.add_argument("--json", action="store_true", help="print one JSON document instead of tables")
+    args = p.parse_args(argv)
+
+    imports = import_times()
+    boot = boot_times(args.timeout, args.api_key)
+    if args.json:
+        print(json.dumps({"imports": [{"module": n, "self_ms": s / 1000, "cumulative_ms": c / 1000} for n, s, c in imports[: args.top]], "boot": boot}, indent=2))
+        return 0 if boot["ready_s"] is not None else 1
+    print(f"{'module':50s} {'self ms':>10s} {'cumul ms':>10s}")
+    for name, self_us, cum_us in imports[: args.top]:
+        print(f"{name:50s} {self_us / 1000:10.1f} {cum_us / 1000:10.1f}")
+    print()
+    print(f"liveness after  {boot['live_s']} s")
+    print(f"readiness after {boot['ready_s']} s")
+    if boot.get("app_report"):
+        print(json.dumps(boot["app_report"], indent=2))
+    return 0 if boot["ready_s"] is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Settings are read when app modules are first imported: keep the job queue
+# the app lifespan opens out of the working tree
+os.environ.setdefault("JOBS_STORE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ocr-tests-"), "jobs.sqlite"))
@@ -12,6 +12,26 @@ def test_health_ok():
     assert "gpu" in data
 
 
+def test_health_split_liveness_and_readiness():
+    import time
+    from app.core.startup import startup
+
+    startup.ready = False
+    client = TestClient(app)
+    assert client.get("/health/live").json() == {"status": "ok"}
+    assert client.get("/health/ready").status_code == 503
+    # The background warm-up flips readiness shortly after startup
+    with TestClient(app) as started:
+        for _ in range(100):
+            r = started.get("/health/ready")
+            if r.status_code == 200:
+                break
+            time.sleep(0.01)
+        assert r.json()["ready"] is True
+        assert "import_app" in started.get("/debug/startup").json()["phases_ms"]
+        assert "gpu" in started.get("/health").json()
+
+
 def test_ocr_stub_recognition_without_api_key():
     # Default is api-key mode but with no key set, should allow
     settings.auth_mode = "api-key"
@@ -47,3 +67,586 @@ def test_structure_and_extraction_stubs():
     r2 = client.post("/extraction", files=files)
     assert r1.status_code == 200
     assert r2.status_code == 200
+
+
+def test_ocr_all_mode_returns_every_stage():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = {"file": ("all", b"combined analysis payload", "text/plain")}
+    r = client.post("/ocr", files=files, params={"mode": "all"})
+    data = r.json()
+    assert data["success"] is True
+    assert data["meta"]["mode"] == "all"
+    assert {"text", "boxes", "structure", "extraction"} <= set(data["result"])
+
+
+def test_ocr_auto_lang_is_accepted_and_reports_detected_language():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = {"file": ("auto", b"mixed language payload", "text/plain")}
+    data = client.post("/ocr", files=files, params={"lang": "auto"}).json()
+    assert data["success"] is True
+    assert data["meta"]["lang"] == "auto"
+    assert data["result"]["lang_detected"] in settings.auto_langs
+    assert isinstance(data["result"]["langs"], list)
+
+
+def test_engines_are_reused_across_requests():
+    from app.ocr.registry import registry
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    # Distinct payloads so the result cache does not short-circuit the engine
+    client.post("/ocr", files={"file": ("a", b"registry reuse a", "text/plain")})
+    before = registry.snapshot()
+    client.post("/ocr", files={"file": ("b", b"registry reuse b", "text/plain")})
+    after = registry.snapshot()
+    assert after["hits"] == before["hits"] + 1
+    assert after["loads"] == before["loads"]
+    r = client.get("/debug/engines")
+    assert r.status_code == 200
+    assert "resident" in r.json()
+
+
+def test_ocr_returns_503_with_retry_after_when_saturated(monkeypatch):
+    from app.ocr.executor import executor
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    monkeypatch.setattr(executor, "queue_size", 0)
+    monkeypatch.setattr(executor, "_inflight", executor.workers)
+    client = TestClient(app)
+    files = {"file": ("busy", b"not cached yet", "text/plain")}
+    r = client.post("/ocr", files=files)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(settings.inference_retry_after_s)
+    assert r.json()["error"]["code"] == "Overloaded"
+
+
+def test_ocr_batch_keeps_order_and_reports_timing():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = [("files", (f"f{i}", f"doc {i}".encode(), "text/plain")) for i in range(5)]
+    r = client.post("/ocr/batch", files=files)
+    assert r.status_code == 200
+    data = r.json()
+    items = data["result"]["items"]
+    assert len(items) == 5
+    for item in items:
+        assert "latency_ms" in item and "decode_ms" in item and "infer_ms" in item
+    assert data["meta"]["count"] == 5
+    assert "latency_ms" in data["meta"]
+
+
+def test_repeated_upload_is_served_from_cache():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = {"file": ("dup", b"duplicate document", "text/plain")}
+    first = client.post("/ocr?model=fake", files=files).json()
+    second = client.post("/ocr?model=fake", files=files).json()
+    assert first["meta"]["cache_hit"] is False
+    assert second["meta"]["cache_hit"] is True
+    assert second["result"] == first["result"]
+    # A different mode is a different key
+    third = client.post("/ocr?mode=parsing&model=fake", files=files).json()
+    assert third["meta"]["cache_hit"] is False
+    # Keys follow the backend a model name resolves to, not its spelling
+    fourth = client.post("/ocr?model=fake:pp-ocrv5", files=files).json()
+    assert fourth["meta"]["cache_hit"] is True
+    stub = client.post("/ocr?model=paddle:pp-ocrv5", files=files).json()
+    assert stub["meta"]["cache_hit"] is False
+
+
+def test_stub_results_are_marked_degraded_and_never_cached(monkeypatch):
+    from app.ocr import engine as engine_module
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    # No backend runtime: the engine answers with placeholders
+    monkeypatch.setattr(engine_module, "_create_backend", lambda *args: None)
+    client = TestClient(app)
+    files = {"file": ("stub", b"no runtime here", "text/plain")}
+    for _ in range(2):
+        data = client.post("/ocr?model=onnx:stub-check", files=files).json()
+        assert data["result"]["text"] == "stub"
+        assert data["meta"]["cache_hit"] is False
+        assert data["meta"]["degraded"] == {"backend": "onnx/auto", "served_by": "stub", "reason": "unavailable"}
+
+
+def test_metrics_exposes_stage_histograms_and_fallbacks():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    client.post("/ocr", files={"file": ("m", b"metrics probe", "text/plain")})
+    # Free-text parameters do not become label values
+    client.post("/structure?lang=xx-probe&model=probe-model-123", files={"file": ("m", b"metrics probe", "text/plain")})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    body = r.text
+    assert f'ocr_stage_seconds_count{{lang="en",mode="recognition",model="{settings.ocr_backend}:pp-ocrv5",stage="queue_wait"}}' in body
+    assert f'ocr_stage_seconds_count{{lang="other",mode="parsing",model="{settings.ocr_backend}:other",stage="queue_wait"}}' in body
+    assert "xx-probe" not in body and "probe-model-123" not in body
+    assert 'stage="upload_read"' in body and 'stage="decode"' in body
+    assert "ocr_fallbacks_total" in body
+    assert 'ocr_cache_requests_total{result="miss"}' in body
+    assert "http_request_duration_seconds_bucket" in body
+
+
+def test_async_job_lifecycle(tmp_path, monkeypatch):
+    import time
+    from app.jobs.scheduler import scheduler
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    monkeypatch.setattr(scheduler, "store_url", f"sqlite:///{tmp_path}/jobs.sqlite")
+    monkeypatch.setattr(scheduler, "_store", None)
+    monkeypatch.setattr(settings, "api_keys", {"key-a": "tenant-a", "key-b": "tenant-b"})
+    with TestClient(app, headers={"X-API-Key": "key-a"}) as client:
+        files = {"file": ("job", b"large scan", "text/plain")}
+        r = client.post("/jobs?mode=parsing", files=files)
+        assert r.status_code == 200
+        job_id = r.json()["result"]["job_id"]
+        for _ in range(50):
+            status = client.get(f"/jobs/{job_id}").json()["result"]["status"]
+            if status == "succeeded":
+                break
+            time.sleep(0.05)
+        assert status == "succeeded"
+        res = client.get(f"/jobs/{job_id}/result").json()
+        assert res["success"] is True
+        assert "structure" in res["result"]
+        assert res["meta"]["job_id"] == job_id
+        # Other tenants cannot see, read or cancel the job
+        other = {"X-API-Key": "key-b"}
+        assert client.get(f"/jobs/{job_id}", headers=other).status_code == 404
+        assert client.get(f"/jobs/{job_id}/result", headers=other).status_code == 404
+        assert client.delete(f"/jobs/{job_id}", headers=other).status_code == 404
+        # Finished jobs cannot be cancelled; unknown jobs are 404
+        assert client.delete(f"/jobs/{job_id}").json()["result"]["status"] == "succeeded"
+        assert client.get("/jobs/does-not-exist").status_code == 404
+
+
+def test_job_store_cancel_and_recover(tmp_path):
+    from app.jobs.store import SqliteJobStore
+
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+    a = store.create("recognition", "en", "pp-ocrv5", b"a")
+    b = store.create("recognition", "en", "pp-ocrv5", b"b")
+    assert store.cancel(a.id).status == "cancelled"
+    claimed = store.claim_next()
+    assert claimed.id == b.id and claimed.status == "running"
+    # A restart puts in-flight work back on the queue
+    assert SqliteJobStore(str(tmp_path / "jobs.sqlite")).recover() == 1
+    assert store.get(b.id).status == "queued"
+    assert store.load_input(a.id) is None
+
+
+def _multipage_tiff(pages: int) -> bytes:
+    from io import BytesIO
+    from PIL import Image
+
+    frames = [Image.new("RGB", (64, 32), (255, 255, 255)) for _ in range(pages)]
+    buf = BytesIO()
+    frames[0].save(buf, format="TIFF", save_all=True, append_images=frames[1:])
+    return buf.getvalue()
+
+
+def test_document_streams_one_ndjson_line_per_page():
+    import json
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = {"file": ("scan.tiff", _multipage_tiff(3), "image/tiff")}
+    r = client.post("/ocr/document", files=files)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.headers["X-Page-Count"] == "3"
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["meta"]["page"] for line in lines[:-1]] == [0, 1, 2]
+    assert all(line["success"] for line in lines)
+    assert lines[-1]["result"] == {"pages": 3}
+
+
+def test_document_sse_and_rejects_non_documents():
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    r = client.post("/ocr/document?format=sse", files={"file": ("scan.tiff", _multipage_tiff(2), "image/tiff")})
+    assert r.text.count("event: page") == 2
+    assert "event: done" in r.text
+    bad = client.post("/ocr/document", files={"file": ("x.txt", b"plain text", "text/plain")})
+    assert bad.json()["error"]["code"] == "BadDocument"
+
+
+def test_document_reports_unreadable_page_and_still_finishes_the_stream():
+    import json
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    # The last frame's pixel data is cut off; its directory (and so the page count) is intact
+    truncated = _multipage_tiff(3)[:-100]
+    r = TestClient(app).post("/ocr/document", files={"file": ("scan.tiff", truncated, "image/tiff")})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["meta"]["page"] for line in lines[:2]] == [0, 1]
+    assert lines[2]["error"]["code"] == "BadDocument" and lines[2]["meta"]["page"] == 2
+    assert lines[-1]["result"] == {"pages": 2} and len(lines) == 4
+
+
+def test_oversize_uploads_are_rejected_early(monkeypatch):
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "max_file_mb", 1)
+    files = {"file": ("big", b"x" * (1024 * 1024 + 1), "text/plain")}
+    r = client.post("/ocr", files=files)
+    assert r.json()["error"]["code"] == "PayloadTooLarge"
+    monkeypatch.setattr(settings, "max_request_mb", 1)
+    r = client.post("/ocr", files=files)
+    assert r.status_code == 413
+
+
+def test_body_limit_counts_streamed_bytes_without_content_length():
+    import asyncio
+    from app.middleware.body_limit import BodySizeLimitMiddleware, RequestTooLarge
+
+    async def downstream(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+
+    chunks = [{"type": "http.request", "body": b"x" * 600, "more_body": True}] * 3
+
+    async def scenario():
+        it = iter(chunks)
+
+        async def receive():
+            return next(it)
+
+        mw = BodySizeLimitMiddleware(downstream, max_bytes=1000)
+        try:
+            await mw({"type": "http", "headers": []}, receive, None)
+        except RequestTooLarge:
+            return next(it, None)
+        return "not rejected"
+
+    # Rejected on the second chunk; the third was never pulled
+    assert asyncio.run(scenario()) is chunks[2]
+
+
+def test_large_image_upload_is_memory_mapped(monkeypatch):
+    import asyncio
+    import mmap
+    from io import BytesIO
+    from PIL import Image
+    from starlette.datastructures import UploadFile
+    from tempfile import SpooledTemporaryFile
+    from app.api.uploads import read_upload
+    from app.ocr.preprocess import prepare
+
+    monkeypatch.setattr(settings, "upload_mmap_threshold_kb", 1)
+    buf = BytesIO()
+    Image.effect_noise((256, 256), 64).convert("RGB").save(buf, format="PNG")
+    spool = SpooledTemporaryFile(max_size=1024)
+    spool.write(buf.getvalue())
+    spool.seek(0)
+    content = asyncio.run(read_upload(UploadFile(spool, filename="scan.png")))
+    assert isinstance(content, mmap.mmap)
+    assert prepare(content).shape == (256, 256, 3)
+
+
+def test_large_undecodable_uploads_are_bad_images_not_backend_failures(monkeypatch):
+    from app.ocr import engine as engine_module, registry as registry_module
+    from app.ocr.breaker import BreakerRegistry
+    from app.ocr.registry import EngineRegistry
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    breakers = BreakerRegistry()
+    monkeypatch.setattr(engine_module, "breakers", breakers)
+    monkeypatch.setattr(registry_module, "registry", EngineRegistry())
+    # 2 MB: spooled to disk and memory-mapped, and PIL cannot open it
+    junk = b"not an image\n" * (2 * 1024 * 1024 // 13)
+    client = TestClient(app)
+    for i in range(settings.breaker_failure_threshold + 1):
+        r = client.post("/ocr?model=fake", files={"file": (f"notes{i}.txt", junk + bytes([i]), "text/plain")})
+        assert r.status_code == 200 and r.json()["result"]["text"] == ""
+    files = [("files", (f"notes{i}.txt", junk, "text/plain")) for i in range(2)]
+    r = client.post("/ocr/batch?model=fake", files=files)
+    assert [item["error"] for item in r.json()["result"]["items"]] == ["BadImage", "BadImage"]
+    snapshot = breakers.get("fake/auto").snapshot()
+    assert snapshot["state"] == "closed" and snapshot["consecutive_failures"] == 0
+
+
+def test_ocr_columnar_response_roundtrip():
+    import io
+    import json
+    import struct
+    import numpy as np
+    from PIL import Image
+    from app.api.responses import COLUMNAR_MEDIA_TYPE, ColumnarResponse
+    from app.api.schemas import ok
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    client = TestClient(app)
+    files = {"file": ("col", b"columnar please", "text/plain")}
+    r = client.post("/ocr", files=files, headers={"accept": COLUMNAR_MEDIA_TYPE})
+    assert r.headers["content-type"].startswith(COLUMNAR_MEDIA_TYPE)
+    magic, version, header_len, n = struct.unpack_from("<4sBxxxII", r.content)
+    assert (magic, version, n) == (b"OCRC", 1, 0)
+    assert json.loads(r.content[16:16 + header_len])["success"] is True
+
+    boxes = [{"box": [[0, 0], [9, 0], [9, 4], [0, 4]], "text": "a", "score": 0.5}, {"box": [[1, 5], [8, 5], [8, 9], [1, 9]], "text": "b", "score": 0.25}]
+    body = ColumnarResponse(ok({"text": "a b", "boxes": boxes})).body
+    _, _, header_len, n = struct.unpack_from("<4sBxxxII", body)
+    header = json.loads(body[16:16 + header_len])
+    points = np.frombuffer(body, "<i4", count=n * 8, offset=16 + header_len).reshape(n, 4, 2)
+    scores = np.frombuffer(body, "<f4", count=n, offset=16 + header_len + n * 32)
+    assert header["result"]["box_texts"] == ["a", "b"]
+    assert points.tolist() == [b["box"] for b in boxes]
+    assert scores.tolist() == [0.5, 0.25]
+
+    # Real results stay columnar from the worker (and the cache) to the encoder
+    page = np.full((40, 90, 3), 255, dtype=np.uint8)
+    page[5:12, 10:70] = 0
+    page[20:30, 4:50] = 0
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format="PNG")
+    files = {"file": ("two-lines.png", buf.getvalue(), "image/png")}
+    plain = client.post("/ocr?model=fake", files=files).json()["result"]["boxes"]
+    for expect_hit in (True, False):
+        r = client.post(f"/ocr?model=fake&lang={'en' if expect_hit else 'korean'}", files=files, headers={"accept": COLUMNAR_MEDIA_TYPE})
+        _, _, header_len, n = struct.unpack_from("<4sBxxxII", r.content)
+        header = json.loads(r.content[16:16 + header_len])
+        assert header["meta"]["cache_hit"] is expect_hit
+        points = np.frombuffer(r.content, "<i4", count=n * 8, offset=16 + header_len).reshape(n, 4, 2)
+        assert header["result"]["box_texts"] == ["60x7", "46x10"]
+        assert points.tolist() == [b["box"] for b in plain]
+
+
+def test_cognito_auth_caches_jwks_keys_and_verified_tokens(monkeypatch):
+    import asyncio
+    import time
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk, jwt
+    from app.api import auth
+
+    issuer = "https://issuer.test/pool"
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public_pem = private.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    jwks = {"keys": [{**jwk.construct(public_pem, "RS256").to_dict(), "kid": "k1"}]}
+    fetched = []
+
+    def fetcher(url):
+        fetched.append(url)
+        time.sleep(0.05)
+        return jwks
+
+    monkeypatch.setattr(auth.jwks_cache, "fetcher", fetcher)
+    auth.jwks_cache.clear()
+    auth.token_cache.clear()
+
+    # Concurrent cold lookups share one fetch
+    async def cold():
+        return await asyncio.gather(*(auth.jwks_cache.get_key(issuer, "k1") for _ in range(5)))
+
+    assert all(k is not None for k in asyncio.run(cold()))
+    assert fetched == [issuer + "/.well-known/jwks.json"]
+
+    monkeypatch.setattr(settings, "auth_mode", "cognito")
+    monkeypatch.setattr(settings, "cognito_issuer", issuer)
+    monkeypatch.setattr(settings, "cognito_audience", None)
+    token = jwt.encode({"iss": issuer, "exp": int(time.time()) + 60}, pem.decode(), algorithm="RS256", headers={"kid": "k1"})
+    client = TestClient(app)
+    files = {"file": ("jwt", b"cognito auth", "text/plain")}
+    assert client.post("/ocr", files=files, headers={"authorization": f"Bearer {token}"}).status_code == 200
+    assert auth.token_cache.get(auth.token_cache.key(token, issuer, None)) is not None
+    forged = jwt.encode({"iss": issuer, "exp": int(time.time()) + 60}, pem.decode(), algorithm="RS256", headers={"kid": "other"})
+    # Unknown kid right after a refresh is rejected without refetching
+    assert client.post("/ocr", files=files, headers={"authorization": f"Bearer {forged}"}).status_code == 401
+    assert len(fetched) == 1
+
+
+def test_api_keys_map_to_tenants_with_rate_limits(monkeypatch):
+    from app.ocr.tenants import LocalQuotaBackend, TenantLimits, tenant_scheduler
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    monkeypatch.setattr(settings, "api_keys", {"acme-key": "acme"})
+    monkeypatch.setattr(tenant_scheduler, "backend", LocalQuotaBackend())
+    monkeypatch.setitem(tenant_scheduler.overrides, "acme", TenantLimits(rate_per_s=0.01, burst=1))
+    client = TestClient(app)
+    files = {"file": ("hosts", b"tenant payload", "text/plain")}
+    headers = {"x-api-key": "acme-key"}
+    assert client.post("/ocr", files=files, headers=headers).status_code == 200
+    r = client.post("/ocr", files=files, headers=headers)
+    assert r.status_code == 429
+    assert r.json()["error"]["code"] == "RateLimited"
+    assert int(r.headers["Retry-After"]) >= 1
+    # Configured keys are the only accepted ones once API_KEYS is set
+    assert client.post("/ocr", files=files, headers={"x-api-key": "nope"}).status_code == 401
+    tenants = client.get("/debug/tenants", headers=headers).json()["tenants"]
+    assert tenants["acme"]["rejected_rate"] == 1
+
+
+def test_ocr_regions_mode_with_inline_regions_and_templates(tmp_path, monkeypatch):
+    import io
+    import json
+    from PIL import Image
+    from app.ocr.regions import templates
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"invoice": {"units": "relative", "regions": [{"name": "total", "box": [0.5, 0.8, 1, 1]}]}}))
+    monkeypatch.setattr(templates, "path", str(path))
+    buf = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(buf, format="PNG")
+    files = {"file": ("form.png", buf.getvalue(), "image/png")}
+    client = TestClient(app)
+
+    r = client.post("/ocr", files=files, params={"mode": "regions", "template": "invoice"}).json()
+    assert r["success"] is True and r["meta"]["template"] == "invoice"
+    assert list(r["result"]["fields"]) == ["total"]
+    assert r["result"]["boxes"][0]["box"] == [[100, 80], [200, 80], [200, 100], [100, 100]]
+
+    regions = json.dumps([{"name": "a", "box": [0, 0, 50, 20]}, {"name": "b", "box": [50, 0, 100, 20]}])
+    r = client.post("/ocr", files=files, params={"mode": "regions", "regions": regions}).json()
+    assert list(r["result"]["fields"]) == ["a", "b"]
+
+    assert client.post("/ocr", files=files, params={"mode": "regions", "template": "missing"}).json()["error"]["code"] == "BadRequest"
+    assert client.post("/ocr", files=files, params={"mode": "regions"}).json()["success"] is False
+
+
+def test_ocr_reports_adaptive_scale_in_meta(monkeypatch):
+    import io
+    import numpy as np
+    from PIL import Image
+
+    monkeypatch.setattr(settings, "adaptive_resize", True)
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    page = np.full((1200, 1600, 3), 255, dtype=np.uint8)
+    for k in range(10):
+        page[40 + k * 110 : 120 + k * 110, 60:1500] = 0
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format="PNG")
+    client = TestClient(app)
+    for expect_hit in (False, True):
+        r = client.post("/ocr?model=fake", files={"file": ("page.png", buf.getvalue(), "image/png")})
+        meta = r.json()["meta"]
+        # 80px lines are brought down to ADAPTIVE_TEXT_PX_MAX (40px); the scale stays out of data
+        assert meta["cache_hit"] is expect_hit
+        assert abs(meta["text_px"] - 80) <= 4 and abs(meta["scale"] - 0.5) < 0.03
+        assert "_meta" not in r.json()["result"]
+
+
+def test_debug_profile_header_keeps_span_tree_and_stacks(monkeypatch):
+    import io
+    import threading
+    import time
+    import numpy as np
+    from PIL import Image
+    from app.core.profiling import StackSampler
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    page = np.full((60, 200, 3), 255, dtype=np.uint8)
+    page[10:20, 17:151] = 0
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format="PNG")
+    files = {"file": ("page.png", buf.getvalue(), "image/png")}
+    client = TestClient(app)
+    # Off by default: the header is ignored
+    r = client.post("/ocr?model=fake", files=files, headers={"X-Debug-Profile": "trace"})
+    assert "X-Debug-Profile-Id" not in r.headers
+
+    monkeypatch.setattr(settings, "debug_profiling", True)
+    r = client.post("/ocr?model=fake&lang=korean", files=files, headers={"X-Debug-Profile": "profile", "X-Request-ID": "prof-1"})
+    assert r.json()["result"]["text"] == "134x10"
+    # The profile id is generated by the server; the request id only correlates logs
+    profile_id = r.headers["X-Debug-Profile-Id"]
+    assert profile_id != "prof-1"
+    report = client.get(f"/debug/profiles/{profile_id}").json()
+    assert report["status"] == 200 and report["path"] == "/ocr"
+    assert report["request_id"] == "prof-1" and report["tenant"] == "anonymous"
+
+    def find(nodes, name):
+        for node in nodes:
+            if node["name"] == name:
+                return node
+            hit = find(node["children"], name)
+            if hit is not None:
+                return hit
+
+    # Worker-side engine stages hang under the request's inference span
+    infer = find(report["spans"], "infer")
+    engine = find(infer["children"], "engine.recognize")
+    assert engine["attrs"] == {"backend": "fake/auto", "lang": "korean"}
+    assert {"detection", "crop", "recognition"} <= {c["name"] for c in engine["children"]}
+    assert client.get(f"/debug/profiles/{profile_id}/collapsed").status_code == 200
+    assert client.get("/debug/profiles").json()["profiles"][0]["id"] == profile_id
+    assert client.get("/debug/profiles/missing").status_code == 404
+    # Other tenants neither see nor read it
+    monkeypatch.setattr(settings, "api_keys", {"key-b": "tenant-b"})
+    other = {"X-API-Key": "key-b"}
+    assert profile_id not in {p["id"] for p in client.get("/debug/profiles", headers=other).json()["profiles"]}
+    assert client.get(f"/debug/profiles/{profile_id}", headers=other).status_code == 404
+    assert client.get(f"/debug/profiles/{profile_id}/collapsed", headers=other).status_code == 404
+    monkeypatch.setattr(settings, "api_keys", {})
+    # Requests that never pass authentication are not kept
+    for path in ("/no-such-route", "/ocr"):
+        monkeypatch.setattr(settings, "api_key", "secret")
+        r = client.post(path, files=files, headers={"X-Debug-Profile": "trace"})
+        assert r.status_code in (401, 404) and "X-Debug-Profile-Id" not in r.headers
+        monkeypatch.setattr(settings, "api_key", None)
+        assert client.get("/debug/profiles").json()["profiles"][0]["id"] == profile_id
+
+    def busy():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+    with StackSampler(threading.get_ident(), 0.002) as sampler:
+        busy()
+    assert any("busy (test_app.py" in stack for stack in sampler.stacks)
+
+
+def test_failed_ocr_requests_still_reach_the_metrics(monkeypatch):
+    import io
+    import numpy as np
+    from PIL import Image
+    from app.core import metrics
+    from app.ocr import engine as engine_module, registry as registry_module
+    from app.ocr.breaker import BreakerRegistry
+    from app.ocr.registry import EngineRegistry
+
+    settings.auth_mode = "api-key"
+    settings.api_key = None
+    breakers = BreakerRegistry()
+    monkeypatch.setattr(engine_module, "breakers", breakers)
+    monkeypatch.setattr(registry_module, "registry", EngineRegistry())
+    monkeypatch.setattr(settings, "fallback_device", None)
+    for _ in range(settings.breaker_failure_threshold):
+        breakers.get("fake/auto").record_failure()
+    page = np.full((30, 70, 3), 255, dtype=np.uint8)
+    page[3:9, 7:33] = 0
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format="PNG")
+    labels = {"mode": "recognition", "lang": "en", "model": "fake:pp-ocrv5"}
+    before = metrics.STAGE_SECONDS.count(stage="upload_read", **labels)
+    shed = metrics.REGISTRY.counter("ocr_degraded_total")
+    shed_before = shed.value(backend="fake/auto", served_by="none", reason="circuit_open")
+    r = TestClient(app).post("/ocr?model=fake", files={"file": ("page.png", buf.getvalue(), "image/png")})
+    assert r.status_code == 503 and r.headers["Retry-After"]
+    assert r.json()["error"]["code"] == "BackendUnavailable"
+    assert metrics.STAGE_SECONDS.count(stage="upload_read", **labels) == before + 1
+    assert shed.value(backend="fake/auto", served_by="none", reason="circuit_open") == shed_before + 1
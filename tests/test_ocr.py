@@ -0,0 +1,589 @@
+from app.ocr.registry import EngineRegistry
+
+
+def test_registry_reuses_engines_and_evicts_lru():
+    reg = EngineRegistry(max_models=2)
+    en = reg.get("en", "pp-ocrv5", "cpu")
+    assert reg.get("en", "pp-ocrv5", "cpu") is en
+    reg.get("korean", "pp-ocrv5", "cpu")
+    reg.get("japan", "pp-ocrv5", "cpu")
+    snap = reg.snapshot()
+    assert snap["hits"] == 1
+    assert snap["misses"] == 3
+    assert snap["evictions"] == 1
+    assert "en/pp-ocrv5/cpu" not in snap["resident"]
+    assert reg.get("en", "pp-ocrv5", "cpu") is not en
+
+
+def test_executor_rejects_when_queue_full():
+    import asyncio
+    import threading
+    import pytest
+    from app.ocr.executor import InferenceExecutor, QueueFullError, InferenceTimeout
+
+    gate = threading.Event()
+    ex = InferenceExecutor(kind="thread", workers=1, queue_size=0, timeout_s=0.05)
+
+    async def scenario():
+        with pytest.raises(InferenceTimeout):
+            await ex.run(gate.wait)
+        # The timed-out task still holds the only slot until it returns
+        with pytest.raises(QueueFullError):
+            ex.submit(gate.wait)
+        gate.set()
+        await asyncio.sleep(0.05)
+        assert await ex.run(lambda: 42) == 42
+
+    asyncio.run(scenario())
+    ex.shutdown()
+
+
+class _FakePaddleOCR:
+    """Minimal stand-in for PaddleOCR's det/cls/rec predictors."""
+
+    use_angle_cls = False
+    drop_score = 0.5
+
+    def __init__(self):
+        self.rec_calls = []
+
+    def text_detector(self, image):
+        import numpy as np
+
+        n = int(image[0, 0, 0])  # encode number of lines in the first pixel
+        return np.array([[[0, 10 * i], [20, 10 * i], [20, 10 * i + 8], [0, 10 * i + 8]] for i in range(n)], dtype=np.float32), 0.0
+
+    def text_recognizer(self, crops):
+        self.rec_calls.append(len(crops))
+        return [(f"t{k}", 0.9) for k in range(len(crops))], 0.0
+
+
+def test_paddle_backend_batches_recognition_across_images():
+    import numpy as np
+    from app.ocr.paddle_backend import PaddleBackend
+
+    backend = PaddleBackend.__new__(PaddleBackend)
+    backend.ocr = _FakePaddleOCR()
+    images = [np.full((40, 40, 3), n, dtype=np.uint8) for n in (2, 0, 3)]
+    out = backend.recognize_batch(images + [b"not an image"])
+    assert backend.ocr.rec_calls == [5]
+    assert [len(r[1]) for r in out[:3]] == [2, 0, 3]
+    assert out[2][0] == "t2 t3 t4"
+    assert isinstance(out[3], Exception)
+
+
+def test_analysis_context_reuses_recognition_across_stages():
+    import numpy as np
+    from app.ocr.analysis import AnalysisContext
+    from app.ocr.paddle_backend import PaddleBackend
+
+    backend = PaddleBackend.__new__(PaddleBackend)
+    backend.ocr = _FakePaddleOCR()
+    backend._pp_structure = None
+    ctx = AnalysisContext()
+    image = np.full((40, 40, 3), 2, dtype=np.uint8)
+    text, _ = backend.recognize(image, ctx)
+    # Structure falls back to recognition and extraction reuses it: no second pass
+    assert backend.parse_structure(image, ctx)["markdown"] == text
+    assert backend.extract(image, ctx)["entities"][0]["text"] == text
+    assert backend.ocr.rec_calls == [2]
+
+
+def test_decode_image_downscales_without_reencode():
+    from io import BytesIO
+    from PIL import Image
+    from app.ocr.preprocess import decode_image, prepare
+
+    buf = BytesIO()
+    Image.new("RGB", (4000, 1000), (200, 10, 10)).save(buf, format="JPEG")
+    arr = decode_image(buf.getvalue(), max_px=1000)
+    assert arr.shape == (250, 1000, 3)
+    assert arr.dtype.name == "uint8" and arr.flags["C_CONTIGUOUS"]
+    small = decode_image(buf.getvalue(), max_px=None)
+    assert small.shape == (1000, 4000, 3)
+    assert prepare(b"plain text") == b"plain text"
+
+
+def test_result_cache_ttl_lru_and_disk_tier(tmp_path, monkeypatch):
+    from app.ocr import cache as cache_mod
+    from app.ocr.cache import ResultCache
+
+    path = str(tmp_path / "cache.sqlite")
+    c = ResultCache(max_entries=2, ttl_s=60, disk_path=path)
+    keys = [ResultCache.make_key(f"img{i}".encode(), lang="en", mode="recognition") for i in range(3)]
+    for i, k in enumerate(keys):
+        c.put(k, {"text": str(i)})
+    assert c.snapshot()["evictions"] == 1
+    assert c.get(keys[2]) == ({"text": "2"}, "memory")
+    # Evicted from memory, still on disk
+    assert c.get(keys[0]) == ({"text": "0"}, "disk")
+    # A fresh instance (restart) sees the disk tier
+    assert ResultCache(disk_path=path).get(keys[1]) == ({"text": "1"}, "disk")
+    now = cache_mod.time.time()
+    monkeypatch.setattr(cache_mod.time, "time", lambda: now + 120)
+    assert c.get(keys[2]) == (None, None)
+    assert c.snapshot()["expired"] == 1
+
+
+def test_iter_pages_renders_pdf_lazily():
+    import io
+    import pytest
+
+    pdfium = pytest.importorskip("pypdfium2")
+    from app.ocr.documents import iter_pages, page_count
+
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(3):
+        pdf.new_page(72, 144)
+    buf = io.BytesIO()
+    pdf.save(buf)
+    content = buf.getvalue()
+    assert page_count(content) == 3
+    pages = iter_pages(content, dpi=144)
+    first = next(pages)
+    assert first.shape == (288, 144, 3)
+    assert len(list(pages)) == 2
+
+
+def test_microbatcher_coalesces_concurrent_requests():
+    import asyncio
+    from app.ocr.batcher import MicroBatcher
+
+    calls = []
+
+    def runner(contents, lang, model, max_px):
+        calls.append(list(contents))
+        return [{"text": c} for c in contents], {"stages": {"recognition": 0.01}, "counts": []}
+
+    async def scenario():
+        mb = MicroBatcher(max_size=3, max_wait_ms=20, runner=runner)
+        # Three fill a batch immediately; the fourth waits out max_wait_ms alone
+        results = await asyncio.gather(*(mb.submit(f"img{i}", "en", "pp-ocrv5") for i in range(4)))
+        assert [payload["text"] for payload, _ in results] == ["img0", "img1", "img2", "img3"]
+
+    asyncio.run(scenario())
+    assert calls == [["img0", "img1", "img2"], ["img3"]]
+
+
+def test_tiling_covers_image_and_drops_seam_duplicates():
+    import numpy as np
+    from app.ocr.tiling import plan_tiles, suppress_duplicates
+
+    tiles = plan_tiles(1000, 2500, tile_px=1024, overlap_px=128)
+    assert {t[2] for t in tiles} == {1000}
+    assert tiles[-1][3] == 2500
+    assert all(b[1] - a[3] < 0 for a, b in zip(tiles, tiles[1:]))  # neighbours overlap
+
+    def quad(x0, y0, x1, y1):
+        return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+    boxes = np.array([
+        quad(900, 100, 1100, 120),  # whole line, seen by the second tile
+        quad(900, 100, 1024, 120),  # same line truncated at the first tile's edge
+        quad(100, 500, 300, 520),
+    ], dtype=np.float32)
+    assert sorted(suppress_duplicates(boxes, 0.5).tolist()) == [0, 2]
+
+
+def test_paddle_backend_tiled_recognition_merges_across_tiles():
+    import numpy as np
+    from app.ocr.paddle_backend import PaddleBackend
+
+    class _TileOCR(_FakePaddleOCR):
+        def text_detector(self, image):
+            # One line at the same page position regardless of the tile's offset
+            return np.array([[[5, 5], [30, 5], [30, 15], [5, 15]]], dtype=np.float32), 0.0
+
+    backend = PaddleBackend.__new__(PaddleBackend)
+    backend.ocr = _TileOCR()
+    image = np.zeros((100, 220, 3), dtype=np.uint8)
+    text, boxes = backend.recognize_tiled(image, tile_px=100, overlap_px=20)
+    # Three tiles -> three distinct lines, recognized in one batched pass
+    assert boxes.points[:, 0].tolist() == [[5, 5], [85, 5], [125, 5]]
+    assert backend.ocr.rec_calls == [3]
+
+
+def test_forked_worker_reopens_disk_cache_and_warms_inherited_engines(tmp_path, monkeypatch):
+    from app.ocr import cache as cache_mod
+    from app.ocr.cache import ResultCache
+
+    c = ResultCache(max_entries=1, disk_path=str(tmp_path / "cache.sqlite"))
+    key = ResultCache.make_key(b"img", lang="en", mode="recognition")
+    c.put(key, {"text": "x"})
+    parent_conn = c._disk.conn
+    # Simulate running in a child after fork(): the sqlite handle is replaced
+    pid = cache_mod.os.getpid()
+    monkeypatch.setattr(cache_mod.os, "getpid", lambda: pid + 1)
+    c.put(ResultCache.make_key(b"other", lang="en", mode="recognition"), {"text": "y"})
+    assert c.get(key) == ({"text": "x"}, "disk")
+    assert c._disk.conn is not parent_conn
+
+    # The serve supervisor loads engines cold; preload in the worker warms them once
+    reg = EngineRegistry(max_models=2)
+    engine = reg.get("en", "pp-ocrv5", "cpu")
+    assert not engine.warmed
+    assert reg.preload("en", "pp-ocrv5", "cpu") is engine
+    assert engine.warmed
+
+
+def test_auto_lang_detects_once_and_routes_crops_by_language(monkeypatch):
+    import numpy as np
+    from app.core.config import settings
+    from app.ocr import autolang
+    from app.ocr.engine import OcrEngine
+    from app.ocr.paddle_backend import PaddleBackend
+
+    markers = {"en": 100, "korean": 200}
+
+    class _ScriptOCR(_FakePaddleOCR):
+        def __init__(self, lang):
+            super().__init__()
+            self.lang = lang
+            self.det_calls = 0
+
+        def text_detector(self, image):
+            self.det_calls += 1
+            return np.array([[[0, 10 * i], [20, 10 * i], [20, 10 * i + 8], [0, 10 * i + 8]] for i in range(6)], dtype=np.float32), 0.0
+
+        def text_recognizer(self, crops):
+            self.rec_calls.append(len(crops))
+            # Confident only on crops written in this recognizer's script
+            return [(f"{self.lang}{int(c.mean())}", 0.95 if int(c.mean()) == markers[self.lang] else 0.3) for c in crops], 0.0
+
+    engines = {}
+    for lang in markers:
+        engine = OcrEngine.__new__(OcrEngine)
+        OcrEngine.__init__(engine, lang)
+        engine._backend = PaddleBackend.__new__(PaddleBackend)
+        engine._backend.ocr = _ScriptOCR(lang)
+        engines[lang] = engine
+    monkeypatch.setattr(autolang, "get_engine", lambda lang, model: engines[lang])
+    monkeypatch.setattr(settings, "auto_lang_sample_size", 2)
+
+    image = np.full((60, 20, 3), 100, dtype=np.uint8)
+    image[40:] = 200  # the last two lines are "Korean"
+    res = autolang.recognize_auto(image, "pp-ocrv5", langs=["en", "korean"])
+    assert res.langs == ["en", "en", "en", "en", "korean", "korean"]
+    assert res.text == "en100 en100 en100 en100 korean200 korean200"
+    # One detection; probe on the 2 sampled crops, then only the misread crop cascades
+    assert engines["en"]._backend.ocr.det_calls == 1 and engines["korean"]._backend.ocr.det_calls == 0
+    assert engines["en"]._backend.ocr.rec_calls == [2, 4]
+    assert engines["korean"]._backend.ocr.rec_calls == [2, 1]
+    assert autolang.dominant(res) == "en"
+
+
+def test_tenant_scheduler_prioritizes_interactive_and_caps_each_tenant():
+    import asyncio
+    import pytest
+    from app.ocr.tenants import BATCH, INTERACTIVE, LocalQuotaBackend, RateLimited, TenantLimits, TenantScheduler
+
+    async def scenario():
+        sched = TenantScheduler(slots=1, max_queue=8, limits=TenantLimits(max_concurrency=1), overrides={"bulk": TenantLimits(max_concurrency=1)})
+        order = []
+        gate = asyncio.Event()
+
+        async def job(tenant, priority, name):
+            async with sched.slot(tenant, priority):
+                order.append(name)
+                if name == "first":
+                    await gate.wait()
+
+        first = asyncio.create_task(job("bulk", BATCH, "first"))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(job("bulk", BATCH, "bulk-2")), asyncio.create_task(job("bulk", BATCH, "bulk-3"))]
+        await asyncio.sleep(0)
+        queued.append(asyncio.create_task(job("alice", INTERACTIVE, "alice")))
+        await asyncio.sleep(0)
+        assert sched.snapshot()["tenants"]["bulk"]["queued"] == 2
+        gate.set()
+        await asyncio.gather(first, *queued)
+        # The interactive request overtakes batch work that arrived earlier
+        assert order == ["first", "alice", "bulk-2", "bulk-3"]
+        snap = sched.snapshot()
+        assert snap["running"] == 0 and snap["tenants"]["alice"]["dispatched"] == 1
+        assert snap["tenants"]["alice"]["wait_s_max"] > 0
+
+    asyncio.run(scenario())
+
+    now = [0.0]
+    sched = TenantScheduler(slots=1, limits=TenantLimits(rate_per_s=2, burst=2), backend=LocalQuotaBackend(clock=lambda: now[0]))
+    sched.charge("t")
+    sched.charge("t")
+    with pytest.raises(RateLimited) as exc:
+        sched.charge("t")
+    assert exc.value.retry_after_s == 1
+    # Buckets are per tenant and refill over time
+    sched.charge("other")
+    now[0] = 0.5
+    sched.charge("t")
+    assert sched.snapshot()["tenants"]["t"]["rejected_rate"] == 1
+
+
+def test_region_recognition_crops_views_and_skips_detection():
+    import numpy as np
+    import pytest
+    from app.ocr.paddle_backend import PaddleBackend
+    from app.ocr.regions import RegionError, parse_regions
+
+    class _RegionOCR(_FakePaddleOCR):
+        use_angle_cls = True
+
+        def text_detector(self, image):
+            raise AssertionError("detection must not run for regions")
+
+        def text_classifier(self, crops):
+            self.cls_calls = len(crops)
+            return crops, None, 0.0
+
+        def text_recognizer(self, crops):
+            self.rec_calls.append(len(crops))
+            self.shapes = [c.shape[:2] for c in crops]
+            self.views = [c.base is not None for c in crops]
+            return [(f"r{int(c.mean())}", 0.9) for c in crops], 0.0
+
+    spec = parse_regions({"units": "relative", "regions": [{"name": "total", "box": [0.5, 0.5, 1.0, 1.0]}, {"name": "date", "box": [0, 0, 0.5, 0.25]}, {"name": "off", "box": [2, 2, 3, 3]}]})
+    image = np.zeros((40, 80, 3), dtype=np.uint8)
+    image[20:, 40:] = 7
+    boxes = spec.resolve(*image.shape[:2])
+    assert boxes.tolist() == [[40, 20, 80, 40], [0, 0, 40, 10], [80, 40, 80, 40]]
+
+    backend = PaddleBackend.__new__(PaddleBackend)
+    backend.ocr = _RegionOCR()
+    out = backend.recognize_regions(image, boxes, cls=False)
+    # One recognizer batch over zero-copy views; the out-of-page region is blank
+    assert out == [("r7", 0.9), ("r0", 0.9), ("", 0.0)]
+    assert backend.ocr.rec_calls == [2] and backend.ocr.shapes == [(20, 40), (10, 40)]
+    assert all(backend.ocr.views) and not hasattr(backend.ocr, "cls_calls")
+    backend.recognize_regions(image, boxes, cls=True)
+    assert backend.ocr.cls_calls == 2
+
+    for bad in ("[]", "not json", '[{"box": [5, 5, 1, 1]}]', '[{"name": "a", "box": [0, 0, 1, 1]}, {"name": "a", "box": [0, 0, 2, 2]}]'):
+        with pytest.raises(RegionError):
+            parse_regions(bad)
+
+
+def test_backend_selection_and_fake_backend_through_the_engine(monkeypatch):
+    import numpy as np
+    from app.core.config import settings
+    from app.ocr.engine import OcrEngine, backend_for
+    from app.ocr.fake_backend import FakeBackend
+
+    monkeypatch.setattr(settings, "ocr_backend", "paddle")
+    assert backend_for("pp-ocrv5") == ("paddle", "pp-ocrv5")
+    assert backend_for("onnx:ppocr-v4-int8") == ("onnx", "ppocr-v4-int8")
+    assert backend_for("fake") == ("fake", settings.model_default)
+    monkeypatch.setattr(settings, "ocr_backend", "onnx")
+    assert backend_for("pp-ocrv5") == ("onnx", "pp-ocrv5")
+
+    engine = OcrEngine("en", "fake")
+    assert isinstance(engine._backend, FakeBackend) and engine.backend_name == "fake"
+    image = np.full((40, 100, 3), 255, dtype=np.uint8)
+    image[5:12, 10:60] = 0
+    image[20:30, 30:90] = 0
+    res = engine.recognize(image)
+    # One box per inked band, in reading order; text is the crop size
+    assert res.text == "50x7 60x10"
+    assert res.boxes.points[1].tolist() == [[30, 20], [90, 20], [90, 30], [30, 30]]
+    batch = engine.recognize_batch([image, image[:15]])
+    assert [r.text for r in batch] == ["50x7 60x10", "50x7"]
+    assert engine._backend.rec_calls == [2, 3]
+    # The text fallbacks for structure and extraction come from the base class
+    assert engine.parse_structure(image).markdown == "50x7 60x10"
+
+
+def test_onnx_helpers_size_detector_input_and_decode_ctc():
+    import numpy as np
+    from app.ocr.onnx_backend import ctc_decode, det_target_size
+
+    assert det_target_size(480, 640) == (480, 640)
+    assert det_target_size(3508, 2480) == (960, 672)
+    assert det_target_size(10, 10) == (32, 32)
+
+    charset = ["", "a", "b", " "]
+    probs = np.zeros((2, 6, 4), dtype=np.float32)
+    # a a <blank> a b b -> "aab"; all blanks -> ""
+    for t, c in enumerate([1, 1, 0, 1, 2, 2]):
+        probs[0, t, c] = 0.8 if t else 0.6
+    probs[1, :, 0] = 1.0
+    (text, score), empty = ctc_decode(probs, charset)
+    assert text == "aab" and abs(score - 2.2 / 3) < 1e-6
+    assert empty == ("", 0.0)
+
+
+def test_adaptive_resize_estimates_text_height_and_right_sizes_the_page():
+    import io
+    import numpy as np
+    from PIL import Image
+    from app.ocr.preprocess import choose_scale, decode_adaptive, estimate_text_height
+
+    page = np.full((900, 1200), 255, dtype=np.uint8)
+    # Two columns of 60px "lines" on a 100px pitch, offset so columns never share rows
+    for k in range(8):
+        page[50 + k * 100 : 110 + k * 100, 50:500] = 0
+        page[80 + k * 100 : 140 + k * 100, 600:1100] = 0
+    assert abs(estimate_text_height(page) - 60) <= 1
+    # Inverted (light text on dark) and blank pages
+    assert abs(estimate_text_height(255 - page) - 60) <= 1
+    assert estimate_text_height(np.full((900, 1200), 255, dtype=np.uint8)) is None
+
+    assert choose_scale(80, 16, 40) == 0.5
+    assert choose_scale(4, 16, 40, max_upscale=2.0) == 2.0
+    assert choose_scale(24, 16, 40) == 1.0
+
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format="PNG")
+    image, info = decode_adaptive(buf.getvalue(), text_px_range=(16, 40), max_upscale=2.0, max_px=4096, fallback_max_px=2048, thumb_px=512)
+    assert abs(info["text_px"] - 60) <= 3 and abs(info["scale"] - 40 / info["text_px"]) < 0.01
+    assert image.shape == (round(900 * info["scale"]), round(1200 * info["scale"]), 3)
+
+
+def test_circuit_breaker_trips_probes_once_and_recloses():
+    from app.ocr.breaker import CircuitBreaker
+
+    now = [0.0]
+    b = CircuitBreaker("paddle/gpu", failure_threshold=2, reset_timeout_s=10, clock=lambda: now[0])
+    assert b.allow()
+    b.record_failure()
+    b.record_success()
+    # Only consecutive failures count
+    b.record_failure()
+    assert b.state == "closed"
+    b.record_failure()
+    assert b.state == "open" and not b.allow()
+    now[0] = 4.0
+    assert b.retry_after_s() == 6
+    now[0] = 10.0
+    # One probe after the reset timeout; concurrent calls are still refused
+    assert b.allow() and b.state == "half_open"
+    assert not b.allow()
+    b.record_failure()
+    assert b.state == "open" and not b.allow()
+    now[0] = 20.0
+    assert b.allow()
+    b.record_success()
+    assert b.state == "closed" and b.allow()
+    snap = b.snapshot()
+    assert snap["trips"] == 2 and snap["rejected"] == 3 and snap["consecutive_failures"] == 0
+
+
+def test_engine_falls_back_to_cpu_and_sheds_load_when_open(monkeypatch):
+    import numpy as np
+    import pytest
+    from app.core.config import settings
+    from app.ocr import engine as engine_module, registry as registry_module
+    from app.ocr.breaker import BackendUnavailable, BreakerRegistry, InferenceFailed, tracking
+    from app.ocr.fake_backend import FakeBackend
+
+    class BrokenDevice(FakeBackend):
+        uses_device = True
+
+        def detect(self, image):
+            raise RuntimeError("CUDA error: an illegal memory access was encountered")
+
+    monkeypatch.setattr(engine_module, "breakers", BreakerRegistry())
+    monkeypatch.setattr(registry_module, "registry", EngineRegistry())
+    monkeypatch.setattr(settings, "breaker_failure_threshold", 2)
+    gpu = engine_module.OcrEngine("en", "fake", "gpu")
+    gpu._backend = BrokenDevice()
+    image = np.full((20, 60, 3), 255, dtype=np.uint8)
+    image[5:10, 10:40] = 0
+
+    for reason in ("error", "error", "circuit_open"):
+        with tracking() as degraded:
+            assert gpu.recognize(image).text == "30x5"
+        assert degraded == {"backend": "fake/gpu", "served_by": "fake/cpu", "reason": reason}
+    assert gpu.breaker.state == "open"
+
+    # Without a fallback device: a failing call is an inference error, an open circuit sheds load
+    monkeypatch.setattr(settings, "fallback_device", None)
+    other = engine_module.OcrEngine("korean", "fake", "gpu")
+    assert other.breaker is gpu.breaker
+    with pytest.raises(BackendUnavailable) as exc_info:
+        other.recognize(image)
+    assert exc_info.value.retry_after_s >= 1
+    gpu.breaker.record_success()
+    gpu._backend = BrokenDevice()
+    with pytest.raises(InferenceFailed):
+        gpu.recognize(image)
+    # Undecodable input never counts against the backend
+    assert gpu.recognize(b"not an image").text == ""
+    assert gpu.breaker.snapshot()["consecutive_failures"] == 1
+
+
+def test_engine_batch_counts_backend_errors_instead_of_bad_images(monkeypatch):
+    import numpy as np
+    import pytest
+    from app.core.config import settings
+    from app.ocr import engine as engine_module
+    from app.ocr.breaker import BreakerRegistry, InferenceFailed
+    from app.ocr.fake_backend import FakeBackend
+
+    class BrokenDevice(FakeBackend):
+        def detect(self, image):
+            raise RuntimeError("CUDA error")
+
+    monkeypatch.setattr(engine_module, "breakers", BreakerRegistry())
+    monkeypatch.setattr(settings, "breaker_failure_threshold", 3)
+    engine = engine_module.OcrEngine("en", "fake")
+    engine._backend = BrokenDevice()
+    image = np.full((20, 60, 3), 255, dtype=np.uint8)
+    res = engine.recognize_batch([image, b"not an image"])
+    assert [r.error for r in res] == ["InferenceError", "InferenceError"]
+    with pytest.raises(InferenceFailed):
+        engine.recognize_batch([image], strict=True)
+    assert engine.breaker.snapshot()["failures"] == 2
+    # Undecodable items alone are the caller's problem
+    engine._backend = FakeBackend()
+    assert [r.error for r in engine.recognize_batch([image, b"not an image"])] == [None, "BadImage"]
+    assert engine.breaker.snapshot()["consecutive_failures"] == 0
+
+
+def test_shed_calls_are_counted_even_though_the_task_fails(monkeypatch):
+    import asyncio
+    import io
+    import pickle
+    import numpy as np
+    import pytest
+    from PIL import Image
+    from app.core import metrics
+    from app.core.config import settings
+    from app.ocr import engine as engine_module, registry as registry_module
+    from app.ocr.breaker import BackendUnavailable, BreakerRegistry
+    from app.ocr.executor import InferenceExecutor
+    from app.ocr.pipeline import run_mode
+
+    breakers = BreakerRegistry()
+    monkeypatch.setattr(engine_module, "breakers", breakers)
+    monkeypatch.setattr(registry_module, "registry", EngineRegistry())
+    monkeypatch.setattr(settings, "fallback_device", None)
+    monkeypatch.setattr(settings, "adaptive_resize", False)
+    breaker = breakers.get("fake/auto")
+    for _ in range(settings.breaker_failure_threshold):
+        breaker.record_failure()
+    buf = io.BytesIO()
+    Image.fromarray(np.full((20, 60, 3), 255, dtype=np.uint8)).save(buf, format="PNG")
+    counter = metrics.REGISTRY.counter("ocr_degraded_total")
+    before = counter.value(backend="fake/auto", served_by="none", reason="circuit_open")
+    ex = InferenceExecutor(kind="thread")
+    with pytest.raises(BackendUnavailable) as exc_info:
+        asyncio.run(ex.run(run_mode, "recognition", buf.getvalue(), "en", "fake"))
+    ex.shutdown()
+    assert counter.value(backend="fake/auto", served_by="none", reason="circuit_open") == before + 1
+    # The counters survive the trip back from a worker process
+    assert pickle.loads(pickle.dumps(exc_info.value)).worker_metrics == exc_info.value.worker_metrics
+
+
+def test_process_pool_ships_mmapped_uploads_inside_batches(tmp_path):
+    import asyncio
+    import mmap
+    from app.ocr.executor import InferenceExecutor
+
+    path = tmp_path / "upload.bin"
+    path.write_bytes(b"page-bytes")
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ex = InferenceExecutor(kind="process", workers=1)
+        try:
+            # Micro-batches pass their contents as one list argument
+            assert asyncio.run(ex.run(b"|".join, [mm, b"other"])) == b"page-bytes|other"
+        finally:
+            ex.shutdown()